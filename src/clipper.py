@@ -1,17 +1,94 @@
 """
 Clipper 模組 - 影片裁切功能
-支援快速裁切（stream copy）和精確裁切（重新編碼）
+支援快速裁切（stream copy）、精確裁切（重新編碼）和智慧裁切（只重新編碼頭尾），
+以及一次讀取切出多段的多段裁切與依章節/時間點/固定長度分割整個檔案
 """
 
-import subprocess
+import bisect
+import csv
 import os
-import time
+import re
+import shutil
+import tempfile
+import threading
+from contextlib import nullcontext
 from dataclasses import dataclass
 from enum import Enum
 from typing import Callable
 
-from task_utils import TaskController
-from constants import COPY_CODEC_LABEL, PRECISE_CUT_LABEL
+from task_utils import TaskController, encoder_budget
+from ffmpeg_progress import FfmpegProgress, run_ffmpeg
+from merger import write_concat_list
+from keyframe_index import KeyframeIndex, scan_keyframes_near
+from utils import (
+    estimate_frame_duration,
+    format_time_str,
+    get_video_packets,
+    media_start_time,
+    parse_time_str,
+    probe_media,
+)
+from constants import (
+    COPY_CODEC_LABEL,
+    PRECISE_CUT_LABEL,
+    SMART_CUT_LABEL,
+    SPLIT_BY_CHAPTERS,
+    SPLIT_BY_INTERVAL,
+    SPLIT_BY_TIMES,
+)
+
+# 智慧裁切支援的來源編碼 -> (CPU 編碼器, 轉成 Annex B 的 bitstream filter)
+# Annex B 讓每一段都在串流內帶著自己的參數集 (SPS/PPS)，重新編碼的頭尾才能和原始中段無損串接
+SMART_CUT_CODECS = {
+    "h264": ("libx264", "h264_mp4toannexb"),
+    "hevc": ("libx265", "hevc_mp4toannexb"),
+    "vp9": ("libvpx-vp9", None),
+}
+# ffprobe 回報的 profile -> 編碼器的 -profile:v
+_ENCODER_PROFILES = {
+    "libx264": {
+        "Baseline": "baseline",
+        "Constrained Baseline": "baseline",
+        "Main": "main",
+        "High": "high",
+        "High 10": "high10",
+        "High 4:2:2": "high422",
+        "High 4:4:4 Predictive": "high444",
+    },
+    "libx265": {"Main": "main", "Main 10": "main10"},
+}
+# 與精確裁切 QP 18 同級的畫質
+SMART_CUT_CRF = 18
+# 掃描封包時多讀的秒數，才看得到結尾之後的畫面與關鍵幀
+SMART_CUT_SCAN_MARGIN = 2.0
+# 分段處理佔整體進度的比例，其餘留給最後的串接
+SMART_CUT_PIECES_SHARE = 0.9
+
+# 精確裁切：使用 HEVC NVENC 重新編碼，QP 18 確保高品質
+PRECISE_CUT_CODEC_ARGS = [
+    "-c:v",
+    "hevc_nvenc",
+    "-preset",
+    "p5",
+    "-qp",
+    "18",  # 高品質設定（視覺無損）
+    "-bf",
+    "4",  # B-frame
+    "-b_ref_mode",
+    "middle",
+    "-c:a",
+    "aac",
+    "-b:a",
+    "192k",  # 高品質音訊
+]
+# 多段精確裁切每次 ffmpeg 最多同時開啟的編碼器數（消費級 NVENC 的工作階段上限）
+MULTI_CLIP_ENCODER_OUTPUTS = 3
+# 多段裁切中，兩段間隔超過這個秒數就另開一次 ffmpeg 從輸入端 seek，不把中間整段讀過
+MULTI_CLIP_MAX_GAP = 10.0
+
+# 執行中的裁切已選定、但可能尚未寫出的輸出路徑
+_reserved_outputs = set()
+_reserved_outputs_lock = threading.Lock()
 
 
 class ClipStatus(Enum):
@@ -29,7 +106,7 @@ class ClipJob:
     end_time: str
     output_path: str
     output_filename: str
-    clip_mode: str = COPY_CODEC_LABEL  # COPY_CODEC_LABEL 或 PRECISE_CUT_LABEL
+    clip_mode: str = COPY_CODEC_LABEL  # COPY_CODEC_LABEL、PRECISE_CUT_LABEL 或 SMART_CUT_LABEL
     container_format: str = "mp4"
     status: ClipStatus = ClipStatus.QUEUED
     progress: int = 0
@@ -37,41 +114,390 @@ class ClipJob:
     task_controller: TaskController = None
 
 
-def _run_stoppable_ffmpeg(command, task_controller: TaskController, progress_hook=None):
-    """執行 ffmpeg 並支援停止/暫停功能"""
-    process = subprocess.Popen(
-        command,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        universal_newlines=True,
-        encoding="utf-8",
-        errors="ignore",
-    )
+@dataclass
+class MultiClipJob:
+    """同一個輸入檔的多段裁切：ranges 為 (開始時間, 結束時間, 輸出檔名) 的清單"""
+
+    input_path: str
+    ranges: list
+    output_path: str
+    clip_mode: str = COPY_CODEC_LABEL  # 智慧裁切以精確裁切處理
+    container_format: str = "mp4"
+    status: ClipStatus = ClipStatus.QUEUED
+    progress_hook: Callable = None
+    task_controller: TaskController = None
+
+
+@dataclass
+class SplitJob:
+    """
+    把整個輸入檔切成多個檔案：依章節、依 split_times 時間點清單或每 interval 秒一段。
+    輸出為 output_filename_001、_002...（依章節時附上章節標題）
+    """
+
+    input_path: str
+    output_path: str
+    output_filename: str
+    split_by: str = SPLIT_BY_CHAPTERS  # SPLIT_BY_CHAPTERS、SPLIT_BY_TIMES 或 SPLIT_BY_INTERVAL
+    split_times: list = None  # SPLIT_BY_TIMES 的分割時間點（字串）
+    interval: float = 600.0  # SPLIT_BY_INTERVAL 每段秒數
+    container_format: str = "mp4"
+    status: ClipStatus = ClipStatus.QUEUED
+    progress_hook: Callable = None
+    task_controller: TaskController = None
+
+
+def _reserve_output_path(output_path: str, output_filename: str, container_format: str) -> str:
+    """
+    構建輸出檔的完整路徑並保留到 _release_output_paths() 為止。
+    檔名衝突時加上 (1)、(2)...，並行中的其他裁切還沒寫出的檔名也要避開。
+    """
+    container_ext = container_format if container_format else "mp4"
+    if not container_ext.startswith("."):
+        container_ext = "." + container_ext
+
+    if output_filename.lower().endswith(container_ext):
+        final_filename = output_filename
+    else:
+        final_filename = output_filename + container_ext
+
+    output_full_path = os.path.join(output_path, final_filename)
+
+    base, ext = os.path.splitext(output_full_path)
+    i = 1
+    with _reserved_outputs_lock:
+        while os.path.exists(output_full_path) or output_full_path in _reserved_outputs:
+            output_full_path = f"{base}({i}){ext}"
+            i += 1
+        _reserved_outputs.add(output_full_path)
+    return output_full_path
 
-    if task_controller:
-        task_controller.set_process(process)
 
-    for line in process.stdout:
-        if task_controller:
-            if task_controller.is_stopped():
-                process.terminate()
-                return False, "已被使用者停止"
+def _release_output_paths(paths):
+    with _reserved_outputs_lock:
+        _reserved_outputs.difference_update(paths)
 
-            while task_controller.pause_event.is_set():
-                if task_controller.is_stopped():
-                    process.terminate()
-                    return False, "已被使用者停止"
-                time.sleep(0.1)
 
-    process.wait()
+def _run_stoppable_ffmpeg(
+    command,
+    task_controller: TaskController,
+    progress_hook=None,
+    total_duration: float = 0.0,
+    info_prefix: str = "處理中",
+):
+    """執行 ffmpeg 並支援停止/暫停功能，透過 progress_hook 回報進度"""
 
-    if task_controller and task_controller.is_stopped():
+    def on_progress(progress: FfmpegProgress):
+        if progress_hook:
+            progress_hook(
+                {
+                    "status": "processing",
+                    "info": f"{info_prefix} {progress.summary()}",
+                    "percent": progress.percent,
+                }
+            )
+
+    result = run_ffmpeg(command, task_controller, on_progress, total_duration)
+
+    if result.stopped:
         return False, "已被使用者停止"
 
-    if process.returncode == 0:
+    if result.returncode == 0:
         return True, "成功"
     else:
-        return False, f"處理失敗，錯誤碼: {process.returncode}"
+        detail = f"\n{result.log}" if result.stderr_tail else ""
+        return False, f"處理失敗，錯誤碼: {result.returncode}{detail}"
+
+
+@dataclass
+class SmartCutPiece:
+    """智慧裁切的一段：從 start 起重新編碼或直接複製 frames 個畫面"""
+
+    copy: bool
+    start: float  # 第一個畫面的顯示時間（秒）
+    duration: float
+    frames: int
+    seek: float  # 傳給 -ss 的時間，偏移半個畫面以免浮點誤差選錯畫面
+
+
+def _clean_keyframes(packets) -> list:
+    """
+    可以從該處開始直接複製的關鍵幀。open GOP 的關鍵幀之後（解碼順序）還有顯示
+    時間更早、參考前一個 GOP 的畫面 (leading pictures)，不能當作切點。
+    """
+    clean = []
+    current = None  # [關鍵幀時間, 是否乾淨]
+    for pts, is_key in packets:
+        if is_key:
+            if current and current[1]:
+                clean.append(current[0])
+            current = [pts, True]
+        elif current and pts < current[0]:
+            current[1] = False
+    if current and current[1]:
+        clean.append(current[0])
+    return sorted(clean)
+
+
+def plan_smart_cut(packets, start: float, end: float) -> list:
+    """
+    依 ffprobe 的封包列表（解碼順序的 (pts, 是否關鍵幀)）規劃 [start, end) 的分段：
+    第一個乾淨關鍵幀之前與最後一個之後的不完整 GOP 重新編碼，中間整段複製。
+    範圍內沒有畫面時回傳空 list。
+    """
+    pts = sorted(t for t, _ in packets)
+    first = bisect.bisect_left(pts, start)
+    last = bisect.bisect_left(pts, end)
+    if first >= last:
+        return []
+
+    frame_duration = estimate_frame_duration(pts)
+    half_frame = frame_duration / 2
+    clip_start = pts[first]
+    # 片段之後的第一個畫面；剛好是關鍵幀時，最後一個 GOP 也能整段複製
+    boundary = pts[last] if last < len(pts) else pts[last - 1] + frame_duration
+    cuts = [k for k in _clean_keyframes(packets) if clip_start <= k <= boundary]
+
+    def piece(copy: bool, a: float, b: float) -> SmartCutPiece:
+        frames = bisect.bisect_left(pts, b) - bisect.bisect_left(pts, a)
+        # copy 會從 -ss 之前最近的關鍵幀開始；重新編碼則丟掉 -ss 之前的畫面
+        seek = a + half_frame if copy else max(0.0, a - half_frame)
+        return SmartCutPiece(copy, a, b - a, frames, seek)
+
+    if not cuts:
+        # 整段都在同一個 GOP 裡
+        return [piece(False, clip_start, boundary)]
+
+    pieces = []
+    if cuts[0] > clip_start:
+        pieces.append(piece(False, clip_start, cuts[0]))
+    if cuts[-1] > cuts[0]:
+        pieces.append(piece(True, cuts[0], cuts[-1]))
+    if cuts[-1] < boundary:
+        pieces.append(piece(False, cuts[-1], boundary))
+    return pieces
+
+
+def _smart_cut_encoder_args(encoder: str, stream: dict) -> list:
+    """重新編碼頭尾時盡量沿用來源串流的參數，讓串接後的影片前後一致"""
+    args = ["-c:v", encoder, "-crf", str(SMART_CUT_CRF)]
+    if encoder == "libvpx-vp9":
+        args.extend(["-b:v", "0", "-row-mt", "1"])
+    else:
+        args.extend(["-preset", "medium"])
+
+    profile = _ENCODER_PROFILES.get(encoder, {}).get(stream.get("profile"))
+    if profile:
+        args.extend(["-profile:v", profile])
+    level = stream.get("level")
+    if encoder == "libx264" and isinstance(level, int) and level > 0:
+        args.extend(["-level", f"{level / 10:.1f}"])
+    if stream.get("pix_fmt"):
+        args.extend(["-pix_fmt", stream["pix_fmt"]])
+    for key, option in (
+        ("color_range", "-color_range"),
+        ("color_space", "-colorspace"),
+        ("color_transfer", "-color_trc"),
+        ("color_primaries", "-color_primaries"),
+    ):
+        value = stream.get(key)
+        if value and value != "unknown":
+            args.extend([option, value])
+    if encoder == "libx265":
+        args.extend(["-x265-params", "log-level=error"])
+
+    # 參數集寫進串流本身（每個關鍵幀前重送），不放在容器的 extradata
+    args.extend(["-flags", "-global_header"])
+    return args
+
+
+def _scaled_progress_hook(progress_hook, offset: float, share: float):
+    """把單一步驟 0~100% 的進度換算成整體進度的 offset ~ offset + share * 100"""
+    if not progress_hook:
+        return None
+
+    def hook(d):
+        if d.get("percent") is not None:
+            d = dict(d, percent=offset + d["percent"] * share)
+        progress_hook(d)
+
+    return hook
+
+
+def _lands_on_keyframes(index: KeyframeIndex, input_path: str, start: float, end: float) -> bool:
+    """
+    開始時間在關鍵幀上，且結束時間在關鍵幀上或已到檔尾時，
+    stream copy 切出的畫面與重新編碼完全相同。
+    """
+    if not index.is_keyframe(start):
+        return False
+    if index.is_keyframe(end):
+        return True
+    try:
+        duration = float((probe_media(input_path) or {})["format"]["duration"])
+    except (KeyError, TypeError, ValueError):
+        return False
+    return end >= duration - index.tolerance
+
+
+def _run_smart_cut(job: ClipJob, output_full_path: str):
+    """
+    智慧裁切：只重新編碼開頭與結尾不完整的 GOP，中間 stream copy，
+    再用 concat demuxer 無損串接並從來源補回音訊。
+    回傳值與 _run_stoppable_ffmpeg 相同。
+    """
+    start = parse_time_str(job.start_time)
+    end = parse_time_str(job.end_time)
+    if end <= start:
+        raise Exception("結束時間必須晚於開始時間")
+
+    data = probe_media(job.input_path) or {}
+    stream = next(
+        (s for s in data.get("streams", []) if s.get("codec_type") == "video"), None
+    )
+    if stream is None:
+        raise Exception("找不到視訊串流（需要 ffprobe）")
+    codec = SMART_CUT_CODECS.get(stream.get("codec_name"))
+    if codec is None:
+        raise Exception(
+            f"智慧裁切不支援 {stream.get('codec_name')} 編碼，請改用快速或精確裁切"
+        )
+    encoder, annexb_filter = codec
+
+    # 封包時間與 -read_intervals 是絕對時間，使用者輸入與 -ss 則從 start_time 起算
+    offset = media_start_time(data)
+    packets = get_video_packets(
+        job.input_path, start + offset, end + offset + SMART_CUT_SCAN_MARGIN
+    )
+    packets = [(pts - offset, is_key) for pts, is_key in packets]
+    pieces = plan_smart_cut(packets, start, end)
+    if not pieces:
+        raise Exception("指定的時間範圍內沒有畫面")
+
+    encoder_args = _smart_cut_encoder_args(encoder, stream)
+    total = sum(p.duration for p in pieces)
+    work_dir = tempfile.mkdtemp(
+        prefix=".smartcut_", dir=os.path.dirname(os.path.abspath(output_full_path))
+    )
+    piece_files = []
+    concat_list_path = None
+    try:
+        done = 0.0
+        for index, piece in enumerate(pieces):
+            # NUT 保留原始的時間基準與 Annex B 封包，不會像 MP4/MKV 改寫參數集
+            piece_path = os.path.join(work_dir, f"piece_{index:02d}.nut")
+            command = [
+                "ffmpeg",
+                "-ss",
+                f"{piece.seek:.6f}",
+                "-i",
+                job.input_path,
+                "-map",
+                "0:v:0",
+                "-frames:v",
+                str(piece.frames),
+            ]
+            if piece.copy:
+                command.extend(["-c:v", "copy"])
+                if annexb_filter:
+                    command.extend(["-bsf:v", annexb_filter])
+            else:
+                command.extend(encoder_args)
+            command.extend(["-an", "-sn", "-dn", "-y", piece_path])
+
+            success, msg = _run_stoppable_ffmpeg(
+                command,
+                job.task_controller,
+                _scaled_progress_hook(
+                    job.progress_hook,
+                    done / total * SMART_CUT_PIECES_SHARE * 100,
+                    piece.duration / total * SMART_CUT_PIECES_SHARE,
+                ),
+                piece.duration,
+                "智慧裁切：複製中段" if piece.copy else "智慧裁切：重新編碼頭尾",
+            )
+            if not success:
+                return False, msg
+            piece_files.append(piece_path)
+            done += piece.duration
+
+        inputs = []
+        audio_maps = []
+        if any(s.get("codec_type") == "audio" for s in data.get("streams", [])):
+            # copy 的音訊會從 seek 點之前的封包開始，輸出端 -ss 0 把多出來的部分丟掉
+            audio_path = os.path.join(work_dir, "audio.mka")
+            command = [
+                "ffmpeg",
+                "-ss",
+                f"{pieces[0].start:.6f}",
+                "-i",
+                job.input_path,
+                "-ss",
+                "0",
+                "-t",
+                f"{total:.6f}",
+                "-map",
+                "0:a",
+                "-c",
+                "copy",
+                "-y",
+                audio_path,
+            ]
+            success, msg = _run_stoppable_ffmpeg(
+                command,
+                job.task_controller,
+                _scaled_progress_hook(
+                    job.progress_hook, SMART_CUT_PIECES_SHARE * 100, 0
+                ),
+                total,
+                "智慧裁切：擷取音訊",
+            )
+            if not success:
+                return False, msg
+            inputs = ["-i", audio_path]
+            audio_maps = ["-map", "1:a"]
+
+        # 各段長度由封包時間算出，避免 concat demuxer 自行估計造成跳格
+        concat_list_path = write_concat_list(
+            piece_files, [p.duration for p in pieces]
+        )
+        command = [
+            "ffmpeg",
+            "-f",
+            "concat",
+            "-safe",
+            "0",
+            "-i",
+            concat_list_path,
+            *inputs,
+            "-map",
+            "0:v:0",
+            *audio_maps,
+            "-c",
+            "copy",
+            "-avoid_negative_ts",
+            "make_zero",
+            "-y",
+            output_full_path,
+        ]
+        return _run_stoppable_ffmpeg(
+            command,
+            job.task_controller,
+            _scaled_progress_hook(
+                job.progress_hook,
+                SMART_CUT_PIECES_SHARE * 100,
+                1 - SMART_CUT_PIECES_SHARE,
+            ),
+            total,
+            "智慧裁切：串接中",
+        )
+    finally:
+        if concat_list_path and os.path.exists(concat_list_path):
+            try:
+                os.remove(concat_list_path)
+            except OSError:
+                pass
+        shutil.rmtree(work_dir, ignore_errors=True)
 
 
 def start_clip(job: ClipJob):
@@ -79,37 +505,60 @@ def start_clip(job: ClipJob):
     執行影片裁切
     - 快速模式 (COPY_CODEC_LABEL): 使用 stream copy，速度快但只能從 keyframe 裁切
     - 精確模式 (PRECISE_CUT_LABEL): 重新編碼，100% 精確裁切
+    - 智慧模式 (SMART_CUT_LABEL): 只重新編碼頭尾不完整的 GOP，精確且接近快速模式的速度
     """
     job.status = ClipStatus.PROCESSING
     if job.progress_hook:
         job.progress_hook({"status": "processing", "info": "開始裁切..."})
 
-    # 構建輸出檔名
-    container_ext = job.container_format if job.container_format else "mp4"
-    if not container_ext.startswith("."):
-        container_ext = "." + container_ext
-
-    if job.output_filename.lower().endswith(container_ext):
-        final_filename = job.output_filename
-    else:
-        final_filename = job.output_filename + container_ext
-
-    output_full_path = os.path.join(job.output_path, final_filename)
-
-    # 處理檔名衝突
-    base, ext = os.path.splitext(output_full_path)
-    i = 1
-    while os.path.exists(output_full_path):
-        output_full_path = f"{base}({i}){ext}"
-        i += 1
+    output_full_path = _reserve_output_path(
+        job.output_path, job.output_filename, job.container_format
+    )
 
     try:
         if not os.path.exists(job.input_path):
             raise Exception(f"輸入檔案不存在: {job.input_path}")
 
-        if job.clip_mode == PRECISE_CUT_LABEL:
+        start = parse_time_str(job.start_time)
+        end = parse_time_str(job.end_time)
+        if end <= start:
+            raise Exception("結束時間必須晚於開始時間")
+
+        # 有快取就用整份索引，否則只掃描切點附近；取不到時照使用者選的模式裁切
+        clip_mode = job.clip_mode
+        index = scan_keyframes_near(job.input_path, [start, end])
+        if index is not None:
+            if clip_mode != COPY_CODEC_LABEL and _lands_on_keyframes(
+                index, job.input_path, start, end
+            ):
+                clip_mode = COPY_CODEC_LABEL
+                if job.progress_hook:
+                    job.progress_hook(
+                        {
+                            "status": "processing",
+                            "info": "開始與結束時間都在關鍵幀上，改用快速裁切（畫面相同）",
+                        }
+                    )
+            elif clip_mode == COPY_CODEC_LABEL and not index.is_keyframe(start):
+                actual_start = index.snap(start)
+                if job.progress_hook:
+                    job.progress_hook(
+                        {
+                            "status": "processing",
+                            "info": f"快速裁切：實際從 {format_time_str(actual_start)} 開始"
+                            f"（提早 {start - actual_start:.3f} 秒）",
+                        }
+                    )
+
+        if clip_mode == SMART_CUT_LABEL:
+            # === 智慧裁切模式 ===
+            if job.progress_hook:
+                job.progress_hook(
+                    {"status": "processing", "info": "智慧裁切中（分析關鍵幀）..."}
+                )
+            command = None
+        elif clip_mode == PRECISE_CUT_LABEL:
             # === 精確裁切模式 ===
-            # 使用 HEVC NVENC 重新編碼，QP 18 確保高品質
             if job.progress_hook:
                 job.progress_hook(
                     {"status": "processing", "info": "精確裁切中（重新編碼）..."}
@@ -121,22 +570,9 @@ def start_clip(job: ClipJob):
                 job.start_time,
                 "-i",
                 job.input_path,
-                "-to",
-                job.end_time,
-                "-c:v",
-                "hevc_nvenc",
-                "-preset",
-                "p5",
-                "-qp",
-                "18",  # 高品質設定（視覺無損）
-                "-bf",
-                "4",  # B-frame
-                "-b_ref_mode",
-                "middle",
-                "-c:a",
-                "aac",
-                "-b:a",
-                "192k",  # 高品質音訊
+                "-t",
+                f"{end - start:.6f}",
+                *PRECISE_CUT_CODEC_ARGS,
                 "-avoid_negative_ts",
                 "make_zero",
                 "-y",
@@ -155,8 +591,8 @@ def start_clip(job: ClipJob):
                 job.start_time,
                 "-i",
                 job.input_path,
-                "-to",
-                job.end_time,
+                "-t",
+                f"{end - start:.6f}",
                 "-c",
                 "copy",
                 "-avoid_negative_ts",
@@ -165,9 +601,26 @@ def start_clip(job: ClipJob):
                 output_full_path,
             ]
 
-        success, msg = _run_stoppable_ffmpeg(
-            command, job.task_controller, job.progress_hook
+        # 重新編碼的裁切要先取得編碼器名額；stream copy 只受全域程序上限限制
+        encoder_slot = (
+            nullcontext(True)
+            if clip_mode == COPY_CODEC_LABEL
+            else encoder_budget.slot(job.task_controller)
         )
+        with encoder_slot as acquired:
+            if not acquired:
+                success, msg = False, "已被使用者停止"
+            elif command is None:
+                success, msg = _run_smart_cut(job, output_full_path)
+            else:
+                # -ss 在 -i 之前時，輸出時間從 seek 點起算，所以用 -t 指定長度
+                success, msg = _run_stoppable_ffmpeg(
+                    command,
+                    job.task_controller,
+                    job.progress_hook,
+                    end - start,
+                    "精確裁切中" if clip_mode == PRECISE_CUT_LABEL else "快速裁切中",
+                )
 
         if not success:
             if "停止" in msg:
@@ -202,3 +655,331 @@ def start_clip(job: ClipJob):
         if job.progress_hook:
             job.progress_hook({"status": "error", "info": error_msg})
         return False, error_msg
+
+    finally:
+        _release_output_paths([output_full_path])
+
+
+def _copy_output_seek(index: KeyframeIndex | None, t: float) -> float:
+    """
+    多段快速裁切中，讓該段從 t 之前最近的關鍵幀開始的輸出端 -ss。
+    stream copy 以關鍵幀的 dts（比 pts 早 decode_delay）和 -ss 比較，並丟掉開頭的非關鍵幀，
+    所以指定在該關鍵幀的 dts 之前一點。沒有索引時該段會從 t 之後的第一個關鍵幀開始。
+    """
+    if index is None:
+        return t
+    return max(0.0, index.snap(t) - index.decode_delay - index.tolerance)
+
+
+def start_multi_clip(job: MultiClipJob):
+    """
+    從同一個輸入檔切出多段：每段是同一個 ffmpeg 的一個輸出，各自帶輸出端的 -ss/-to，
+    來源只開啟、探測並循序讀取一次，不必為每段重新開檔與 seek。
+    - 快速模式：每段從開始時間之前最近的關鍵幀開始，與單段快速裁切相同
+    - 精確模式：解碼一次、每段各自重新編碼；每個編碼輸出各佔一個編碼器名額，
+      每次 ffmpeg 最多 MULTI_CLIP_ENCODER_OUTPUTS 段
+    相距超過 MULTI_CLIP_MAX_GAP 秒的範圍分成不同次 ffmpeg，各自從輸入端 seek。
+    - 智慧模式需要逐段分析與串接，這裡改用精確模式
+    """
+    job.status = ClipStatus.PROCESSING
+    if job.progress_hook:
+        job.progress_hook({"status": "processing", "info": "開始多段裁切..."})
+
+    output_paths = []
+    try:
+        if not os.path.exists(job.input_path):
+            raise Exception(f"輸入檔案不存在: {job.input_path}")
+        if not job.ranges:
+            raise Exception("沒有指定裁切範圍")
+
+        cuts = []
+        for number, (start_time, end_time, name) in enumerate(job.ranges, 1):
+            start = parse_time_str(start_time)
+            end = parse_time_str(end_time)
+            if end <= start:
+                raise Exception(f"第 {number} 段：結束時間必須晚於開始時間")
+            cuts.append((start, end, name or f"clip_{number:02d}"))
+
+        clip_mode = COPY_CODEC_LABEL if job.clip_mode == COPY_CODEC_LABEL else PRECISE_CUT_LABEL
+        if job.clip_mode == SMART_CUT_LABEL and job.progress_hook:
+            job.progress_hook(
+                {"status": "processing", "info": "多段裁切不支援智慧裁切，改用精確裁切"}
+            )
+
+        index = scan_keyframes_near(
+            job.input_path, [t for start, end, _ in cuts for t in (start, end)]
+        )
+        if (
+            index is not None
+            and clip_mode == PRECISE_CUT_LABEL
+            and all(_lands_on_keyframes(index, job.input_path, s, e) for s, e, _ in cuts)
+        ):
+            clip_mode = COPY_CODEC_LABEL
+            if job.progress_hook:
+                job.progress_hook(
+                    {
+                        "status": "processing",
+                        "info": "所有範圍都在關鍵幀上，改用快速裁切（畫面相同）",
+                    }
+                )
+
+        for _, _, name in cuts:
+            output_paths.append(
+                _reserve_output_path(job.output_path, name, job.container_format)
+            )
+
+        # 依開始時間排序，每次 ffmpeg 都只往前讀來源中連續的一段
+        order = sorted(range(len(cuts)), key=lambda i: cuts[i][0])
+        if clip_mode == COPY_CODEC_LABEL:
+            seeks = [_copy_output_seek(index, start) for start, _, _ in cuts]
+            codec_args = ["-c", "copy"]
+            batch_size = len(cuts)
+        else:
+            seeks = [start for start, _, _ in cuts]
+            codec_args = PRECISE_CUT_CODEC_ARGS
+            # 一次取得的名額不超過上限，否則永遠等不到
+            batch_size = max(1, min(MULTI_CLIP_ENCODER_OUTPUTS, encoder_budget.limit))
+
+        batches = []
+        last_end = None
+        for i in order:
+            if (
+                not batches
+                or len(batches[-1]) >= batch_size
+                or seeks[i] - last_end > MULTI_CLIP_MAX_GAP
+            ):
+                batches.append([])
+                last_end = cuts[i][1]
+            batches[-1].append(i)
+            last_end = max(last_end, cuts[i][1])
+
+        # 每次 ffmpeg 從該批最早的 seek 點讀到最晚的結束時間
+        spans = [
+            (min(seeks[i] for i in batch), max(cuts[i][1] for i in batch))
+            for batch in batches
+        ]
+        total = sum(last - base for base, last in spans)
+        info_prefix = f"多段裁切中（{len(cuts)} 段）"
+
+        success, msg = True, ""
+        done = 0.0
+        for batch, (base, last) in zip(batches, spans):
+            # 重新編碼時每個輸出都是一個編碼器工作階段，各佔一個名額
+            encoder_slot = (
+                nullcontext(True)
+                if clip_mode == COPY_CODEC_LABEL
+                else encoder_budget.slot(job.task_controller, len(batch))
+            )
+            with encoder_slot as acquired:
+                if not acquired:
+                    success, msg = False, "已被使用者停止"
+                    break
+                command = ["ffmpeg", "-y", "-ss", f"{base:.6f}", "-i", job.input_path]
+                for i in batch:
+                    # 輸入端 seek 之後，輸出端的時間從 base 起算
+                    command.extend(
+                        [
+                            "-ss",
+                            f"{seeks[i] - base:.6f}",
+                            "-to",
+                            f"{cuts[i][1] - base:.6f}",
+                            *codec_args,
+                            "-avoid_negative_ts",
+                            "make_zero",
+                            output_paths[i],
+                        ]
+                    )
+                success, msg = _run_stoppable_ffmpeg(
+                    command,
+                    job.task_controller,
+                    _scaled_progress_hook(
+                        job.progress_hook, done / total * 100, (last - base) / total
+                    ),
+                    last - base,
+                    info_prefix,
+                )
+                done += last - base
+                if not success:
+                    break
+
+        if not success:
+            # 清理未完成的輸出檔
+            for path in output_paths:
+                if os.path.exists(path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+            if "停止" in msg:
+                job.status = ClipStatus.STOPPED
+                if job.progress_hook:
+                    job.progress_hook({"status": "error", "info": msg})
+                return False, msg
+            raise Exception(f"ffmpeg 錯誤: {msg}")
+
+        job.status = ClipStatus.COMPLETED
+        if job.progress_hook:
+            job.progress_hook({"status": "finished", "info": "多段裁切完成！"})
+        return True, f"多段裁切完成: {len(cuts)} 個檔案已輸出到 {job.output_path}"
+
+    except FileNotFoundError:
+        error_msg = "找不到 ffmpeg，請確認已安裝並加入 PATH"
+        job.status = ClipStatus.FAILED
+        if job.progress_hook:
+            job.progress_hook({"status": "error", "info": error_msg})
+        return False, error_msg
+
+    except Exception as e:
+        error_msg = str(e)
+        job.status = ClipStatus.FAILED
+        if job.progress_hook:
+            job.progress_hook({"status": "error", "info": error_msg})
+        return False, error_msg
+
+    finally:
+        _release_output_paths(output_paths)
+
+
+def _safe_filename(name: str) -> str:
+    """去掉檔名中 Windows 不允許的字元"""
+    return re.sub(r'[\\/:*?"<>|\r\n\t]+', "_", name).strip(" .")
+
+
+def _plan_split(job: SplitJob, data: dict):
+    """
+    回傳 (segment muxer 參數, 章節清單)；章節清單為 (開始秒數, 標題)，只有依章節分割時才有。
+    """
+    if job.split_by == SPLIT_BY_CHAPTERS:
+        # 章節時間是絕對時間，分割點則從 start_time 起算
+        offset = media_start_time(data)
+        chapters = []
+        for chapter in data.get("chapters") or []:
+            try:
+                start = max(0.0, float(chapter["start_time"]) - offset)
+            except (KeyError, TypeError, ValueError):
+                continue
+            chapters.append((start, (chapter.get("tags") or {}).get("title", "")))
+        chapters.sort()
+        if len(chapters) < 2:
+            raise Exception("此檔案沒有可分割的章節資訊（需要 ffprobe）")
+        # 第一個章節之前若還有內容，也在第一個章節開頭切開
+        times = [start for start, _ in chapters if start > 0]
+        return ["-segment_times", ",".join(f"{t:.6f}" for t in times)], chapters
+
+    if job.split_by == SPLIT_BY_TIMES:
+        times = sorted({parse_time_str(t) for t in job.split_times or []} - {0.0})
+        if not times:
+            raise Exception("請指定至少一個分割時間點")
+        return ["-segment_times", ",".join(f"{t:.6f}" for t in times)], []
+
+    if job.split_by == SPLIT_BY_INTERVAL:
+        if not job.interval or job.interval <= 0:
+            raise Exception("每段長度必須大於 0")
+        return ["-segment_time", f"{job.interval:.6f}"], []
+
+    raise Exception(f"未知的分割方式: {job.split_by}")
+
+
+def start_split(job: SplitJob):
+    """
+    以 segment muxer 一次 stream copy 把整個檔案切成多段：來源只循序讀取一次，
+    進度以整個檔案的長度計算。切點落在每個時間點之後的第一個關鍵幀。
+    """
+    job.status = ClipStatus.PROCESSING
+    if job.progress_hook:
+        job.progress_hook({"status": "processing", "info": "開始分割..."})
+
+    work_dir = None
+    output_paths = []
+    try:
+        if not os.path.exists(job.input_path):
+            raise Exception(f"輸入檔案不存在: {job.input_path}")
+
+        if not os.path.isdir(job.output_path):
+            raise Exception(f"輸出目錄不存在: {job.output_path}")
+
+        data = probe_media(job.input_path) or {}
+        segment_args, chapters = _plan_split(job, data)
+        try:
+            duration = float(data["format"]["duration"])
+        except (KeyError, TypeError, ValueError):
+            duration = 0.0  # 由 ffmpeg 輸出的 Duration 取得
+
+        container_ext = job.container_format if job.container_format else "mp4"
+        container_ext = container_ext.lstrip(".")
+        # 先輸出到暫存目錄，完成後再依序命名，避免覆蓋既有檔案
+        work_dir = tempfile.mkdtemp(prefix=".split_", dir=job.output_path)
+        list_path = os.path.join(work_dir, "segments.csv")
+        command = [
+            "ffmpeg",
+            "-i",
+            job.input_path,
+            "-c",
+            "copy",
+            "-map_chapters",
+            "-1",  # 每段不帶整個檔案的章節
+            "-f",
+            "segment",
+            *segment_args,
+            "-reset_timestamps",
+            "1",
+            "-segment_list",
+            list_path,
+            "-segment_list_type",
+            "csv",
+            "-y",
+            os.path.join(work_dir, f"part_%03d.{container_ext}"),
+        ]
+        success, msg = _run_stoppable_ffmpeg(
+            command, job.task_controller, job.progress_hook, duration, "分割中"
+        )
+        if not success:
+            if "停止" in msg:
+                job.status = ClipStatus.STOPPED
+                if job.progress_hook:
+                    job.progress_hook({"status": "error", "info": msg})
+                return False, msg
+            raise Exception(f"ffmpeg 錯誤: {msg}")
+
+        # segment list 每列為：檔名,開始秒數,結束秒數
+        with open(list_path, newline="", encoding="utf-8") as f:
+            segments = [row for row in csv.reader(f) if row]
+        chapter_starts = [start for start, _ in chapters]
+        for number, (part, seg_start, *_) in enumerate(segments, 1):
+            name = f"{job.output_filename}_{number:03d}"
+            if chapters:
+                # 切點在章節開頭之後的關鍵幀，所以取開始於該段之前的最後一個章節；
+                # 第一個章節之前的片段沒有標題
+                i = bisect.bisect_right(chapter_starts, float(seg_start)) - 1
+                title = _safe_filename(chapters[i][1]) if i >= 0 else ""
+                if title:
+                    name += f"_{title}"
+            path = _reserve_output_path(job.output_path, name, container_ext)
+            output_paths.append(path)
+            os.replace(os.path.join(work_dir, part), path)
+
+        job.status = ClipStatus.COMPLETED
+        if job.progress_hook:
+            job.progress_hook(
+                {"status": "finished", "info": f"分割完成！共 {len(segments)} 個檔案"}
+            )
+        return True, f"分割完成: {len(segments)} 個檔案已輸出到 {job.output_path}"
+
+    except FileNotFoundError:
+        error_msg = "找不到 ffmpeg，請確認已安裝並加入 PATH"
+        job.status = ClipStatus.FAILED
+        if job.progress_hook:
+            job.progress_hook({"status": "error", "info": error_msg})
+        return False, error_msg
+
+    except Exception as e:
+        error_msg = str(e)
+        job.status = ClipStatus.FAILED
+        if job.progress_hook:
+            job.progress_hook({"status": "error", "info": error_msg})
+        return False, error_msg
+
+    finally:
+        _release_output_paths(output_paths)
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
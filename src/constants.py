@@ -1,7 +1,10 @@
+import os
+
 BEST_CODEC_LABEL = "最佳編碼格式 (HEVC_NVENC)"
 COPY_CODEC_LABEL = "原始格式 (直接下載/不轉碼)"
 STREAMING_CODEC_LABEL = "串流優化 (HEVC_NVENC Streaming)"
 PRECISE_CUT_LABEL = "精確裁切 (重新編碼)"
+SMART_CUT_LABEL = "智慧裁切 (只重新編碼頭尾)"
 VIDEO_CODECS = [
     COPY_CODEC_LABEL,
     BEST_CODEC_LABEL,
@@ -19,8 +22,14 @@ AUDIO_CODECS = ["aac", "opus", "libmp3lame", "copy"]
 # Downloader 專用：只允許 copy 模式
 DOWNLOADER_VIDEO_CODECS = [COPY_CODEC_LABEL]
 DOWNLOADER_AUDIO_CODECS = ["copy"]
-# Clipper 專用：快速裁切和精確裁切
-CLIPPER_MODES = [COPY_CODEC_LABEL, PRECISE_CUT_LABEL]
+# Clipper 專用：快速裁切、精確裁切和智慧裁切
+CLIPPER_MODES = [COPY_CODEC_LABEL, PRECISE_CUT_LABEL, SMART_CUT_LABEL]
+# Clipper 分割整個檔案：依章節、依時間點清單或每隔固定長度（一律 stream copy）
+SPLIT_BY_CHAPTERS = "依章節"
+SPLIT_BY_TIMES = "依時間點"
+SPLIT_BY_INTERVAL = "固定長度"
+SPLIT_MODES = [SPLIT_BY_CHAPTERS, SPLIT_BY_TIMES, SPLIT_BY_INTERVAL]
+DEFAULT_SPLIT_INTERVAL = "10:00"  # 每段 10 分鐘
 CONTAINER_FORMATS = ["mp4", "mkv", "mov", "avi"]
 MERGE_CONTAINER_FORMATS = ["mp4", "mkv", "mov", "avi", "ts", "mp3"]
 BATCH_VIDEO_EXTENSIONS = [".mp4", ".mkv", ".avi", ".mov", ".flv", ".webm"]
@@ -34,3 +43,20 @@ MERGE_VIDEO_EXTENSIONS = [
     ".webm",
     ".mp3",
 ]
+# 本機快取目錄（ffprobe 結果、索引、縮圖等）：使用者層級的快取位置，與啟動程式時的工作目錄無關
+CACHE_DIR = os.path.join(
+    os.environ.get("LOCALAPPDATA")
+    or os.environ.get("XDG_CACHE_HOME")
+    or os.path.join(os.path.expanduser("~"), ".cache"),
+    "url-video-clip-downloader",
+)
+# 並行設定：下載通道數與全域外部程序（ffmpeg / yt-dlp）上限
+DEFAULT_DOWNLOAD_LANES = 3
+DEFAULT_PROCESS_LIMIT = 4
+# Clipper 同時處理的裁切數；重新編碼的裁切另外受編碼器名額限制（消費級 NVENC 約 3 個工作階段）
+DEFAULT_CLIPPER_LANES = 3
+DEFAULT_ENCODER_SLOTS = 2
+# 停止工作後，外部程序有幾秒可自行結束，逾時即強制終止
+STOP_GRACE_SECONDS = 3.0
+# 背景工作進度最多每隔幾毫秒重繪一次（約 10 Hz）
+PROGRESS_REFRESH_MS = 100
@@ -1,18 +1,21 @@
 from dataclasses import dataclass, field
 from enum import Enum
-import subprocess
 import yt_dlp
-from yt_dlp.utils import sanitize_filename
+from yt_dlp.utils import sanitize_filename, download_range_func
 import os
 from typing import Callable
 import datetime
-import time
+import psutil
 
 # Import TaskController from task_utils but handle circular import if necessary or use typing only
 # Since task_utils is separate, it should be fine.
 from task_utils import TaskController
-from utils import get_low_vram_args
+from utils import format_time_str, get_low_vram_args, parse_time_str
 from constants import BEST_CODEC_LABEL, COPY_CODEC_LABEL
+from stream_resolver import resolve_streams, build_ffmpeg_inputs
+from ffmpeg_progress import FfmpegProgress, run_ffmpeg
+from info_cache import get_extractor_info
+from keyframe_index import get_cached_keyframe_index
 
 
 def log_error(error_message: str):
@@ -39,6 +42,21 @@ class DownloadStatus(Enum):
     STOPPED = "stopped"
 
 
+# Connection settings handed to aria2c when it is chosen as external downloader
+ARIA2C_DEFAULT_ARGS = ["-x", "16", "-s", "16", "-k", "1M"]
+
+
+@dataclass
+class ThroughputProfile:
+    """Network tuning for the yt-dlp download path."""
+
+    concurrent_fragments: int = 4  # HLS/DASH fragments fetched in parallel
+    http_chunk_size: int | None = 10 * 1024 * 1024  # Range request size for plain HTTP
+    buffer_size: int | None = None  # Download buffer size in bytes (yt-dlp default if None)
+    external_downloader: str | None = None  # e.g. "aria2c"
+    external_downloader_args: list[str] = field(default_factory=list)
+
+
 @dataclass
 class DownloadJob:
     url: str
@@ -55,6 +73,7 @@ class DownloadJob:
     task_controller: TaskController = None
     low_vram: bool = False
     quality: int = 30
+    throughput: ThroughputProfile = field(default_factory=ThroughputProfile)
 
 
 def _run_stoppable_ffmpeg(
@@ -62,49 +81,71 @@ def _run_stoppable_ffmpeg(
     task_controller: TaskController,
     progress_hook=None,
     info_prefix="Processing",
+    total_duration: float = 0.0,
 ):
     """Helper to run ffmpeg with stop/pause support via TaskController."""
-    process = subprocess.Popen(
-        command,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        universal_newlines=True,
-        encoding="utf-8",
-        errors="ignore",
-    )
-
-    if task_controller:
-        task_controller.set_process(process)
-
-    # We can parse output to check for errors, but for 'copy' operations progress info is limited.
-    # Still, we need to loop to allow checking for stop/pause events.
-    for line in process.stdout:
-        if task_controller:
-            # Check Stop
-            if task_controller.is_stopped():
-                process.terminate()
-                return False, "Stopped by user"
-
-            # Check Pause (Wait loop)
-            while task_controller.pause_event.is_set():
-                if task_controller.is_stopped():
-                    process.terminate()
-                    return False, "Stopped by user"
-                time.sleep(0.1)
-
-        # Optional: Parse progress if needed, but for simple clipping usually unnecessary
-        # to show percentage unless we calculate duration.
-        pass
-
-    process.wait()
-
-    if task_controller and task_controller.is_stopped():
+
+    def on_progress(progress: FfmpegProgress):
+        if progress_hook:
+            progress_hook(
+                {
+                    "status": "downloading",
+                    "info": f"{info_prefix}... {progress.summary()}",
+                    "percent": progress.percent,
+                    "downloaded_bytes": progress.total_size,
+                    "speed": progress.speed,
+                    "eta": progress.eta,
+                }
+            )
+
+    result = run_ffmpeg(command, task_controller, on_progress, total_duration)
+
+    if result.stopped:
         return False, "Stopped by user"
 
-    if process.returncode == 0:
+    if result.returncode == 0:
         return True, "Success"
     else:
-        return False, f"Process failed with code {process.returncode}"
+        detail = f": {result.stderr_tail[-1]}" if result.stderr_tail else ""
+        return False, f"Process failed with code {result.returncode}{detail}"
+
+
+def _build_throughput_opts(profile: ThroughputProfile) -> dict:
+    """Translates a ThroughputProfile into yt-dlp options."""
+    if profile is None:
+        return {}
+    opts = {"concurrent_fragment_downloads": max(1, profile.concurrent_fragments)}
+    if profile.http_chunk_size:
+        opts["http_chunk_size"] = profile.http_chunk_size
+    if profile.buffer_size:
+        opts["buffersize"] = profile.buffer_size
+    if profile.external_downloader:
+        opts["external_downloader"] = {"default": profile.external_downloader}
+        args = profile.external_downloader_args
+        if not args and profile.external_downloader == "aria2c":
+            args = ARIA2C_DEFAULT_ARGS
+        if args:
+            opts["external_downloader_args"] = {profile.external_downloader: list(args)}
+    return opts
+
+
+def _terminate_spawned_processes(output_full_path: str):
+    """
+    Terminates the processes yt-dlp started for this output: an external
+    downloader such as aria2c, or ffmpeg postprocessors. They are not
+    registered with the TaskController, and with an external downloader
+    yt-dlp only calls the progress hook when the transfer starts and ends,
+    so stopping must reach them directly.
+    """
+    stem = os.path.splitext(os.path.basename(output_full_path))[0]
+    for proc in psutil.Process().children(recursive=True):
+        try:
+            # Matches e.g. "--out=name.f137.mp4.part" or "/path/name.mp4"
+            args = [os.path.basename(arg.rsplit("=", 1)[-1]) for arg in proc.cmdline()]
+            if any(arg.startswith(stem + ".") for arg in args):
+                proc.terminate()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
 
 
 def start_download(job: DownloadJob):
@@ -150,6 +191,25 @@ def start_download(job: DownloadJob):
                     {"status": "processing", "info": "Clipping local file..."}
                 )
 
+            start = parse_time_str(job.start_time)
+            end = parse_time_str(job.end_time)
+            if end <= start:
+                raise Exception("End time must be after start time.")
+
+            if job.video_codec != BEST_CODEC_LABEL and job.progress_hook:
+                # A stream copy starts at the keyframe at or before the start time.
+                # Only reported when the file is already indexed; never worth a scan here
+                index = get_cached_keyframe_index(job.url)
+                if index is not None and not index.is_keyframe(start):
+                    actual_start = index.snap(start)
+                    job.progress_hook(
+                        {
+                            "status": "processing",
+                            "info": f"Stream copy starts at keyframe {format_time_str(actual_start)} "
+                            f"({start - actual_start:.3f}s early)",
+                        }
+                    )
+
             try:
                 # Use ffmpeg to clip the local file
                 # 使用 input seeking (-ss 在 -i 之前) 以獲得精確的裁切點並避免音影不同步
@@ -159,8 +219,9 @@ def start_download(job: DownloadJob):
                     job.start_time,  # Input seeking: 放在 -i 之前
                     "-i",
                     job.url,
-                    "-to",
-                    job.end_time,
+                    # Output timestamps count from the seek point, so give a duration
+                    "-t",
+                    f"{end - start:.6f}",
                     "-avoid_negative_ts",
                     "make_zero",  # 修正時間戳偏移問題
                 ]
@@ -188,7 +249,13 @@ def start_download(job: DownloadJob):
 
                 command.extend(["-y", output_full_path])
 
-                success, msg = _run_stoppable_ffmpeg(command, job.task_controller)
+                success, msg = _run_stoppable_ffmpeg(
+                    command,
+                    job.task_controller,
+                    job.progress_hook,
+                    "Clipping local file",
+                    end - start,
+                )
 
                 if not success:
                     if "Stopped" in msg:
@@ -224,65 +291,97 @@ def start_download(job: DownloadJob):
         else:
             # --- LOGIC FOR URLS (Original Logic) ---
             if job.start_time and job.end_time:
-                try:
-                    # Try with ffmpeg first for direct stream clipping
-                    # 使用 input seeking (-ss 在 -i 之前) 以獲得精確的裁切點並避免音影不同步
-                    command = [
-                        "ffmpeg",
-                        "-ss",
-                        job.start_time,  # Input seeking: 放在 -i 之前
-                        "-i",
-                        job.url,
-                        "-to",
-                        job.end_time,
-                        "-c",
-                        "copy",
-                        "-avoid_negative_ts",
-                        "make_zero",  # 修正時間戳偏移問題
-                        "-y",
-                        output_full_path,
-                    ]
-
-                    success, msg = _run_stoppable_ffmpeg(command, job.task_controller)
-
-                    if success:
-                        if job.progress_hook:
-                            job.progress_hook(
-                                {"status": "finished", "info": "Download finished."}
-                            )
-                        job.status = DownloadStatus.COMPLETED
-                        return
-                    elif "Stopped" in msg:
-                        job.status = DownloadStatus.STOPPED
-                        if job.progress_hook:
-                            job.progress_hook(
-                                {"status": "error", "info": "Stopped by user"}
-                            )
-                        if os.path.exists(output_full_path):
-                            try:
-                                os.remove(output_full_path)
-                            except:
-                                pass
-                        return
-                    else:
-                        # Fallback to yt-dlp if ffmpeg failed (likely due to URL type)
-                        pass
-                except Exception:
-                    pass
+                # Resolve the page URL to direct media URLs once, then let ffmpeg
+                # seek into them with range requests instead of fetching everything.
+                if job.progress_hook:
+                    job.progress_hook(
+                        {"status": "downloading", "info": "Resolving stream URLs..."}
+                    )
+                streams = resolve_streams(job.url, job.container_format)
+                if streams:
+                    try:
+                        clip_duration = parse_time_str(job.end_time) - parse_time_str(
+                            job.start_time
+                        )
+                        # 使用 input seeking (-ss 在 -i 之前) 以獲得精確的裁切點並避免音影不同步
+                        command = ["ffmpeg"]
+                        command.extend(build_ffmpeg_inputs(streams, job.start_time))
+                        if clip_duration > 0:
+                            # Input seeking resets timestamps, so the end is a duration
+                            command.extend(["-t", f"{clip_duration:.3f}"])
+                        else:
+                            command.extend(["-to", job.end_time])
+                        if streams.has_video:
+                            command.extend(["-map", "0:v:0"])
+                        if streams.audio_url:
+                            command.extend(["-map", "1:a:0"])
+                        else:
+                            command.extend(["-map", "0:a?"])
+                        command.extend(
+                            [
+                                "-c",
+                                "copy",
+                                "-avoid_negative_ts",
+                                "make_zero",  # 修正時間戳偏移問題
+                                "-y",
+                                output_full_path,
+                            ]
+                        )
+
+                        success, msg = _run_stoppable_ffmpeg(
+                            command,
+                            job.task_controller,
+                            job.progress_hook,
+                            "Downloading section",
+                            max(clip_duration, 0.0),
+                        )
+
+                        if success:
+                            if job.progress_hook:
+                                job.progress_hook(
+                                    {"status": "finished", "info": "Download finished."}
+                                )
+                            job.status = DownloadStatus.COMPLETED
+                            return
+                        elif "Stopped" in msg:
+                            job.status = DownloadStatus.STOPPED
+                            if job.progress_hook:
+                                job.progress_hook(
+                                    {"status": "error", "info": "Stopped by user"}
+                                )
+                            if os.path.exists(output_full_path):
+                                try:
+                                    os.remove(output_full_path)
+                                except:
+                                    pass
+                            return
+                        fallback_reason = msg
+                    except Exception as e:
+                        fallback_reason = str(e)
+
+                    # Fall back to yt-dlp. It writes to the same path and would take
+                    # a partial file there as already downloaded, so remove it first
+                    if os.path.exists(output_full_path):
+                        try:
+                            os.remove(output_full_path)
+                        except OSError:
+                            pass
+                    if job.progress_hook:
+                        job.progress_hook(
+                            {
+                                "status": "downloading",
+                                "info": f"Direct stream clipping failed ({fallback_reason}), "
+                                "retrying with yt-dlp...",
+                            }
+                        )
 
             # Use yt-dlp for downloading and/or clipping
 
             # Hook wrapper to inject stop/pause logic into yt-dlp
             def wrapped_hook(d):
-                if job.task_controller:
-                    if job.task_controller.is_stopped():
-                        raise Exception("Stopped by user")
-
-                    # Pause logic: loop sleep
-                    while job.task_controller.pause_event.is_set():
-                        if job.task_controller.is_stopped():
-                            raise Exception("Stopped by user")
-                        time.sleep(0.5)
+                # Blocks (without waking up) while paused; False once stopped
+                if job.task_controller and not job.task_controller.wait_while_paused():
+                    raise Exception("Stopped by user")
 
                 if job.progress_hook:
                     job.progress_hook(d)
@@ -291,12 +390,30 @@ def start_download(job: DownloadJob):
                 "outtmpl": output_full_path,
                 "progress_hooks": [wrapped_hook],
             }
+            # Parallel fragments / chunked HTTP / external downloader. yt-dlp calls
+            # wrapped_hook for every fragment it downloads itself; an external
+            # downloader only reports start and end, so it can't be paused and
+            # stopping terminates it directly (see _terminate_spawned_processes).
+            ydl_opts.update(_build_throughput_opts(job.throughput))
+
+            # Request only the wanted section instead of downloading everything and
+            # trimming afterwards. Copy mode snaps to keyframes like the direct
+            # ffmpeg path; re-encoding codecs get frame-accurate cuts.
+            if job.start_time or job.end_time:
+                section_start = parse_time_str(job.start_time) if job.start_time else 0.0
+                section_end = (
+                    parse_time_str(job.end_time) if job.end_time else float("inf")
+                )
+                ydl_opts["download_ranges"] = download_range_func(
+                    None, [(section_start, section_end)]
+                )
+                ydl_opts["force_keyframes_at_cuts"] = job.video_codec not in (
+                    None,
+                    "copy",
+                    COPY_CODEC_LABEL,
+                )
 
             postprocessor_args = []
-            if job.start_time:
-                postprocessor_args.extend(["-ss", job.start_time])
-            if job.end_time:
-                postprocessor_args.extend(["-to", job.end_time])
 
             # Add codec options if they are not 'copy'
             if job.video_codec == BEST_CODEC_LABEL:
@@ -342,15 +459,31 @@ def start_download(job: DownloadJob):
                 ]
                 ydl_opts["postprocessor_args"] = postprocessor_args
 
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([job.url])
+            def on_stop():
+                _terminate_spawned_processes(output_full_path)
+
+            if job.task_controller:
+                job.task_controller.add_stop_callback(on_stop)
+            try:
+                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                    # Reuse the page extraction from earlier clips of the same URL
+                    info = get_extractor_info(job.url, ydl)
+                    if info is not None:
+                        ydl.process_ie_result(info, download=True)
+                    else:
+                        ydl.download([job.url])
+            finally:
+                if job.task_controller:
+                    job.task_controller.remove_stop_callback(on_stop)
             job.status = DownloadStatus.COMPLETED
             if job.progress_hook:
                 job.progress_hook({"status": "finished", "info": "Download finished."})
 
     except yt_dlp.utils.DownloadError as e:
         error_msg = str(e)
-        if "Stopped by user" in error_msg:
+        # A terminated external downloader surfaces as an ordinary download error
+        stopped = job.task_controller and job.task_controller.is_stopped()
+        if stopped or "Stopped by user" in error_msg:
             job.status = DownloadStatus.STOPPED
             if job.progress_hook:
                 job.progress_hook({"status": "error", "info": "Stopped by user"})
@@ -4,13 +4,26 @@ Editor 模組 - 進階影片編輯功能
 """
 
 import cv2
+import numpy as np
 import subprocess
 import os
 import json
+import math
+import bisect
+import hashlib
+import re
+import tempfile
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from typing import List, Tuple, Optional, Callable
 from PIL import Image, ImageTk
 
+from constants import CACHE_DIR
+from media_cache import get_cache
+from ffmpeg_progress import FfmpegProgress, run_ffmpeg
+from task_utils import process_group_kwargs
+
 # 預設輸出比例選項
 ASPECT_RATIOS = {
     "自由": None,
@@ -24,6 +37,25 @@ ASPECT_RATIOS = {
 # 預覽視窗大小
 PREVIEW_SIZE = (960, 540)
 
+# 拖動裁切框時的重繪間隔（毫秒，約 60 Hz，滑鼠事件合併後再重繪）
+DRAG_REDRAW_INTERVAL_MS = 16
+
+# 預覽幀快取上限（位元組，以預覽解析度 RGB 計算，約 250 幀 960×540）
+FRAME_CACHE_BYTES = 384 * 1024 * 1024
+
+# 背景預取：播放頭前後各預先解碼幾幀
+PREFETCH_AHEAD_FRAMES = 12
+PREFETCH_BEHIND_FRAMES = 4
+
+# 縮圖膠卷：每隔幾秒一張縮圖，縮圖高度（像素）
+FILMSTRIP_INTERVAL_S = 10
+FILMSTRIP_THUMB_HEIGHT = 54
+FILMSTRIP_DIR = os.path.join(CACHE_DIR, "filmstrips")
+
+# 目標幀在目前位置之後多少幀以內時，直接往後讀取而不重新 seek
+# （seek 必須從前一個 I 幀重新解碼，4K 長 GOP 影片往往比連續讀幾十幀還慢）
+SEQUENTIAL_READ_FRAMES = 48
+
 
 @dataclass
 class CropRegion:
@@ -61,7 +93,7 @@ class EditorProject:
 class VideoFrameReader:
     """影片幀讀取器"""
 
-    def __init__(self, video_path: str):
+    def __init__(self, video_path: str, cache_bytes: int = FRAME_CACHE_BYTES):
         self.video_path = video_path
         self.cap = None
         self.width = 0
@@ -69,6 +101,16 @@ class VideoFrameReader:
         self.fps = 30.0
         self.total_frames = 0
         self.duration_ms = 0
+        # 預覽幀 LRU 快取：(幀索引, 預覽尺寸) -> PIL Image
+        self.cache_bytes = cache_bytes
+        self._frame_cache: "OrderedDict[tuple, Image.Image]" = OrderedDict()
+        self._cached_bytes = 0
+        # 下一次 read() 會得到的幀索引（None 表示未知，需要 seek）
+        self._next_index = None
+        # 解碼與快取分開上鎖：背景解碼時主執行緒仍可查詢快取
+        self._decode_lock = threading.RLock()
+        self._cache_lock = threading.Lock()
+        self._resize_buffer = None  # 預覽縮放用的緩衝區（重複使用）
         self._open()
 
     def _open(self):
@@ -84,16 +126,46 @@ class VideoFrameReader:
         self.duration_ms = (
             int((self.total_frames / self.fps) * 1000) if self.fps > 0 else 0
         )
-
-    def get_frame_at_ms(self, time_ms: int) -> Optional[Image.Image]:
-        """取得指定時間的幀（PIL Image）"""
+        self._next_index = 0
+
+    def frame_index_at_ms(self, time_ms: int) -> int:
+        """時間（毫秒）轉換為幀索引"""
+        fps = self.fps if self.fps > 0 else 30.0
+        index = int(time_ms * fps / 1000 + 1e-6)
+        if self.total_frames > 0:
+            index = min(index, self.total_frames - 1)
+        return max(0, index)
+
+    def _read_frame(self, index: int):
+        """解碼指定索引的幀（BGR ndarray）
+
+        目標在目前位置稍後時用 grab() 往後跳（只解碼不轉換），
+        否則才 seek。
+        """
         if not self.cap:
             return None
 
-        self.cap.set(cv2.CAP_PROP_POS_MSEC, time_ms)
-        ret, frame = self.cap.read()
+        ahead = None if self._next_index is None else index - self._next_index
+        if ahead is None or ahead < 0 or ahead > SEQUENTIAL_READ_FRAMES:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+        else:
+            for _ in range(ahead):
+                if not self.cap.grab():
+                    self._next_index = None
+                    return None
 
+        ret, frame = self.cap.read()
         if not ret:
+            self._next_index = None
+            return None
+        self._next_index = index + 1
+        return frame
+
+    def get_frame_at_ms(self, time_ms: int) -> Optional[Image.Image]:
+        """取得指定時間的原尺寸幀（PIL Image）；預覽請用 get_frame_for_preview"""
+        with self._decode_lock:
+            frame = self._read_frame(self.frame_index_at_ms(time_ms))
+        if frame is None:
             return None
 
         # BGR to RGB
@@ -103,48 +175,400 @@ class VideoFrameReader:
     def get_frame_for_preview(
         self, time_ms: int, preview_size: Tuple[int, int] = PREVIEW_SIZE
     ) -> Optional[Image.Image]:
-        """取得縮放後的預覽幀"""
-        frame = self.get_frame_at_ms(time_ms)
-        if frame:
-            # 保持比例縮放
-            frame.thumbnail(preview_size, Image.Resampling.LANCZOS)
+        """取得縮放後的預覽幀
+
+        結果會放入快取並由多次呼叫共用，呼叫端不應修改回傳的影像。
+        """
+        frame = self.get_cached_preview(time_ms, preview_size)
+        if frame is not None:
+            return frame
+
+        key = (self.frame_index_at_ms(time_ms), tuple(preview_size))
+        with self._decode_lock:
+            # 等鎖期間可能已由其他執行緒解碼完成
+            frame = self.get_cached_preview(time_ms, preview_size)
+            if frame is not None:
+                return frame
+            bgr = self._read_frame(key[0])
+            if bgr is None:
+                return None
+            frame = self._to_preview_image(bgr, preview_size)
+            self._cache_frame(key, frame)
         return frame
 
+    def _to_preview_image(self, bgr, preview_size: Tuple[int, int]) -> Image.Image:
+        """BGR 原尺寸幀 → 預覽尺寸 PIL Image
+
+        先在 OpenCV 端以 INTER_AREA 縮小（寫入重複使用的緩衝區），
+        再只對小圖做色彩轉換，避免每次都配置與濾波整張 4K 影像。
+        須持有 _decode_lock。
+        """
+        src_h, src_w = bgr.shape[:2]
+        # 保持比例縮放（與 PIL thumbnail 相同：只縮小不放大）
+        scale = min(preview_size[0] / src_w, preview_size[1] / src_h, 1.0)
+        dst_w = max(1, round(src_w * scale))
+        dst_h = max(1, round(src_h * scale))
+
+        if (dst_w, dst_h) != (src_w, src_h):
+            buf = self._resize_buffer
+            if buf is None or buf.shape != (dst_h, dst_w, 3):
+                buf = self._resize_buffer = np.empty((dst_h, dst_w, 3), dtype=np.uint8)
+            cv2.resize(bgr, (dst_w, dst_h), dst=buf, interpolation=cv2.INTER_AREA)
+            bgr = buf
+
+        # 色彩轉換輸出新的陣列：影像會進快取，不能與緩衝區共用記憶體
+        return Image.fromarray(cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB))
+
+    def get_cached_preview(
+        self, time_ms: int, preview_size: Tuple[int, int] = PREVIEW_SIZE
+    ) -> Optional[Image.Image]:
+        """只查快取，不解碼（未命中回傳 None，可在主執行緒呼叫）"""
+        key = (self.frame_index_at_ms(time_ms), tuple(preview_size))
+        with self._cache_lock:
+            frame = self._frame_cache.get(key)
+            if frame is not None:
+                self._frame_cache.move_to_end(key)
+            return frame
+
+    def _cache_frame(self, key, frame: Image.Image):
+        """加入快取，超過位元組上限時淘汰最久未使用的幀"""
+        nbytes = frame.width * frame.height * len(frame.getbands())
+        if nbytes > self.cache_bytes:
+            return
+        with self._cache_lock:
+            if key in self._frame_cache:
+                return
+            self._frame_cache[key] = frame
+            self._cached_bytes += nbytes
+            while self._cached_bytes > self.cache_bytes:
+                _, old = self._frame_cache.popitem(last=False)
+                self._cached_bytes -= old.width * old.height * len(old.getbands())
+
+    def clear_cache(self):
+        """清除預覽幀快取"""
+        with self._cache_lock:
+            self._frame_cache.clear()
+            self._cached_bytes = 0
+
     def close(self):
         """關閉影片"""
-        if self.cap:
-            self.cap.release()
-            self.cap = None
+        with self._decode_lock:
+            if self.cap:
+                self.cap.release()
+                self.cap = None
+            self._next_index = None
+        self.clear_cache()
 
     def __del__(self):
         self.close()
 
 
+class FramePrefetcher:
+    """背景解碼預覽幀
+
+    只保留最新的請求（拖動時間軸時舊請求直接丟棄），解碼完成後呼叫
+    on_frame(time_ms, frame)；閒置時預先解碼播放頭附近的幀放入讀取器快取。
+    on_frame 在背景執行緒呼叫，GUI 端需自行透過 after() 轉回主執行緒。
+    """
+
+    def __init__(
+        self,
+        reader: VideoFrameReader,
+        on_frame: Callable[[int, Optional[Image.Image]], None],
+        preview_size: Tuple[int, int] = PREVIEW_SIZE,
+    ):
+        self.reader = reader
+        self.on_frame = on_frame
+        self.preview_size = preview_size
+        self._cond = threading.Condition()
+        self._pending = None  # 最新的請求時間（毫秒）
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def request(self, time_ms: int):
+        """請求某時間的幀，取代尚未處理的舊請求"""
+        with self._cond:
+            self._pending = time_ms
+            self._cond.notify()
+
+    def _has_new_request(self) -> bool:
+        with self._cond:
+            return self._pending is not None or self._stopped
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                time_ms = self._pending
+                self._pending = None
+
+            try:
+                frame = self.reader.get_frame_for_preview(time_ms, self.preview_size)
+            except Exception:
+                frame = None
+            if self._has_new_request():
+                continue
+            self.on_frame(time_ms, frame)
+            self._prefetch_around(time_ms)
+
+    def _prefetch_around(self, time_ms: int):
+        """預先解碼播放頭附近的幀；有新請求時立即中斷"""
+        fps = self.reader.fps if self.reader.fps > 0 else 30.0
+        base_index = self.reader.frame_index_at_ms(time_ms)
+        # 先往後（連續讀取很便宜），再往前（需要 seek）
+        offsets = list(range(1, PREFETCH_AHEAD_FRAMES + 1)) + [
+            -i for i in range(1, PREFETCH_BEHIND_FRAMES + 1)
+        ]
+        for offset in offsets:
+            if self._has_new_request():
+                return
+            index = base_index + offset
+            if index < 0 or (self.reader.total_frames and index >= self.reader.total_frames):
+                continue
+            # 取該幀起點向上取整的毫秒，避免截斷後落回前一幀
+            target = math.ceil(index * 1000 / fps)
+            if self.reader.get_cached_preview(target, self.preview_size) is None:
+                try:
+                    self.reader.get_frame_for_preview(target, self.preview_size)
+                except Exception:
+                    return
+
+    def stop(self):
+        """停止背景執行緒"""
+        with self._cond:
+            self._stopped = True
+            self._pending = None
+            self._cond.notify()
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+
+
+@dataclass
+class Filmstrip:
+    """縮圖膠卷：所有縮圖由上而下拼成一張圖"""
+
+    interval_s: float
+    thumb_width: int
+    thumb_height: int
+    image: Image.Image
+
+    @property
+    def count(self) -> int:
+        return self.image.height // self.thumb_height if self.thumb_height else 0
+
+    def index_at(self, time_ms: int) -> int:
+        """最接近指定時間的縮圖索引"""
+        if self.count == 0:
+            return 0
+        index = int(round(time_ms / 1000 / self.interval_s))
+        return max(0, min(index, self.count - 1))
+
+    def thumbnail(self, index: int) -> Image.Image:
+        """取出第 index 張縮圖"""
+        y = index * self.thumb_height
+        return self.image.crop((0, y, self.thumb_width, y + self.thumb_height))
+
+
+def _filmstrip_image_name(video_path: str) -> str:
+    digest = hashlib.sha1(os.path.abspath(video_path).encode("utf-8")).hexdigest()
+    return f"{digest}.png"
+
+
+def load_cached_filmstrip(
+    video_path: str,
+    interval_s: float = FILMSTRIP_INTERVAL_S,
+    thumb_height: int = FILMSTRIP_THUMB_HEIGHT,
+) -> Optional[Filmstrip]:
+    """讀取已存的縮圖膠卷（影片修改過或參數不同時視為不存在）"""
+    meta = get_cache().get("filmstrip", video_path)
+    if (
+        not isinstance(meta, dict)
+        or meta.get("interval_s") != interval_s
+        or meta.get("thumb_height") != thumb_height
+    ):
+        return None
+    try:
+        # 快取只記檔名，實際位置以 FILMSTRIP_DIR 為準
+        image = Image.open(os.path.join(FILMSTRIP_DIR, meta["image"]))
+        image.load()
+    except (OSError, KeyError):
+        return None
+    return Filmstrip(
+        interval_s=interval_s,
+        thumb_width=meta["thumb_width"],
+        thumb_height=meta["thumb_height"],
+        image=image.convert("RGB"),
+    )
+
+
+def _save_filmstrip(video_path: str, strip: Filmstrip):
+    image_name = _filmstrip_image_name(video_path)
+    image_path = os.path.join(FILMSTRIP_DIR, image_name)
+    try:
+        os.makedirs(FILMSTRIP_DIR, exist_ok=True)
+        strip.image.save(image_path, "PNG")
+    except OSError:
+        return
+    get_cache().put(
+        "filmstrip",
+        video_path,
+        {
+            "interval_s": strip.interval_s,
+            "thumb_width": strip.thumb_width,
+            "thumb_height": strip.thumb_height,
+            "image": image_name,
+        },
+        # 圖檔大小計入快取上限，快取項目被淘汰時一併刪除
+        attachment=image_path,
+    )
+
+
+def build_filmstrip(
+    video_path: str,
+    video_width: int,
+    video_height: int,
+    interval_s: float = FILMSTRIP_INTERVAL_S,
+    thumb_height: int = FILMSTRIP_THUMB_HEIGHT,
+    task_controller=None,
+) -> Optional[Filmstrip]:
+    """
+    產生縮圖膠卷
+
+    FFmpeg 只解碼關鍵幀（-skip_frame nokey），再用 fps 濾鏡每 interval_s 秒取一張，
+    整支影片只需一次循序讀取。
+    """
+    if video_width <= 0 or video_height <= 0:
+        return None
+    # yuv 縮放需要偶數尺寸
+    thumb_width = max(2, int(round(thumb_height * video_width / video_height / 2)) * 2)
+    frame_bytes = thumb_width * thumb_height * 3
+
+    command = [
+        "ffmpeg",
+        "-v",
+        "error",
+        "-skip_frame",
+        "nokey",
+        "-i",
+        video_path,
+        "-an",
+        "-vf",
+        f"fps=1/{interval_s},scale={thumb_width}:{thumb_height}",
+        "-f",
+        "rawvideo",
+        "-pix_fmt",
+        "rgb24",
+        "pipe:1",
+    ]
+
+    thumbs = []
+    try:
+        process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            **process_group_kwargs(),
+        )
+    except OSError:
+        return None
+
+    if task_controller:
+        task_controller.add_process(process)
+    try:
+        while True:
+            data = process.stdout.read(frame_bytes)
+            if len(data) < frame_bytes:
+                break
+            thumbs.append(data)
+        process.wait()
+    finally:
+        if task_controller:
+            task_controller.remove_process(process)
+
+    if (task_controller and task_controller.is_stopped()) or not thumbs:
+        return None
+
+    # rawvideo 依序排列的幀剛好就是直向堆疊的縮圖
+    image = Image.frombytes(
+        "RGB", (thumb_width, thumb_height * len(thumbs)), b"".join(thumbs)
+    )
+    return Filmstrip(interval_s, thumb_width, thumb_height, image)
+
+
+def get_filmstrip(
+    video_path: str,
+    video_width: int,
+    video_height: int,
+    interval_s: float = FILMSTRIP_INTERVAL_S,
+    thumb_height: int = FILMSTRIP_THUMB_HEIGHT,
+    task_controller=None,
+    budget=None,
+) -> Optional[Filmstrip]:
+    """
+    取得縮圖膠卷：有快取就直接使用，否則產生後存入快取
+
+    有給 budget（ProcessBudget）時，只有真的要跑 FFmpeg 才佔用名額。
+    """
+    strip = load_cached_filmstrip(video_path, interval_s, thumb_height)
+    if strip is not None:
+        return strip
+    if budget is not None:
+        with budget.slot(task_controller) as acquired:
+            if not acquired:
+                return None
+            strip = build_filmstrip(
+                video_path, video_width, video_height, interval_s, thumb_height,
+                task_controller,
+            )
+    else:
+        strip = build_filmstrip(
+            video_path, video_width, video_height, interval_s, thumb_height,
+            task_controller,
+        )
+    if strip is not None:
+        _save_filmstrip(video_path, strip)
+    return strip
+
+
 class KeyframeManager:
-    """關鍵幀管理器"""
+    """關鍵幀管理器
+
+    keyframes 依時間排序；_times 是對應的時間索引，插入/刪除以 bisect 維護。
+    """
 
     def __init__(self):
         self.keyframes: List[Keyframe] = []
+        self._times: List[int] = []
 
     def add_keyframe(self, time_ms: int, crop: CropRegion) -> Keyframe:
         """新增關鍵幀"""
-        # 移除同一時間點的舊關鍵幀
-        self.keyframes = [kf for kf in self.keyframes if kf.time_ms != time_ms]
-
         kf = Keyframe(time_ms=time_ms, crop=crop)
-        self.keyframes.append(kf)
-        self.keyframes.sort(key=lambda x: x.time_ms)
+        i = bisect.bisect_left(self._times, time_ms)
+        if i < len(self._times) and self._times[i] == time_ms:
+            # 取代同一時間點的舊關鍵幀
+            self.keyframes[i] = kf
+        else:
+            self._times.insert(i, time_ms)
+            self.keyframes.insert(i, kf)
         return kf
 
     def remove_keyframe(self, time_ms: int):
         """移除指定時間的關鍵幀"""
-        self.keyframes = [kf for kf in self.keyframes if kf.time_ms != time_ms]
+        i = bisect.bisect_left(self._times, time_ms)
+        if i < len(self._times) and self._times[i] == time_ms:
+            del self._times[i]
+            del self.keyframes[i]
 
     def get_keyframe_at(self, time_ms: int) -> Optional[Keyframe]:
         """取得指定時間的關鍵幀（如果存在）"""
-        for kf in self.keyframes:
-            if kf.time_ms == time_ms:
-                return kf
+        i = bisect.bisect_left(self._times, time_ms)
+        if i < len(self._times) and self._times[i] == time_ms:
+            return self.keyframes[i]
         return None
 
     def interpolate_crop(self, time_ms: int) -> Optional[CropRegion]:
@@ -152,31 +576,21 @@ class KeyframeManager:
         if not self.keyframes:
             return None
 
-        if len(self.keyframes) == 1:
-            return self.keyframes[0].crop
-
-        # 找到前後關鍵幀
-        prev_kf = None
-        next_kf = None
-
-        for kf in self.keyframes:
-            if kf.time_ms <= time_ms:
-                prev_kf = kf
-            if kf.time_ms >= time_ms and next_kf is None:
-                next_kf = kf
+        # 第一個時間 > time_ms 的關鍵幀
+        i = bisect.bisect_right(self._times, time_ms)
 
         # 如果在第一個關鍵幀之前
-        if prev_kf is None:
+        if i == 0:
             return self.keyframes[0].crop
 
-        # 如果在最後一個關鍵幀之後
-        if next_kf is None:
-            return self.keyframes[-1].crop
+        prev_kf = self.keyframes[i - 1]
 
-        # 如果剛好在關鍵幀上
-        if prev_kf.time_ms == time_ms:
+        # 如果剛好在關鍵幀上，或在最後一個關鍵幀之後
+        if prev_kf.time_ms == time_ms or i == len(self.keyframes):
             return prev_kf.crop
 
+        next_kf = self.keyframes[i]
+
         # 線性插值
         t = (time_ms - prev_kf.time_ms) / (next_kf.time_ms - prev_kf.time_ms)
 
@@ -191,9 +605,177 @@ class KeyframeManager:
             ),
         )
 
+    def interpolate_crops(
+        self, times_ms
+    ) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        批次計算多個時間點的插值裁切區域
+
+        回傳 (x, y, width, height) 四個 int64 陣列，與 interpolate_crop 逐點結果相同；
+        沒有關鍵幀時回傳 None。
+        """
+        if not self.keyframes:
+            return None
+
+        times = np.asarray(times_ms, dtype=np.float64).reshape(-1)
+        kf_times = np.asarray(self._times, dtype=np.float64)
+        values = np.array(
+            [
+                (kf.crop.x, kf.crop.y, kf.crop.width, kf.crop.height)
+                for kf in self.keyframes
+            ],
+            dtype=np.float64,
+        )
+
+        # 每個時間點的前後關鍵幀（超出範圍時前後相同 → 取端點）
+        upper = np.searchsorted(kf_times, times, side="right")
+        prev_idx = np.clip(upper - 1, 0, len(kf_times) - 1)
+        next_idx = np.clip(upper, 0, len(kf_times) - 1)
+
+        span = kf_times[next_idx] - kf_times[prev_idx]
+        frac = np.zeros_like(times)
+        moving = span > 0
+        frac[moving] = (times[moving] - kf_times[prev_idx][moving]) / span[moving]
+
+        prev_values = values[prev_idx]
+        result = prev_values + frac[:, None] * (values[next_idx] - prev_values)
+        # 與 int() 相同，向零截斷
+        result = np.trunc(result).astype(np.int64)
+        return result[:, 0], result[:, 1], result[:, 2], result[:, 3]
+
     def clear(self):
         """清除所有關鍵幀"""
         self.keyframes.clear()
+        self._times.clear()
+
+
+PAN_FILTER_NAME = "crop@pan"
+ZOOM_FILTER_NAME = "scale@zoom"
+
+
+def _even(value: float) -> int:
+    """yuv420 編碼需要偶數尺寸"""
+    return max(2, int(value) // 2 * 2)
+
+
+def _sample_crops(
+    keyframe_manager: KeyframeManager,
+    start_time_ms: int,
+    end_time_ms: Optional[int],
+    fps: float,
+) -> List[Tuple[float, CropRegion]]:
+    """
+    逐幀取樣插值裁切區域，回傳 [(輸出時間秒, 裁切區域)]
+
+    第一筆是起始裁切；之後只列出與前一幀不同的幀。第一個關鍵幀之前與
+    最後一個之後裁切固定，不需取樣。
+    """
+    keyframes = keyframe_manager.keyframes
+    samples = [(0.0, keyframe_manager.interpolate_crop(start_time_ms))]
+    if len(keyframes) < 2:
+        return samples
+
+    fps = fps if fps and fps > 0 else 30.0
+    first_ms = max(start_time_ms, keyframes[0].time_ms)
+    last_ms = keyframes[-1].time_ms
+    if end_time_ms is not None:
+        last_ms = min(last_ms, end_time_ms)
+
+    first_index = math.ceil((first_ms - start_time_ms) * fps / 1000)
+    last_index = math.floor((last_ms - start_time_ms) * fps / 1000 + 1e-9)
+    if last_index < first_index:
+        return samples
+
+    # 一次算完所有幀的插值，再挑出數值有變化的幀
+    times_ms = start_time_ms + np.arange(first_index, last_index + 1) * 1000 / fps
+    xs, ys, ws, hs = keyframe_manager.interpolate_crops(times_ms)
+    first = samples[0][1]
+    values = np.stack([xs, ys, ws, hs], axis=1)
+    previous = np.vstack(
+        [[first.x, first.y, first.width, first.height], values[:-1]]
+    )
+    for i in np.flatnonzero(np.any(values != previous, axis=1)):
+        x, y, w, h = (int(v) for v in values[i])
+        samples.append(
+            ((times_ms[i] - start_time_ms) / 1000, CropRegion(x=x, y=y, width=w, height=h))
+        )
+    return samples
+
+
+def build_crop_filter(
+    keyframe_manager: KeyframeManager,
+    output_width: int,
+    output_height: int,
+    start_time_ms: int = 0,
+    end_time_ms: int = None,
+    fps: float = 30.0,
+) -> Tuple[str, str]:
+    """
+    產生動態裁切濾鏡與對應的 sendcmd 指令稿，回傳 (濾鏡, 指令稿)
+
+    - 所有關鍵幀裁切尺寸相同（平移）：crop 固定尺寸，只以指令移動 x/y，再 scale 到輸出尺寸。
+    - 尺寸不同（縮放）：FFmpeg 的 crop 無法在執行中改變輸出尺寸，因此改為先裁出所有
+      裁切區域的聯集，以指令改變 scale 的尺寸，讓裁切區域剛好放大成輸出尺寸，
+      再用固定輸出尺寸的 crop 以指令移動 x/y。
+    指令稿為空字串表示裁切固定，不需要 sendcmd。
+    """
+    samples = _sample_crops(keyframe_manager, start_time_ms, end_time_ms, fps)
+    crops = [crop for _, crop in samples]
+    lines = []
+
+    if len({(c.width, c.height) for c in crops}) == 1:
+        first = crops[0]
+        crop_filter = (
+            f"{PAN_FILTER_NAME}=w={_even(first.width)}:h={_even(first.height)}"
+            f":x={first.x}:y={first.y},scale={output_width}:{output_height}"
+        )
+        for t, crop in samples[1:]:
+            lines.append(
+                f"{t:.4f} {PAN_FILTER_NAME} x {crop.x}, {PAN_FILTER_NAME} y {crop.y};"
+            )
+        return crop_filter, "\n".join(lines)
+
+    # 縮放：先裁出聯集區域，限制需要放大的畫面大小
+    ux = min(c.x for c in crops)
+    uy = min(c.y for c in crops)
+    uw = _even(max(c.x + c.width for c in crops) - ux)
+    uh = _even(max(c.y + c.height for c in crops) - uy)
+
+    def zoom_values(crop: CropRegion) -> Tuple[int, int, int, int]:
+        sx = output_width / max(1, crop.width)
+        sy = output_height / max(1, crop.height)
+        return (
+            max(output_width, _even(uw * sx)),
+            max(output_height, _even(uh * sy)),
+            round((crop.x - ux) * sx),
+            round((crop.y - uy) * sy),
+        )
+
+    sw, sh, px, py = zoom_values(crops[0])
+    crop_filter = (
+        f"crop={uw}:{uh}:{ux}:{uy},"
+        f"{ZOOM_FILTER_NAME}=w={sw}:h={sh},"
+        f"{PAN_FILTER_NAME}=w={output_width}:h={output_height}:x={px}:y={py}"
+    )
+    previous = (sw, sh, px, py)
+    for t, crop in samples[1:]:
+        values = zoom_values(crop)
+        if values == previous:
+            continue
+        sw, sh, px, py = values
+        lines.append(
+            f"{t:.4f} {ZOOM_FILTER_NAME} w {sw}, {ZOOM_FILTER_NAME} h {sh}, "
+            f"{PAN_FILTER_NAME} x {px}, {PAN_FILTER_NAME} y {py};"
+        )
+        previous = values
+    return crop_filter, "\n".join(lines)
+
+
+def _escape_filter_path(path: str) -> str:
+    """跳脫濾鏡參數中的檔案路徑（選項值一層、濾鏡圖一層）"""
+    path = path.replace("\\", "/")
+    path = re.sub(r"([\\':])", r"\\\1", path)
+    return re.sub(r"([\\'\[\],;])", r"\\\1", path)
 
 
 def export_video_with_keyframes(
@@ -205,25 +787,37 @@ def export_video_with_keyframes(
     start_time_ms: int = 0,
     end_time_ms: int = None,
     progress_callback: Callable[[int], None] = None,
+    fps: float = 30.0,
 ) -> Tuple[bool, str]:
     """
     使用關鍵幀匯出裁切影片
 
-    由於 FFmpeg 的 crop 濾鏡不支援動態參數，
-    對於有多個關鍵幀的情況，需要使用其他方法。
-
-    簡化版本：使用第一個關鍵幀的固定裁切。
-    進階版本需要逐幀處理或使用 FFmpeg 的 sendcmd 濾鏡。
+    由 KeyframeManager 插值產生 sendcmd 指令稿，在同一次 FFmpeg 執行中逐幀改變
+    裁切區域（見 build_crop_filter），不需在 Python 逐幀處理。
+    輸出尺寸固定為 output_width×output_height。
     """
     if not keyframe_manager.keyframes:
         return False, "沒有設定任何關鍵幀"
 
-    # 取得第一個關鍵幀的裁切區域（簡化版本）
-    # TODO: 進階版本需要支援動態裁切
-    crop = keyframe_manager.keyframes[0].crop
+    crop_filter, commands = build_crop_filter(
+        keyframe_manager,
+        output_width,
+        output_height,
+        start_time_ms,
+        end_time_ms,
+        fps,
+    )
+
+    # 多個關鍵幀時寫出指令稿
+    script_path = None
+    if commands:
+        fd, script_path = tempfile.mkstemp(prefix="crop_", suffix=".cmd")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(commands)
+        crop_filter = f"sendcmd=f={_escape_filter_path(script_path)},{crop_filter}"
 
     # 構建 FFmpeg 命令
-    filter_complex = f"crop={crop.width}:{crop.height}:{crop.x}:{crop.y},scale={output_width}:{output_height}"
+    filter_complex = crop_filter
 
     command = ["ffmpeg", "-y"]
 
@@ -256,28 +850,27 @@ def export_video_with_keyframes(
         ]
     )
 
-    try:
-        process = subprocess.Popen(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            universal_newlines=True,
-            encoding="utf-8",
-            errors="ignore",
-        )
-
-        for line in process.stdout:
-            pass  # 可解析進度
+    def on_progress(progress: FfmpegProgress):
+        if progress_callback and progress.percent is not None:
+            progress_callback(int(progress.percent))
 
-        process.wait()
+    try:
+        total_duration = (end_time_ms - start_time_ms) / 1000 if end_time_ms else 0.0
+        result = run_ffmpeg(command, None, on_progress, total_duration)
 
-        if process.returncode == 0:
+        if result.returncode == 0:
             return True, f"匯出成功: {output_path}"
         else:
-            return False, f"FFmpeg 錯誤，返回碼: {process.returncode}"
+            return False, f"FFmpeg 錯誤，返回碼: {result.returncode}\n{result.log}"
 
     except Exception as e:
         return False, str(e)
+    finally:
+        if script_path:
+            try:
+                os.remove(script_path)
+            except OSError:
+                pass
 
 
 def format_time(ms: int) -> str:
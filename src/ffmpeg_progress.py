@@ -0,0 +1,222 @@
+"""
+Shared ffmpeg runner with structured progress reporting.
+
+ffmpeg is run with `-progress pipe:1 -nostats`, so stdout carries nothing but
+key=value blocks, each terminated by a `progress=continue|end` line. stderr is
+drained on its own thread into a short tail buffer (for error messages) and is
+only scanned for the input duration when the caller doesn't know it.
+Progress callbacks receive an FfmpegProgress and are throttled to
+`min_interval` seconds, except for the final block.
+"""
+
+import re
+import subprocess
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable
+
+from task_utils import TaskController, process_group_kwargs
+from utils import parse_time_str
+
+# Minimum time between two progress callbacks
+DEFAULT_PROGRESS_INTERVAL = 0.25
+# stderr lines kept for error messages
+STDERR_TAIL_LINES = 20
+
+PROGRESS_ARGS = ["-progress", "pipe:1", "-nostats"]
+
+_duration_pattern = re.compile(r"Duration:\s(\d{2}:\d{2}:\d{2}\.\d{2})")
+
+
+@dataclass
+class FfmpegProgress:
+    """One parsed -progress block."""
+
+    out_time: float = 0.0  # seconds of output written so far
+    total_duration: float = 0.0  # expected output duration (0 if unknown)
+    speed: float | None = None  # x realtime
+    fps: float | None = None
+    frame: int | None = None
+    total_size: int | None = None  # bytes written so far
+    finished: bool = False
+
+    @property
+    def percent(self) -> float | None:
+        if self.finished:
+            return 100.0
+        if self.total_duration > 0:
+            return min(100.0, self.out_time / self.total_duration * 100)
+        return None
+
+    @property
+    def eta(self) -> float | None:
+        """Seconds left, estimated from the current speed."""
+        if self.total_duration <= 0 or not self.speed:
+            return None
+        return max(0.0, (self.total_duration - self.out_time) / self.speed)
+
+    def summary(self) -> str:
+        """Short human readable status, e.g. '42.0% | 3.10x | ETA 01:23'."""
+        percent = self.percent
+        if percent is not None:
+            parts = [f"{percent:.1f}%"]
+        else:
+            parts = [_format_seconds(self.out_time)]
+        if self.speed:
+            parts.append(f"{self.speed:.2f}x")
+        eta = self.eta
+        if eta is not None and not self.finished:
+            parts.append(f"ETA {_format_seconds(eta)}")
+        return " | ".join(parts)
+
+
+@dataclass
+class FfmpegResult:
+    returncode: int
+    stopped: bool = False
+    timed_out: bool = False
+    stderr_tail: list[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and not self.stopped and not self.timed_out
+
+    @property
+    def log(self) -> str:
+        return "\n".join(self.stderr_tail)
+
+
+def _format_seconds(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours:d}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+
+def _parse_number(value: str):
+    try:
+        return float(value.rstrip("x"))
+    except ValueError:
+        return None  # "N/A"
+
+
+def with_progress_args(command: list) -> list:
+    """Returns command with -progress pipe:1 -nostats added after the executable."""
+    if "-progress" in command:
+        return list(command)
+    return [command[0], *PROGRESS_ARGS, *command[1:]]
+
+
+def run_ffmpeg(
+    command: list,
+    task_controller: TaskController = None,
+    on_progress: Callable[[FfmpegProgress], None] = None,
+    total_duration: float = 0.0,
+    min_interval: float = DEFAULT_PROGRESS_INTERVAL,
+    timeout: float = None,
+) -> FfmpegResult:
+    """
+    Runs ffmpeg to completion, reporting progress from its -progress stream.
+
+    total_duration is the expected output length in seconds; when 0 it is taken
+    from the first "Duration:" line ffmpeg prints for its input.
+    timeout (seconds, paused time excluded) needs a task_controller, whose
+    watchdog terminates ffmpeg when it expires or when the task is stopped,
+    even if ffmpeg has stopped writing output.
+    Raises FileNotFoundError if ffmpeg is not installed.
+    """
+    # stdin is a pipe so TaskController can ask ffmpeg to quit with "q"
+    process = subprocess.Popen(
+        with_progress_args(command),
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        encoding="utf-8",
+        errors="ignore",
+        **process_group_kwargs(),
+    )
+    if task_controller:
+        task_controller.add_process(process, timeout=timeout)
+
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+    duration = {"value": total_duration}
+
+    def drain_stderr():
+        try:
+            for line in process.stderr:
+                line = line.rstrip()
+                if not line:
+                    continue
+                stderr_tail.append(line)
+                if duration["value"] <= 0:
+                    match = _duration_pattern.search(line)
+                    if match:
+                        duration["value"] = parse_time_str(match.group(1))
+        except (ValueError, OSError):
+            pass
+
+    stderr_thread = threading.Thread(target=drain_stderr, daemon=True)
+    stderr_thread.start()
+
+    block = {}
+    last_report = 0.0
+    stopped = False
+    timed_out = False
+    try:
+        # Stop / timeout are enforced by the controller's watchdog; keep reading
+        # until ffmpeg exits so it never blocks on a full stdout pipe meanwhile
+        for line in process.stdout:
+            key, sep, value = line.strip().partition("=")
+            if not sep:
+                continue
+            if key != "progress":
+                block[key] = value
+                continue
+
+            finished = value == "end"
+            now = time.monotonic()
+            if on_progress and (finished or now - last_report >= min_interval):
+                last_report = now
+                on_progress(_build_event(block, duration["value"], finished))
+            block = {}
+    except (ValueError, OSError):
+        pass
+
+    process.wait()
+    stderr_thread.join(timeout=2)
+    try:
+        process.stdin.close()
+    except (OSError, ValueError):
+        pass
+    if task_controller:
+        timed_out = task_controller.timed_out(process)
+        task_controller.remove_process(process)
+        stopped = task_controller.is_stopped()
+
+    return FfmpegResult(
+        returncode=process.returncode,
+        stopped=stopped,
+        timed_out=timed_out,
+        stderr_tail=list(stderr_tail),
+    )
+
+
+def _build_event(block: dict, total_duration: float, finished: bool) -> FfmpegProgress:
+    out_time_us = block.get("out_time_us", "")
+    out_time = int(out_time_us) / 1_000_000 if out_time_us.lstrip("-").isdigit() else 0.0
+    frame = block.get("frame", "")
+    total_size = block.get("total_size", "")
+    return FfmpegProgress(
+        out_time=max(0.0, out_time),
+        total_duration=total_duration,
+        speed=_parse_number(block.get("speed", "N/A")),
+        fps=_parse_number(block.get("fps", "N/A")),
+        frame=int(frame) if frame.isdigit() else None,
+        total_size=int(total_size) if total_size.isdigit() else None,
+        finished=finished,
+    )
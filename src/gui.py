@@ -3,21 +3,39 @@ from tkinter import ttk, filedialog, messagebox
 import threading
 import queue
 import os
+import shutil
 from PIL import Image, ImageTk
-from downloader import DownloadJob, start_download
+from downloader import (
+    DownloadJob,
+    DownloadStatus,
+    ThroughputProfile,
+    start_download,
+)
 from reencoder import reencode_video
 from merger import merge_videos
-from clipper import ClipJob, start_clip
+from clipper import (
+    ClipJob,
+    ClipStatus,
+    MultiClipJob,
+    SplitJob,
+    start_clip,
+    start_multi_clip,
+    start_split,
+)
 from editor import (
     VideoFrameReader,
+    FramePrefetcher,
+    FILMSTRIP_THUMB_HEIGHT,
+    get_filmstrip,
     KeyframeManager,
     CropRegion,
     ASPECT_RATIOS,
     PREVIEW_SIZE,
+    DRAG_REDRAW_INTERVAL_MS,
     format_time_short,
     export_video_with_keyframes,
 )
-from task_utils import TaskController
+from task_utils import TaskController, ProgressBus, encoder_budget, process_budget
 from constants import (
     VIDEO_CODECS,
     AUDIO_CODECS,
@@ -31,8 +49,17 @@ from constants import (
     CLIPPER_MODES,
     COPY_CODEC_LABEL,
     PRECISE_CUT_LABEL,
+    SMART_CUT_LABEL,
+    DEFAULT_DOWNLOAD_LANES,
+    DEFAULT_CLIPPER_LANES,
+    SPLIT_MODES,
+    SPLIT_BY_CHAPTERS,
+    SPLIT_BY_TIMES,
+    DEFAULT_SPLIT_INTERVAL,
+    PROGRESS_REFRESH_MS,
 )
-from utils import get_media_info
+from utils import format_time_str, get_media_info, parse_time_str
+from keyframe_index import get_cached_keyframe_index, keyframe_indexer
 
 
 class App(tk.Tk):
@@ -71,19 +98,37 @@ class App(tk.Tk):
         self._configure_styles()
 
         # Task Controllers
-        self.dl_controller = None
         self.re_controller = None
         self.me_controller = None
-        self.cl_controller = None  # Clipper controller
         self.ed_controller = None  # Editor controller
-        self.current_dl_job = None
-        self.current_cl_job = None  # Clipper job
+
+        # Downloader 多通道佇列：job_id -> 該工作的 UI 列與 DownloadJob
+        self.dl_rows = {}
+        self.dl_job_counter = 0
+        self.dl_lane_limit = DEFAULT_DOWNLOAD_LANES
+        self.dl_lanes = []
+        self.dl_lanes_cond = threading.Condition()
+
+        # Clipper 多通道佇列：job_id -> 該工作的 UI 列與 ClipJob
+        self.cl_rows = {}
+        self.cl_job_counter = 0
+        self.cl_lane_limit = DEFAULT_CLIPPER_LANES
+        self.cl_lanes = []
+        self.cl_lanes_cond = threading.Condition()
 
         # Editor 相關變數
         self.editor_video_reader = None
+        self.editor_prefetcher = None  # 背景解碼預覽幀
+        self.editor_filmstrip = None  # 縮圖膠卷（背景產生）
+        self.editor_filmstrip_controller = None
+        self.editor_filmstrip_image = None
         self.editor_keyframe_manager = KeyframeManager()
         self.editor_current_time_ms = 0
         self.editor_crop_rect = None  # Canvas 上的裁切框 ID
+        self.editor_crop_handles = []  # Canvas 上的角落控制點 ID
+        self.editor_image_item = None  # Canvas 上的影片幀 ID（重複使用）
+        self.editor_frame_offset = (0, 0)  # 影片幀在 Canvas 上的左上角
+        self.editor_drag_redraw_pending = False  # 拖動重繪是否已排程
         self.editor_preview_scale = 1.0  # 預覽縮放比例
 
         # === 頂部框架：標籤控制 + 結束按鈕 ===
@@ -136,14 +181,55 @@ class App(tk.Tk):
 
         self.download_queue = queue.Queue()
         self.clipper_queue = queue.Queue()
-        self.worker_thread = threading.Thread(
-            target=self.process_download_queue, daemon=True
-        )
-        self.worker_thread.start()
-        self.clipper_worker_thread = threading.Thread(
-            target=self.process_clipper_queue, daemon=True
-        )
-        self.clipper_worker_thread.start()
+        self._ensure_download_lanes()
+        self._ensure_clip_lanes()
+
+        # 背景工作的進度集中由主執行緒定時套用
+        self.progress_bus = ProgressBus()
+        self.after(PROGRESS_REFRESH_MS, self._pump_progress)
+
+    def post_progress(self, key, handler, *args):
+        """背景執行緒回報進度：每個 key 只保留最新一筆，之後在主執行緒呼叫 handler(*args)"""
+        self.progress_bus.post(key, (handler, args))
+
+    def post_status(self, key, handler, *args):
+        """
+        背景執行緒回報一次性的狀態訊息（例如提示、完成、錯誤）：不與進度合併，
+        排入主執行緒依序套用，才不會在下次刷新前被下一筆進度蓋掉。
+        同一個 key 尚未套用的進度比這則訊息舊，先套用它以維持順序。
+        """
+        pending = self.progress_bus.take(key)
+
+        def apply():
+            if pending is not None:
+                pending_handler, pending_args = pending
+                pending_handler(*pending_args)
+            handler(*args)
+
+        self.after(0, apply)
+
+    def job_progress_hook(self, key, handler, job_id):
+        """工作的 progress_hook：有進度數值的更新經由進度匯流排合併，其餘訊息逐筆送達"""
+
+        def hook(d):
+            # 長度未知時 percent 為 None，仍屬於進度更新
+            if "percent" in d or "downloaded_bytes" in d:
+                self.post_progress(key, handler, job_id, d)
+            else:
+                self.post_status(key, handler, job_id, d)
+
+        return hook
+
+    def flush_progress(self):
+        """立即套用所有待處理的進度（任務結束前呼叫，避免舊進度蓋掉最終狀態）"""
+        for _, (handler, args) in self.progress_bus.drain():
+            handler(*args)
+
+    def _pump_progress(self):
+        try:
+            self.flush_progress()
+        finally:
+            self.after(PROGRESS_REFRESH_MS, self._pump_progress)
 
     def _configure_styles(self):
         """配置深色音樂風格的 ttk 樣式"""
@@ -290,6 +376,25 @@ class App(tk.Tk):
             font=("Segoe UI", 11, "bold"),
         )
 
+    def _create_scrollable_frame(self, parent):
+        """建立可垂直捲動的容器，回傳放置內容用的內部 Frame"""
+        canvas = tk.Canvas(
+            parent, bg=self.colors["bg_dark"], highlightthickness=0, height=200
+        )
+        scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=canvas.yview)
+        inner = ttk.Frame(canvas, style="Music.TFrame")
+        inner.bind(
+            "<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
+        )
+        window_id = canvas.create_window((0, 0), window=inner, anchor=tk.NW)
+        canvas.bind(
+            "<Configure>", lambda e: canvas.itemconfigure(window_id, width=e.width)
+        )
+        canvas.configure(yscrollcommand=scrollbar.set)
+        canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        return inner
+
     def create_merger_tab(self):
         """建立 Merger 分頁 - 深色音樂風格"""
 
@@ -533,7 +638,6 @@ class App(tk.Tk):
         if percentage is not None:
             self.merge_progress_bar["value"] = percentage
         self.merge_status_label.config(text=f"Status: {message}")
-        self.update_idletasks()
 
     def toggle_merge_pause(self):
         if self.me_controller:
@@ -618,7 +722,7 @@ class App(tk.Tk):
         success, message = merge_videos(
             input_files,
             output_path,
-            self.merge_progress_callback,
+            lambda p, m: self.post_progress("merge", self.merge_progress_callback, p, m),
             self.me_controller,
             recycle_original,
             video_codec,
@@ -626,6 +730,7 @@ class App(tk.Tk):
         self.after(0, self._complete_merge_task, success, message)
 
     def _complete_merge_task(self, success, message):
+        self.flush_progress()
         self.merge_button.config(state=tk.NORMAL)
         self.merge_pause_button.config(state=tk.DISABLED, text="Pause")
         self.merge_stop_button.config(state=tk.DISABLED)
@@ -691,6 +796,35 @@ class App(tk.Tk):
         )
         self.clip_end_entry.grid(row=2, column=1, padx=10, pady=8, sticky=tk.W)
 
+        # 關鍵幀提示：快速裁切實際會從哪裡開始
+        self.clip_keyframe_var = tk.StringVar(value="")
+        self._clip_keyframe_requested = None
+        ttk.Label(
+            input_frame, textvariable=self.clip_keyframe_var, style="Music.TLabel"
+        ).grid(row=3, column=1, columnspan=2, padx=10, pady=(0, 8), sticky=tk.W)
+        for entry in (self.clip_input_entry, self.clip_start_entry, self.clip_end_entry):
+            entry.bind("<FocusOut>", self.update_clip_keyframe_hint)
+
+        # 多段裁切：每行一段，一次 ffmpeg 讀取來源就切出全部
+        ttk.Label(input_frame, text="多段範圍:", style="Music.TLabel").grid(
+            row=4, column=0, padx=10, pady=8, sticky=tk.NW
+        )
+        self.clip_ranges_text = tk.Text(
+            input_frame,
+            height=4,
+            width=40,
+            bg=self.colors["entry_bg"],
+            fg=self.colors["text"],
+            font=("Consolas", 10),
+            insertbackground=self.colors["text"],
+        )
+        self.clip_ranges_text.grid(row=4, column=1, padx=10, pady=8, sticky=tk.EW)
+        ttk.Label(
+            input_frame,
+            text="每行：開始 結束 [檔名]\n填寫後忽略上方的開始/結束時間",
+            style="Music.TLabel",
+        ).grid(row=4, column=2, padx=10, pady=8, sticky=tk.NW)
+
         # === 輸出設定區塊 ===
         output_frame = ttk.LabelFrame(
             main_frame, text="📁 輸出設定", style="Music.TLabelframe"
@@ -746,6 +880,14 @@ class App(tk.Tk):
             style="Music.TRadiobutton",
         ).pack(anchor=tk.W, padx=10, pady=5)
 
+        ttk.Radiobutton(
+            mode_frame,
+            text="✂️ 智慧裁切（只重新編碼頭尾，精確且接近快速裁切的速度，不需 NVIDIA 顯示卡）",
+            variable=self.clip_mode_var,
+            value=SMART_CUT_LABEL,
+            style="Music.TRadiobutton",
+        ).pack(anchor=tk.W, padx=10, pady=5)
+
         # Container Format
         format_frame = ttk.Frame(mode_frame, style="Music.TFrame")
         format_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -761,6 +903,69 @@ class App(tk.Tk):
             style="Music.TMenubutton",
         ).pack(side=tk.LEFT, padx=10)
 
+        # === 分割整個檔案區塊 ===
+        split_frame = ttk.LabelFrame(
+            main_frame, text="📚 分割整個檔案（stream copy，一次讀完）", style="Music.TLabelframe"
+        )
+        split_frame.pack(fill=tk.X, pady=(0, 10))
+
+        self.clip_split_by_var = tk.StringVar(value=SPLIT_BY_CHAPTERS)
+        ttk.OptionMenu(
+            split_frame,
+            self.clip_split_by_var,
+            SPLIT_BY_CHAPTERS,
+            *SPLIT_MODES,
+            style="Music.TMenubutton",
+        ).pack(side=tk.LEFT, padx=10, pady=8)
+        ttk.Label(
+            split_frame, text="時間點 / 每段長度:", style="Music.TLabel"
+        ).pack(side=tk.LEFT, padx=(10, 5))
+        self.clip_split_value_entry = ttk.Entry(
+            split_frame, style="Music.TEntry", font=("Segoe UI", 10), width=30
+        )
+        self.clip_split_value_entry.insert(0, DEFAULT_SPLIT_INTERVAL)
+        self.clip_split_value_entry.pack(side=tk.LEFT)
+        ttk.Button(
+            split_frame,
+            text="✂️ 開始分割",
+            command=self.start_split_job,
+            style="Music.TButton",
+        ).pack(side=tk.LEFT, padx=10)
+
+        # === 並行設定 ===
+        concurrency_frame = ttk.Frame(main_frame, style="Music.TFrame")
+        concurrency_frame.pack(fill=tk.X, pady=(0, 10))
+
+        ttk.Label(
+            concurrency_frame, text="同時裁切數:", style="Music.TLabel"
+        ).pack(side=tk.LEFT, padx=(10, 5))
+        self.cl_lanes_var = tk.IntVar(value=DEFAULT_CLIPPER_LANES)
+        ttk.Spinbox(
+            concurrency_frame,
+            from_=1,
+            to=16,
+            width=4,
+            textvariable=self.cl_lanes_var,
+            font=("Segoe UI", 10),
+        ).pack(side=tk.LEFT)
+        self.cl_lanes_var.trace_add("write", lambda *args: self.on_cl_lanes_change())
+
+        ttk.Label(
+            concurrency_frame, text="重新編碼上限:", style="Music.TLabel"
+        ).pack(side=tk.LEFT, padx=(20, 5))
+        self.encoder_limit_var = tk.IntVar(value=encoder_budget.limit)
+        ttk.Spinbox(
+            concurrency_frame,
+            from_=1,
+            to=8,
+            width=4,
+            textvariable=self.encoder_limit_var,
+            font=("Segoe UI", 10),
+        ).pack(side=tk.LEFT)
+        self.encoder_limit_var.trace_add(
+            "write", lambda *args: self.on_encoder_limit_change()
+        )
+
         # === 控制按鈕 ===
         btn_frame = ttk.Frame(main_frame, style="Music.TFrame")
         btn_frame.pack(pady=10)
@@ -791,24 +996,25 @@ class App(tk.Tk):
         )
         self.clip_stop_btn.pack(side=tk.LEFT, padx=8)
 
-        # === 進度區塊 ===
-        progress_frame = ttk.Frame(main_frame, style="Music.TFrame")
-        progress_frame.pack(fill=tk.X, pady=5)
-
-        self.clip_progress_bar = ttk.Progressbar(
-            progress_frame,
-            orient="horizontal",
-            length=400,
-            mode="indeterminate",
-            style="Music.Horizontal.TProgressbar",
-        )
-        self.clip_progress_bar.pack(fill=tk.X, pady=5)
+        ttk.Button(
+            btn_frame,
+            text="🧹 清除已完成",
+            command=self.clear_finished_clip_rows,
+            style="Music.TButton",
+        ).pack(side=tk.LEFT, padx=8)
 
+        # === 進度區塊（每個裁切工作一列） ===
         self.clip_status_label = ttk.Label(
-            progress_frame, text="狀態：待機中", style="Music.Status.TLabel"
+            main_frame, text="狀態：待機中", style="Music.Status.TLabel"
         )
         self.clip_status_label.pack(anchor=tk.W, pady=5)
 
+        progress_frame = ttk.LabelFrame(
+            main_frame, text="📋 裁切佇列", style="Music.TLabelframe"
+        )
+        progress_frame.pack(fill=tk.BOTH, expand=True, pady=5)
+        self.cl_jobs_frame = self._create_scrollable_frame(progress_frame)
+
     def create_editor_tab(self):
         """建立 Editor 分頁 - 進階影片編輯器"""
 
@@ -873,6 +1079,19 @@ class App(tk.Tk):
         )
         self.editor_timeline.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=10)
 
+        # 縮圖膠卷（點擊縮圖跳轉）
+        self.editor_filmstrip_canvas = tk.Canvas(
+            main_frame,
+            height=FILMSTRIP_THUMB_HEIGHT,
+            bg=self.colors["bg_medium"],
+            highlightthickness=0,
+        )
+        self.editor_filmstrip_canvas.pack(fill=tk.X, padx=5)
+        self.editor_filmstrip_canvas.bind("<Button-1>", self.editor_on_filmstrip_click)
+        self.editor_filmstrip_canvas.bind(
+            "<Configure>", lambda e: self.editor_render_filmstrip()
+        )
+
         # === 裁切設定區域 ===
         crop_frame = ttk.LabelFrame(
             main_frame, text="✂️ 裁切設定", style="Music.TLabelframe"
@@ -1208,6 +1427,67 @@ class App(tk.Tk):
         )
         info_label.pack(anchor=tk.W, pady=(0, 10))
 
+        # === 並行設定 ===
+        concurrency_frame = ttk.Frame(main_frame, style="Music.TFrame")
+        concurrency_frame.pack(fill=tk.X, pady=(0, 10))
+
+        ttk.Label(
+            concurrency_frame, text="同時下載數:", style="Music.TLabel"
+        ).pack(side=tk.LEFT, padx=(10, 5))
+        self.dl_lanes_var = tk.IntVar(value=DEFAULT_DOWNLOAD_LANES)
+        ttk.Spinbox(
+            concurrency_frame,
+            from_=1,
+            to=16,
+            width=4,
+            textvariable=self.dl_lanes_var,
+            font=("Segoe UI", 10),
+        ).pack(side=tk.LEFT)
+        self.dl_lanes_var.trace_add("write", lambda *args: self.on_dl_lanes_change())
+
+        ttk.Label(
+            concurrency_frame, text="全域處理程序上限:", style="Music.TLabel"
+        ).pack(side=tk.LEFT, padx=(20, 5))
+        self.process_limit_var = tk.IntVar(value=process_budget.limit)
+        ttk.Spinbox(
+            concurrency_frame,
+            from_=1,
+            to=32,
+            width=4,
+            textvariable=self.process_limit_var,
+            font=("Segoe UI", 10),
+        ).pack(side=tk.LEFT)
+        self.process_limit_var.trace_add(
+            "write", lambda *args: self.on_process_limit_change()
+        )
+
+        ttk.Label(
+            concurrency_frame, text="並行片段數:", style="Music.TLabel"
+        ).pack(side=tk.LEFT, padx=(20, 5))
+        self.dl_fragments_var = tk.IntVar(value=ThroughputProfile.concurrent_fragments)
+        ttk.Spinbox(
+            concurrency_frame,
+            from_=1,
+            to=32,
+            width=4,
+            textvariable=self.dl_fragments_var,
+            font=("Segoe UI", 10),
+        ).pack(side=tk.LEFT)
+
+        ttk.Label(
+            concurrency_frame, text="外部下載器（無法暫停）:", style="Music.TLabel"
+        ).pack(side=tk.LEFT, padx=(20, 5))
+        # 只有系統上找得到 aria2c 時才提供選項
+        downloaders = ["無"] + (["aria2c"] if shutil.which("aria2c") else [])
+        self.dl_external_var = tk.StringVar(value=downloaders[0])
+        ttk.OptionMenu(
+            concurrency_frame,
+            self.dl_external_var,
+            downloaders[0],
+            *downloaders,
+            style="Music.TMenubutton",
+        ).pack(side=tk.LEFT)
+
         # === 控制按鈕 ===
         self.download_btn_frame = ttk.Frame(main_frame, style="Music.TFrame")
         self.download_btn_frame.pack(pady=10)
@@ -1238,24 +1518,25 @@ class App(tk.Tk):
         )
         self.dl_stop_button.pack(side=tk.LEFT, padx=8)
 
-        # === 進度區塊 ===
-        progress_frame = ttk.Frame(main_frame, style="Music.TFrame")
-        progress_frame.pack(fill=tk.X, pady=10)
-
-        self.progress_bar = ttk.Progressbar(
-            progress_frame,
-            orient="horizontal",
-            length=400,
-            mode="determinate",
-            style="Music.Horizontal.TProgressbar",
-        )
-        self.progress_bar.pack(fill=tk.X, pady=5)
+        ttk.Button(
+            self.download_btn_frame,
+            text="🧹 清除已完成",
+            command=self.clear_finished_dl_rows,
+            style="Music.TButton",
+        ).pack(side=tk.LEFT, padx=8)
 
+        # === 進度區塊（每個下載工作一列） ===
         self.status_label = ttk.Label(
-            progress_frame, text="狀態：待機中", style="Music.Status.TLabel"
+            main_frame, text="狀態：待機中", style="Music.Status.TLabel"
         )
         self.status_label.pack(anchor=tk.W, pady=5)
 
+        progress_frame = ttk.LabelFrame(
+            main_frame, text="📋 下載佇列", style="Music.TLabelframe"
+        )
+        progress_frame.pack(fill=tk.BOTH, expand=True, pady=5)
+        self.dl_jobs_frame = self._create_scrollable_frame(progress_frame)
+
     def create_reencoder_tab(self):
         """建立 Re-encoder 分頁 - 深色音樂風格"""
 
@@ -1288,6 +1569,15 @@ class App(tk.Tk):
             style="Music.TRadiobutton",
         )
         self.re_batch_dir_radio.pack(side=tk.LEFT, padx=15, pady=8)
+        self.re_chunked_radio = ttk.Radiobutton(
+            mode_frame,
+            text="🧩 單檔分段平行編碼",
+            variable=self.re_mode_var,
+            value="chunked",
+            command=self.update_reencode_input_label,
+            style="Music.TRadiobutton",
+        )
+        self.re_chunked_radio.pack(side=tk.LEFT, padx=15, pady=8)
 
         # === 輸入/輸出設定區塊 ===
         io_frame = ttk.LabelFrame(
@@ -1471,6 +1761,20 @@ class App(tk.Tk):
         )
         self.re_recycle_check.pack(side=tk.LEFT, padx=10)
 
+        # 批次/分段並行數（0 = 依編碼器自動決定）
+        ttk.Label(
+            options_frame, text="⚡ 並行數 (0=自動):", style="Music.TLabel"
+        ).pack(side=tk.LEFT, padx=(20, 5))
+        self.re_workers_var = tk.IntVar(value=0)
+        ttk.Spinbox(
+            options_frame,
+            from_=0,
+            to=32,
+            width=4,
+            textvariable=self.re_workers_var,
+            font=("Segoe UI", 10),
+        ).pack(side=tk.LEFT)
+
         # === 控制按鈕 ===
         self.re_btn_frame = ttk.Frame(main_frame, style="Music.TFrame")
         self.re_btn_frame.pack(pady=10)
@@ -1519,46 +1823,200 @@ class App(tk.Tk):
         )
         self.re_status_label.pack(anchor=tk.W, pady=5)
 
-    def process_download_queue(self):
+    def _ensure_download_lanes(self):
+        """依設定啟動足夠數量的下載通道（執行緒）"""
+        while len(self.dl_lanes) < self.dl_lane_limit:
+            lane = threading.Thread(
+                target=self.process_download_queue,
+                args=(len(self.dl_lanes),),
+                daemon=True,
+            )
+            self.dl_lanes.append(lane)
+            lane.start()
+
+    def on_dl_lanes_change(self):
+        try:
+            lanes = max(1, int(self.dl_lanes_var.get()))
+        except (tk.TclError, ValueError):
+            return
+        with self.dl_lanes_cond:
+            self.dl_lane_limit = lanes
+            self.dl_lanes_cond.notify_all()
+        self._ensure_download_lanes()
+
+    def on_process_limit_change(self):
+        try:
+            process_budget.set_limit(int(self.process_limit_var.get()))
+        except (tk.TclError, ValueError):
+            pass
+
+    def _enqueue_download(self, job_id, job):
+        with self.dl_lanes_cond:
+            self.download_queue.put((job_id, job))
+            self.dl_lanes_cond.notify_all()
+
+    def process_download_queue(self, lane_index=0):
         while True:
-            job = self.download_queue.get()
-            self.after(0, self.on_dl_start, job)
-            # Run the download
+            # 通道數調降時，超出上限的通道在完成目前工作後暫停取件；
+            # 檢查上限與取件都在同一個鎖內，等待中的通道不會在調降後又多取一件
+            with self.dl_lanes_cond:
+                while lane_index >= self.dl_lane_limit or self.download_queue.empty():
+                    self.dl_lanes_cond.wait()
+                job_id, job = self.download_queue.get_nowait()
+            self.after(0, self.on_dl_start, job_id)
+            # Run the download once a global process slot is free
             try:
-                start_download(job)
+                with process_budget.slot(job.task_controller) as acquired:
+                    if acquired:
+                        start_download(job)
+                    else:
+                        job.status = DownloadStatus.STOPPED
             except Exception as e:
                 pass  # Error handling is inside start_download usually
-            self.after(0, self.on_dl_finish, job)
+            self.after(0, self.on_dl_finish, job_id)
             self.download_queue.task_done()
 
-    def on_dl_start(self, job):
-        self.current_dl_job = job
-        self.dl_controller = job.task_controller
-        self.download_button.config(state=tk.DISABLED)
-        self.dl_pause_button.config(state=tk.NORMAL, text="Pause")
-        self.dl_stop_button.config(state=tk.NORMAL)
+    def _add_dl_row(self, job_id, job):
+        """新增一列下載工作顯示（名稱、進度條、狀態、暫停/停止）"""
+        row = ttk.Frame(self.dl_jobs_frame, style="Music.TFrame")
+        row.pack(fill=tk.X, pady=2)
+        row.columnconfigure(1, weight=1)
 
-    def on_dl_finish(self, job):
-        self.download_button.config(state=tk.NORMAL)
-        self.dl_pause_button.config(state=tk.DISABLED, text="Pause")
-        self.dl_stop_button.config(state=tk.DISABLED)
-        self.current_dl_job = None
-        self.dl_controller = None
+        name = job.output_filename or job.url
+        ttk.Label(row, text=name[:40], style="Music.TLabel", width=40).grid(
+            row=0, column=0, padx=5, sticky=tk.W
+        )
+        bar = ttk.Progressbar(
+            row,
+            orient="horizontal",
+            mode="determinate",
+            style="Music.Horizontal.TProgressbar",
+        )
+        bar.grid(row=0, column=1, padx=5, sticky=tk.EW)
+        status = ttk.Label(row, text="排隊中", style="Music.Status.TLabel", width=28)
+        status.grid(row=0, column=2, padx=5, sticky=tk.W)
+        pause_btn = ttk.Button(
+            row,
+            text="⏸",
+            width=3,
+            command=lambda: self.toggle_dl_job_pause(job_id),
+            state=tk.DISABLED,
+            style="Music.Warning.TButton",
+        )
+        pause_btn.grid(row=0, column=3, padx=2)
+        stop_btn = ttk.Button(
+            row,
+            text="⏹",
+            width=3,
+            command=lambda: self.stop_dl_job(job_id),
+            style="Music.TButton",
+        )
+        stop_btn.grid(row=0, column=4, padx=2)
+
+        self.dl_rows[job_id] = {
+            "job": job,
+            "frame": row,
+            "bar": bar,
+            "status": status,
+            "pause_btn": pause_btn,
+            "stop_btn": stop_btn,
+            "active": False,
+            "done": False,
+        }
+
+    def _refresh_dl_buttons(self):
+        has_pending = any(not r["done"] for r in self.dl_rows.values())
+        state = tk.NORMAL if has_pending else tk.DISABLED
+        self.dl_pause_button.config(state=state)
+        self.dl_stop_button.config(state=state)
+        active = sum(1 for r in self.dl_rows.values() if r["active"])
+        queued = sum(
+            1 for r in self.dl_rows.values() if not r["active"] and not r["done"]
+        )
+        if has_pending:
+            self.status_label.config(text=f"狀態：下載中 {active} 個，排隊 {queued} 個")
+        else:
+            self.status_label.config(text="狀態：待機中")
+
+    def on_dl_start(self, job_id):
+        row = self.dl_rows.get(job_id)
+        if not row:
+            return
+        row["active"] = True
+        if self._dl_job_pausable(row["job"]):
+            row["pause_btn"].config(state=tk.NORMAL)
+            row["status"].config(text="下載中...")
+        else:
+            row["status"].config(text="下載中（外部下載器無法暫停）...")
+        self._refresh_dl_buttons()
+
+    @staticmethod
+    def _dl_job_pausable(job):
+        """外部下載器（aria2c）在 yt-dlp 之外執行，只能停止、不能暫停"""
+        return not (job.throughput and job.throughput.external_downloader)
+
+    def on_dl_finish(self, job_id):
+        self.flush_progress()
+        row = self.dl_rows.get(job_id)
+        if not row:
+            return
+        row["active"] = False
+        row["done"] = True
+        row["pause_btn"].config(state=tk.DISABLED, text="⏸")
+        row["stop_btn"].config(state=tk.DISABLED)
+        if row["job"].status == DownloadStatus.STOPPED:
+            row["status"].config(text="已停止")
+        self._refresh_dl_buttons()
+
+    def toggle_dl_job_pause(self, job_id):
+        row = self.dl_rows.get(job_id)
+        if not row or row["done"]:
+            return
+        controller = row["job"].task_controller
+        if controller.pause_event.is_set():
+            controller.resume()
+            row["pause_btn"].config(text="⏸")
+        else:
+            controller.pause()
+            row["pause_btn"].config(text="▶")
+
+    def stop_dl_job(self, job_id):
+        row = self.dl_rows.get(job_id)
+        if not row or row["done"]:
+            return
+        row["job"].task_controller.stop()
+        row["stop_btn"].config(state=tk.DISABLED)
+        row["status"].config(text="正在停止...")
 
     def toggle_dl_pause(self):
-        if self.dl_controller:
-            if self.dl_controller.pause_event.is_set():
-                self.dl_controller.resume()
-                self.dl_pause_button.config(text="Pause")
+        """暫停/繼續所有進行中的下載"""
+        active = [
+            r
+            for r in self.dl_rows.values()
+            if r["active"] and self._dl_job_pausable(r["job"])
+        ]
+        if not active:
+            return
+        pause = not all(r["job"].task_controller.pause_event.is_set() for r in active)
+        for r in active:
+            if pause:
+                r["job"].task_controller.pause()
+                r["pause_btn"].config(text="▶")
             else:
-                self.dl_controller.pause()
-                self.dl_pause_button.config(text="Resume")
+                r["job"].task_controller.resume()
+                r["pause_btn"].config(text="⏸")
+        self.dl_pause_button.config(text="▶ 繼續" if pause else "⏸ 暫停")
 
     def stop_dl(self):
-        if self.dl_controller:
-            self.dl_controller.stop()
-            self.dl_stop_button.config(state=tk.DISABLED)
-            self.status_label.config(text="Status: Stopping...")
+        """停止所有進行中與排隊中的下載"""
+        for job_id, row in self.dl_rows.items():
+            if not row["done"]:
+                self.stop_dl_job(job_id)
+        self.status_label.config(text="Status: Stopping...")
+
+    def clear_finished_dl_rows(self):
+        for job_id in [j for j, r in self.dl_rows.items() if r["done"]]:
+            self.dl_rows.pop(job_id)["frame"].destroy()
 
     def browse_download_output_path(self):
         path = filedialog.askdirectory()
@@ -1566,30 +2024,51 @@ class App(tk.Tk):
             self.output_path_entry.delete(0, tk.END)
             self.output_path_entry.insert(0, path)
 
-    def progress_hook(self, d):
+    def update_dl_row(self, job_id, d):
+        row = self.dl_rows.get(job_id)
+        if not row:
+            return
         if d["status"] == "downloading":
             total_bytes = d.get("total_bytes") or d.get("total_bytes_estimate")
-            if total_bytes:
+            if d.get("percent") is not None:
+                # ffmpeg 直接裁切：依輸出時間計算的進度
+                row["bar"]["value"] = d["percent"]
+                row["status"].config(text=d.get("info", ""))
+            elif total_bytes:
                 percentage = (d["downloaded_bytes"] / total_bytes) * 100
-                self.progress_bar["value"] = percentage
-                self.status_label.config(text=f"Status: Downloading {percentage:.2f}%")
-                self.update_idletasks()
+                row["bar"]["value"] = percentage
+                row["status"].config(text=f"下載中 {percentage:.2f}%")
+            elif d.get("info"):
+                row["status"].config(text=d["info"])
+        elif d["status"] == "processing":
+            row["status"].config(text=d.get("info", "處理中..."))
         elif d["status"] == "finished":
-            self.progress_bar["value"] = 100
-            self.status_label.config(text="Status: Download finished.")
-            self.update_idletasks()
-            # Don't show messagebox here, maybe confusing if queued.
-            # Or show it only if queue is empty?
-            # Original code showed it. Let's keep it but maybe make it less blocking?
-            # messagebox.showinfo("Success", "Download completed successfully.")
-            # Better to show in status label for queued items.
+            # yt-dlp 也會在每個分段/串流下載完時回報 finished，最終狀態由 on_dl_finish 決定
+            row["bar"]["value"] = 100
+            row["status"].config(text=d.get("info") or "下載完成")
         elif d["status"] == "error":
-            self.status_label.config(text=f"Status: Error")
-            self.update_idletasks()
-            messagebox.showerror("Error", d["info"])
+            row["bar"]["value"] = 0
+            if "Stopped by user" in d.get("info", ""):
+                row["status"].config(text="已停止")
+            else:
+                row["status"].config(text="錯誤")
+                messagebox.showerror("Error", d["info"])
+
+    def _get_throughput_profile(self):
+        try:
+            fragments = max(1, int(self.dl_fragments_var.get()))
+        except (tk.TclError, ValueError):
+            fragments = ThroughputProfile.concurrent_fragments
+        external = self.dl_external_var.get()
+        return ThroughputProfile(
+            concurrent_fragments=fragments,
+            external_downloader=None if external == "無" else external,
+        )
 
     def start_download(self):
         controller = TaskController()
+        self.dl_job_counter += 1
+        job_id = self.dl_job_counter
         job = DownloadJob(
             url=self.url_entry.get(),
             start_time=self.start_time_entry.get(),
@@ -1599,17 +2078,21 @@ class App(tk.Tk):
             video_codec=self.video_codec_var.get(),
             audio_codec=self.audio_codec_var.get(),
             container_format=self.container_format_var.get(),
-            progress_hook=self.progress_hook,
+            progress_hook=self.job_progress_hook(
+                ("download", job_id), self.update_dl_row, job_id
+            ),
             task_controller=controller,
             low_vram=self.dl_low_vram_var.get(),
             quality=self.dl_quality_var.get(),
+            throughput=self._get_throughput_profile(),
         )
-        self.download_queue.put(job)
-        self.status_label.config(text=f"Status: Queued {job.url}")
+        self._add_dl_row(job_id, job)
+        self._enqueue_download(job_id, job)
+        self._refresh_dl_buttons()
 
     def browse_reencode_input_path(self):
         current_mode = self.re_mode_var.get()
-        if current_mode == "single":
+        if current_mode in ("single", "chunked"):
             file_path = filedialog.askopenfilename(
                 title="Select a video file",
                 filetypes=[
@@ -1628,7 +2111,7 @@ class App(tk.Tk):
 
     def update_reencode_input_label(self):
         current_mode = self.re_mode_var.get()
-        if current_mode == "single":
+        if current_mode in ("single", "chunked"):
             self.re_input_path_label.config(text="Input Video File:")
             self.re_batch_filetypes_label.grid_remove()
             self.re_batch_filetypes_entry.grid_remove()
@@ -1654,7 +2137,6 @@ class App(tk.Tk):
         # Only update text if it's meaningful (avoid clearing specific errors or status too quickly if desired,
         # but here we generally just show what's passed)
         self.re_status_label.config(text=f"Status: {message}")
-        self.update_idletasks()
 
     def toggle_re_pause(self):
         if self.re_controller:
@@ -1688,7 +2170,7 @@ class App(tk.Tk):
             )
             return
 
-        if re_mode == "single" and not output_filename:
+        if re_mode in ("single", "chunked") and not output_filename:
             messagebox.showerror(
                 "Error",
                 "Please provide an output filename for single file re-encoding.",
@@ -1703,6 +2185,11 @@ class App(tk.Tk):
 
         self.re_controller = TaskController()
 
+        try:
+            workers = int(self.re_workers_var.get()) or None
+        except (tk.TclError, ValueError):
+            workers = None  # 空白或非數字時用預設值
+
         # Run re-encoding in a separate thread to keep GUI responsive
         threading.Thread(
             target=self._run_reencode_task,
@@ -1718,6 +2205,7 @@ class App(tk.Tk):
                 self.re_low_vram_var.get(),
                 self.re_recycle_var.get(),
                 quality,
+                workers,
             ),
         ).start()
 
@@ -1734,6 +2222,7 @@ class App(tk.Tk):
         low_vram,
         recycle_original,
         quality,
+        max_workers=None,
     ):
         success, message = reencode_video(
             input_path,
@@ -1744,15 +2233,19 @@ class App(tk.Tk):
             container_format,
             re_mode,
             file_types,
-            self.reencode_progress_callback,
+            lambda p, m: self.post_progress(
+                "reencode", self.reencode_progress_callback, p, m
+            ),
             self.re_controller,
             low_vram,
             recycle_original,
             quality,
+            max_workers,
         )
         self.after(0, self._complete_reencode_task, success, message)
 
     def _complete_reencode_task(self, success, message):
+        self.flush_progress()
         self.re_encode_button.config(state=tk.NORMAL)
         self.re_pause_button.config(state=tk.DISABLED, text="Pause")
         self.re_stop_button.config(state=tk.DISABLED)
@@ -1791,6 +2284,56 @@ class App(tk.Tk):
             self.clip_output_path_entry.insert(0, dir_name)
             self.clip_output_name_entry.delete(0, tk.END)
             self.clip_output_name_entry.insert(0, f"{base_name}_clip")
+            # 選好檔案就開始在背景建立關鍵幀索引
+            self.update_clip_keyframe_hint()
+
+    def update_clip_keyframe_hint(self, event=None):
+        """依關鍵幀索引提示快速裁切的實際開始時間；尚未建立索引時交給背景掃描"""
+        input_path = self.clip_input_entry.get().strip()
+        if not os.path.isfile(input_path):
+            self.clip_keyframe_var.set("")
+            return
+        index = get_cached_keyframe_index(input_path)
+        if index is not None:
+            self._show_clip_keyframe_hint(input_path, index)
+        elif self._clip_keyframe_requested != input_path:
+            self._clip_keyframe_requested = input_path
+            self.clip_keyframe_var.set("🔍 分析關鍵幀中...")
+            keyframe_indexer.request(
+                input_path,
+                # 索引完成只通知一次，直接排入主執行緒，不經過進度匯流排
+                lambda index: self.after(
+                    0, self._show_clip_keyframe_hint, input_path, index
+                ),
+            )
+
+    def _show_clip_keyframe_hint(self, input_path, index):
+        if input_path != self.clip_input_entry.get().strip():
+            return  # 使用者已經換了檔案
+        if index is None:
+            self.clip_keyframe_var.set("⚠️ 無法分析關鍵幀（需要 ffprobe）")
+            return
+        start_text = self.clip_start_entry.get().strip()
+        if not start_text:
+            self.clip_keyframe_var.set(f"🔑 共 {len(index.times)} 個關鍵幀")
+            return
+        start = parse_time_str(start_text)
+        end_text = self.clip_end_entry.get().strip()
+        if index.is_keyframe(start):
+            if end_text and index.is_keyframe(parse_time_str(end_text)):
+                hint = "✅ 開始與結束時間都在關鍵幀上，會直接使用快速裁切"
+            else:
+                hint = "✅ 開始時間在關鍵幀上，快速裁切不會提早開始"
+        else:
+            actual_start = index.snap(start)
+            hint = (
+                f"🔑 快速裁切會從 {format_time_str(actual_start)} 開始"
+                f"（提早 {start - actual_start:.3f} 秒）"
+            )
+            next_keyframe = index.at_or_after(start)
+            if next_keyframe is not None:
+                hint += f"，下一個關鍵幀在 {format_time_str(next_keyframe)}"
+        self.clip_keyframe_var.set(hint)
 
     def browse_clip_output(self):
         dir_path = filedialog.askdirectory(title="選擇輸出目錄")
@@ -1798,6 +2341,23 @@ class App(tk.Tk):
             self.clip_output_path_entry.delete(0, tk.END)
             self.clip_output_path_entry.insert(0, dir_path)
 
+    def _parse_clip_ranges(self, output_name):
+        """
+        解析多段範圍欄位：每行「開始 結束 [檔名]」，未填檔名時用 輸出檔名_01、_02...
+        回傳 (開始, 結束, 檔名) 的清單；格式錯誤時丟出 ValueError
+        """
+        ranges = []
+        lines = self.clip_ranges_text.get("1.0", tk.END).splitlines()
+        for line_no, line in enumerate(lines, 1):
+            parts = line.split(maxsplit=2)
+            if not parts:
+                continue
+            if len(parts) < 2:
+                raise ValueError(f"第 {line_no} 行需要開始與結束時間")
+            name = parts[2].strip() if len(parts) > 2 else ""
+            ranges.append((parts[0], parts[1], name or f"{output_name}_{len(ranges) + 1:02d}"))
+        return ranges
+
     def start_clip_job(self):
         input_path = self.clip_input_entry.get()
         start_time = self.clip_start_entry.get()
@@ -1807,7 +2367,17 @@ class App(tk.Tk):
         clip_mode = self.clip_mode_var.get()
         container_format = self.clip_format_var.get()
 
-        if not all([input_path, start_time, end_time, output_path, output_name]):
+        try:
+            ranges = self._parse_clip_ranges(output_name)
+        except ValueError as e:
+            messagebox.showerror("錯誤", str(e))
+            return
+
+        required = [input_path, output_path, output_name]
+        if not ranges:
+            # 多段裁切的時間來自範圍欄位
+            required += [start_time, end_time]
+        if not all(required):
             messagebox.showerror("錯誤", "請填寫所有必填欄位")
             return
 
@@ -1815,79 +2385,301 @@ class App(tk.Tk):
             messagebox.showerror("錯誤", f"輸入檔案不存在: {input_path}")
             return
 
-        self.cl_controller = TaskController()
+        controller = TaskController()
+        self.cl_job_counter += 1
+        job_id = self.cl_job_counter
+
+        progress_hook = self.job_progress_hook(("clip", job_id), self.update_clip_row, job_id)
+
+        if ranges:
+            job = MultiClipJob(
+                input_path=input_path,
+                ranges=ranges,
+                output_path=output_path,
+                clip_mode=clip_mode,
+                container_format=container_format,
+                progress_hook=progress_hook,
+                task_controller=controller,
+            )
+        else:
+            job = ClipJob(
+                input_path=input_path,
+                start_time=start_time,
+                end_time=end_time,
+                output_path=output_path,
+                output_filename=output_name,
+                clip_mode=clip_mode,
+                container_format=container_format,
+                progress_hook=progress_hook,
+                task_controller=controller,
+            )
+        self._add_clip_row(job_id, job)
+        self._enqueue_clip(job_id, job)
+        self._refresh_clip_buttons()
+
+    def start_split_job(self):
+        input_path = self.clip_input_entry.get()
+        output_path = self.clip_output_path_entry.get()
+        output_name = self.clip_output_name_entry.get()
+        split_by = self.clip_split_by_var.get()
+        value = self.clip_split_value_entry.get()
+
+        if not all([input_path, output_path, output_name]):
+            messagebox.showerror("錯誤", "請填寫輸入檔案、輸出路徑與輸出檔名")
+            return
+
+        if not os.path.exists(input_path):
+            messagebox.showerror("錯誤", f"輸入檔案不存在: {input_path}")
+            return
+
+        # 時間點以逗號或空白分隔；固定長度為 HH:MM:SS、MM:SS 或秒數
+        split_times = value.replace(",", " ").split()
+        if split_by == SPLIT_BY_TIMES and not split_times:
+            messagebox.showerror("錯誤", "請輸入分割時間點，例如：10:00, 25:30")
+            return
 
-        job = ClipJob(
+        controller = TaskController()
+        self.cl_job_counter += 1
+        job_id = self.cl_job_counter
+        job = SplitJob(
             input_path=input_path,
-            start_time=start_time,
-            end_time=end_time,
             output_path=output_path,
             output_filename=output_name,
-            clip_mode=clip_mode,
-            container_format=container_format,
-            progress_hook=lambda d: self.after(0, self.update_clip_status, d),
-            task_controller=self.cl_controller,
+            split_by=split_by,
+            split_times=split_times,
+            interval=parse_time_str(value),
+            container_format=self.clip_format_var.get(),
+            progress_hook=self.job_progress_hook(
+                ("clip", job_id), self.update_clip_row, job_id
+            ),
+            task_controller=controller,
         )
+        self._add_clip_row(job_id, job)
+        self._enqueue_clip(job_id, job)
+        self._refresh_clip_buttons()
+
+    def _ensure_clip_lanes(self):
+        """依設定啟動足夠數量的裁切通道（執行緒）"""
+        while len(self.cl_lanes) < self.cl_lane_limit:
+            lane = threading.Thread(
+                target=self.process_clipper_queue,
+                args=(len(self.cl_lanes),),
+                daemon=True,
+            )
+            self.cl_lanes.append(lane)
+            lane.start()
 
-        self.current_cl_job = job
-        self.clipper_queue.put(job)
+    def on_cl_lanes_change(self):
+        try:
+            lanes = max(1, int(self.cl_lanes_var.get()))
+        except (tk.TclError, ValueError):
+            return
+        with self.cl_lanes_cond:
+            self.cl_lane_limit = lanes
+            self.cl_lanes_cond.notify_all()
+        self._ensure_clip_lanes()
+
+    def on_encoder_limit_change(self):
+        try:
+            encoder_budget.set_limit(int(self.encoder_limit_var.get()))
+        except (tk.TclError, ValueError):
+            pass
 
-        # Update UI
-        self.clip_start_btn.config(state=tk.DISABLED)
-        self.clip_pause_btn.config(state=tk.NORMAL)
-        self.clip_stop_btn.config(state=tk.NORMAL)
-        self.clip_progress_bar.start(10)
-        self.clip_status_label.config(text="狀態：處理中...")
+    def _enqueue_clip(self, job_id, job):
+        with self.cl_lanes_cond:
+            self.clipper_queue.put((job_id, job))
+            self.cl_lanes_cond.notify_all()
 
-    def process_clipper_queue(self):
+    def process_clipper_queue(self, lane_index=0):
         while True:
-            job = self.clipper_queue.get()
+            # 通道數調降時，超出上限的通道在完成目前工作後暫停取件；
+            # 檢查上限與取件都在同一個鎖內，等待中的通道不會在調降後又多取一件
+            with self.cl_lanes_cond:
+                while lane_index >= self.cl_lane_limit or self.clipper_queue.empty():
+                    self.cl_lanes_cond.wait()
+                job_id, job = self.clipper_queue.get_nowait()
+            self.after(0, self.on_clip_start, job_id)
             try:
-                success, message = start_clip(job)
-                self.after(0, self.on_clip_finish, success, message)
+                # 與下載共用全域程序上限；重新編碼的名額由 start_clip 另外取得
+                with process_budget.slot(job.task_controller) as acquired:
+                    if acquired:
+                        if isinstance(job, MultiClipJob):
+                            success, message = start_multi_clip(job)
+                        elif isinstance(job, SplitJob):
+                            success, message = start_split(job)
+                        else:
+                            success, message = start_clip(job)
+                    else:
+                        job.status = ClipStatus.STOPPED
+                        success, message = False, "已被使用者停止"
             except Exception as e:
-                self.after(0, self.on_clip_finish, False, str(e))
+                success, message = False, str(e)
+            self.after(0, self.on_clip_finish, job_id, success, message)
             self.clipper_queue.task_done()
 
-    def update_clip_status(self, d):
-        status = d.get("status", "")
-        info = d.get("info", "")
-        self.clip_status_label.config(text=f"狀態：{info}")
+    def _add_clip_row(self, job_id, job):
+        """新增一列裁切工作顯示（名稱、進度條、狀態、暫停/停止）"""
+        row = ttk.Frame(self.cl_jobs_frame, style="Music.TFrame")
+        row.pack(fill=tk.X, pady=2)
+        row.columnconfigure(1, weight=1)
 
-    def on_clip_finish(self, success, message):
-        self.clip_progress_bar.stop()
-        self.clip_start_btn.config(state=tk.NORMAL)
-        self.clip_pause_btn.config(state=tk.DISABLED)
-        self.clip_stop_btn.config(state=tk.DISABLED)
-        self.cl_controller = None
-        self.current_cl_job = None
+        if isinstance(job, MultiClipJob):
+            name = f"{os.path.basename(job.input_path)} ({len(job.ranges)} 段)"
+        elif isinstance(job, SplitJob):
+            name = f"{os.path.basename(job.input_path)} ({job.split_by})"
+        else:
+            name = f"{job.output_filename} ({job.start_time} - {job.end_time})"
+        ttk.Label(row, text=name[:40], style="Music.TLabel", width=40).grid(
+            row=0, column=0, padx=5, sticky=tk.W
+        )
+        bar = ttk.Progressbar(
+            row,
+            orient="horizontal",
+            mode="determinate",
+            style="Music.Horizontal.TProgressbar",
+        )
+        bar.grid(row=0, column=1, padx=5, sticky=tk.EW)
+        status = ttk.Label(row, text="排隊中", style="Music.Status.TLabel", width=28)
+        status.grid(row=0, column=2, padx=5, sticky=tk.W)
+        pause_btn = ttk.Button(
+            row,
+            text="⏸",
+            width=3,
+            command=lambda: self.toggle_clip_job_pause(job_id),
+            state=tk.DISABLED,
+            style="Music.Warning.TButton",
+        )
+        pause_btn.grid(row=0, column=3, padx=2)
+        stop_btn = ttk.Button(
+            row,
+            text="⏹",
+            width=3,
+            command=lambda: self.stop_clip_job(job_id),
+            style="Music.TButton",
+        )
+        stop_btn.grid(row=0, column=4, padx=2)
+
+        self.cl_rows[job_id] = {
+            "job": job,
+            "frame": row,
+            "bar": bar,
+            "status": status,
+            "pause_btn": pause_btn,
+            "stop_btn": stop_btn,
+            "active": False,
+            "done": False,
+        }
+
+    def _refresh_clip_buttons(self):
+        has_pending = any(not r["done"] for r in self.cl_rows.values())
+        state = tk.NORMAL if has_pending else tk.DISABLED
+        self.clip_pause_btn.config(state=state)
+        self.clip_stop_btn.config(state=state)
+        active = sum(1 for r in self.cl_rows.values() if r["active"])
+        queued = sum(
+            1 for r in self.cl_rows.values() if not r["active"] and not r["done"]
+        )
+        if has_pending:
+            self.clip_status_label.config(
+                text=f"狀態：裁切中 {active} 個，排隊 {queued} 個"
+            )
+        else:
+            self.clip_status_label.config(text="狀態：待機中")
+            self.clip_pause_btn.config(text="⏸ 暫停")
+
+    def on_clip_start(self, job_id):
+        row = self.cl_rows.get(job_id)
+        if not row:
+            return
+        row["active"] = True
+        row["pause_btn"].config(state=tk.NORMAL)
+        row["status"].config(text="處理中...")
+        # 在 ffmpeg 回報進度前先顯示不確定進度
+        row["bar"].config(mode="indeterminate")
+        row["bar"].start(10)
+        self._refresh_clip_buttons()
+
+    def update_clip_row(self, job_id, d):
+        row = self.cl_rows.get(job_id)
+        if not row or row["done"]:
+            return
+        row["status"].config(text=d.get("info", ""))
+        if d.get("percent") is not None:
+            # 取得實際進度後改為確定進度條
+            if str(row["bar"]["mode"]) != "determinate":
+                row["bar"].stop()
+                row["bar"].config(mode="determinate")
+            row["bar"]["value"] = d["percent"]
+
+    def on_clip_finish(self, job_id, success, message):
+        self.flush_progress()
+        row = self.cl_rows.get(job_id)
+        if not row:
+            return
+        row["active"] = False
+        row["done"] = True
+        row["bar"].stop()
+        row["bar"].config(mode="determinate")
+        row["pause_btn"].config(state=tk.DISABLED, text="⏸")
+        row["stop_btn"].config(state=tk.DISABLED)
+        self._refresh_clip_buttons()
 
         if success:
-            self.clip_progress_bar["value"] = 100
-            self.clip_status_label.config(text="狀態：裁切完成！")
-            messagebox.showinfo("成功", message)
+            row["bar"]["value"] = 100
+            row["status"].config(text="裁切完成！")
         else:
-            self.clip_progress_bar["value"] = 0
+            row["bar"]["value"] = 0
             if "停止" in message:
-                self.clip_status_label.config(text="狀態：已停止")
+                row["status"].config(text="已停止")
             else:
-                self.clip_status_label.config(text=f"狀態：失敗 - {message}")
+                row["status"].config(text="失敗")
                 messagebox.showerror("錯誤", message)
 
+    def toggle_clip_job_pause(self, job_id):
+        row = self.cl_rows.get(job_id)
+        if not row or row["done"]:
+            return
+        controller = row["job"].task_controller
+        if controller.pause_event.is_set():
+            controller.resume()
+            row["pause_btn"].config(text="⏸")
+        else:
+            controller.pause()
+            row["pause_btn"].config(text="▶")
+
+    def stop_clip_job(self, job_id):
+        row = self.cl_rows.get(job_id)
+        if not row or row["done"]:
+            return
+        row["job"].task_controller.stop()
+        row["stop_btn"].config(state=tk.DISABLED)
+        row["status"].config(text="正在停止...")
+
     def toggle_clip_pause(self):
-        if self.cl_controller:
-            if self.cl_controller.pause_event.is_set():
-                self.cl_controller.resume()
-                self.clip_pause_btn.config(text="⏸ 暫停")
+        """暫停/繼續所有進行中的裁切"""
+        active = [r for r in self.cl_rows.values() if r["active"]]
+        if not active:
+            return
+        pause = not all(r["job"].task_controller.pause_event.is_set() for r in active)
+        for r in active:
+            if pause:
+                r["job"].task_controller.pause()
+                r["pause_btn"].config(text="▶")
             else:
-                self.cl_controller.pause()
-                self.clip_pause_btn.config(text="▶ 繼續")
+                r["job"].task_controller.resume()
+                r["pause_btn"].config(text="⏸")
+        self.clip_pause_btn.config(text="▶ 繼續" if pause else "⏸ 暫停")
 
     def stop_clip(self):
-        if self.cl_controller:
-            self.cl_controller.stop()
-            self.clip_stop_btn.config(state=tk.DISABLED)
-            self.clip_status_label.config(text="狀態：正在停止...")
+        """停止所有進行中與排隊中的裁切"""
+        for job_id, row in self.cl_rows.items():
+            if not row["done"]:
+                self.stop_clip_job(job_id)
+        self.clip_status_label.config(text="狀態：正在停止...")
+
+    def clear_finished_clip_rows(self):
+        for job_id in [j for j, r in self.cl_rows.items() if r["done"]]:
+            self.cl_rows.pop(job_id)["frame"].destroy()
 
     # === Editor Methods ===
 
@@ -1905,11 +2697,24 @@ class App(tk.Tk):
 
         try:
             # 關閉舊的讀取器
+            if self.editor_filmstrip_controller:
+                self.editor_filmstrip_controller.stop()
+            self.editor_filmstrip = None
+            self.editor_render_filmstrip()
+            if self.editor_prefetcher:
+                self.editor_prefetcher.stop()
+                self.editor_prefetcher = None
             if self.editor_video_reader:
                 self.editor_video_reader.close()
 
             # 建立新的讀取器
             self.editor_video_reader = VideoFrameReader(file_path)
+            reader = self.editor_video_reader
+            self.editor_prefetcher = FramePrefetcher(
+                reader,
+                lambda t, f: self.after(0, self.editor_on_frame_ready, reader, t, f),
+                PREVIEW_SIZE,
+            )
 
             # 更新 UI
             filename = os.path.basename(file_path)
@@ -1954,6 +2759,14 @@ class App(tk.Tk):
 
             self.editor_status_label.config(text="狀態：影片已載入")
 
+            # 背景產生縮圖膠卷
+            self.editor_filmstrip_controller = TaskController()
+            threading.Thread(
+                target=self._editor_build_filmstrip,
+                args=(reader, self.editor_filmstrip_controller),
+                daemon=True,
+            ).start()
+
         except Exception as e:
             messagebox.showerror("錯誤", f"載入影片失敗: {e}")
 
@@ -1962,37 +2775,142 @@ class App(tk.Tk):
         if not self.editor_video_reader:
             return
 
-        # 取得當前幀
-        frame = self.editor_video_reader.get_frame_for_preview(
+        # 已快取的幀直接顯示，否則交給背景執行緒解碼（不阻塞 UI）
+        frame = self.editor_video_reader.get_cached_preview(
             self.editor_current_time_ms, PREVIEW_SIZE
         )
+        if frame is None and self.editor_prefetcher:
+            self.editor_prefetcher.request(self.editor_current_time_ms)
+            if self.editor_filmstrip:
+                # 解碼完成前先放大最接近的膠卷縮圖
+                self.editor_show_frame(self._editor_filmstrip_placeholder())
+            elif self.editor_crop_rect is not None:
+                # 裁切框先行更新，畫面等解碼完成再換
+                self.editor_draw_crop_rect(*self.editor_frame_offset)
+        else:
+            self.editor_show_frame(frame)
+        self._editor_update_filmstrip_playhead()
+
+        # 更新時間標籤
+        current = format_time_short(self.editor_current_time_ms)
+        total = format_time_short(self.editor_video_reader.duration_ms)
+        self.editor_time_label.config(text=f"{current} / {total}")
+
+    def _editor_build_filmstrip(self, reader, task_controller):
+        """背景執行緒：讀取或產生縮圖膠卷"""
+        strip = get_filmstrip(
+            reader.video_path,
+            reader.width,
+            reader.height,
+            task_controller=task_controller,
+            budget=process_budget,
+        )
+        if strip is not None:
+            self.after(0, self.editor_on_filmstrip_ready, reader, strip)
+
+    def editor_on_filmstrip_ready(self, reader, strip):
+        """縮圖膠卷完成（主執行緒）"""
+        if reader is not self.editor_video_reader:
+            return
+        self.editor_filmstrip = strip
+        self.editor_render_filmstrip()
+
+    def editor_render_filmstrip(self):
+        """依 Canvas 寬度排列縮圖，每格顯示該位置對應時間的縮圖"""
+        canvas = self.editor_filmstrip_canvas
+        canvas.delete("all")
+        self.editor_filmstrip_image = None
+        strip = self.editor_filmstrip
+        width = canvas.winfo_width()
+        if not strip or not self.editor_video_reader or width <= 1:
+            return
 
+        duration = self.editor_video_reader.duration_ms
+        image = Image.new("RGB", (width, strip.thumb_height))
+        for x in range(0, width, strip.thumb_width):
+            center_ms = (x + strip.thumb_width / 2) / width * duration
+            image.paste(strip.thumbnail(strip.index_at(center_ms)), (x, 0))
+
+        self.editor_filmstrip_image = ImageTk.PhotoImage(image)
+        canvas.create_image(0, 0, anchor=tk.NW, image=self.editor_filmstrip_image)
+        canvas.create_line(
+            0, 0, 0, strip.thumb_height, fill=self.colors["accent"], width=2, tags="playhead"
+        )
+        self._editor_update_filmstrip_playhead()
+
+    def _editor_update_filmstrip_playhead(self):
+        if not self.editor_filmstrip or not self.editor_video_reader:
+            return
+        duration = self.editor_video_reader.duration_ms
+        width = self.editor_filmstrip_canvas.winfo_width()
+        x = self.editor_current_time_ms / duration * width if duration else 0
+        self.editor_filmstrip_canvas.coords(
+            "playhead", x, 0, x, self.editor_filmstrip.thumb_height
+        )
+
+    def _editor_filmstrip_placeholder(self):
+        """最接近目前時間的膠卷縮圖，放大到預覽尺寸"""
+        strip = self.editor_filmstrip
+        thumb = strip.thumbnail(strip.index_at(self.editor_current_time_ms))
+        scale = min(PREVIEW_SIZE[0] / thumb.width, PREVIEW_SIZE[1] / thumb.height)
+        return thumb.resize(
+            (int(thumb.width * scale), int(thumb.height * scale)),
+            Image.Resampling.BILINEAR,
+        )
+
+    def editor_on_filmstrip_click(self, event):
+        """點擊縮圖膠卷跳轉"""
+        if not self.editor_video_reader:
+            return
+        width = self.editor_filmstrip_canvas.winfo_width()
+        if width <= 1:
+            return
+        duration = self.editor_video_reader.duration_ms
+        time_ms = int(max(0, min(event.x / width, 1)) * duration)
+        self.editor_current_time_ms = time_ms
+        self.editor_timeline_var.set(time_ms)
+        self.editor_update_preview()
+
+    def editor_on_frame_ready(self, reader, time_ms, frame):
+        """背景解碼完成（主執行緒）"""
+        # 已換成別的影片
+        if reader is not self.editor_video_reader:
+            return
+        # 時間軸已移到別的幀：丟棄過期結果，較新的請求已在處理中
+        if reader.frame_index_at_ms(time_ms) != reader.frame_index_at_ms(
+            self.editor_current_time_ms
+        ):
+            return
+        self.editor_show_frame(frame)
+
+    def editor_show_frame(self, frame):
+        """在 Canvas 上顯示預覽幀與裁切框"""
         if frame:
             # 轉換為 Tkinter 可用格式
             self.editor_preview_image = ImageTk.PhotoImage(frame)
 
-            # 清除並重繪 Canvas
-            self.editor_canvas.delete("all")
-
             # 計算居中位置
             x_offset = (PREVIEW_SIZE[0] - frame.width) // 2
             y_offset = (PREVIEW_SIZE[1] - frame.height) // 2
+            self.editor_frame_offset = (x_offset, y_offset)
 
-            # 繪製影片幀
-            self.editor_canvas.create_image(
-                x_offset, y_offset, anchor=tk.NW, image=self.editor_preview_image
-            )
+            # 繪製影片幀（重複使用同一個 Canvas 項目，不重建）
+            if self.editor_image_item is None:
+                self.editor_image_item = self.editor_canvas.create_image(
+                    x_offset, y_offset, anchor=tk.NW, image=self.editor_preview_image
+                )
+                self.editor_canvas.tag_lower(self.editor_image_item)
+            else:
+                self.editor_canvas.itemconfig(
+                    self.editor_image_item, image=self.editor_preview_image
+                )
+                self.editor_canvas.coords(self.editor_image_item, x_offset, y_offset)
 
             # 繪製裁切框
             self.editor_draw_crop_rect(x_offset, y_offset)
 
-        # 更新時間標籤
-        current = format_time_short(self.editor_current_time_ms)
-        total = format_time_short(self.editor_video_reader.duration_ms)
-        self.editor_time_label.config(text=f"{current} / {total}")
-
     def editor_draw_crop_rect(self, x_offset=0, y_offset=0):
-        """繪製裁切框"""
+        """繪製裁切框（已存在時只移動座標）"""
         # 將原始座標轉換為預覽座標
         x1 = x_offset + int(self.editor_crop_x * self.editor_preview_scale)
         y1 = y_offset + int(self.editor_crop_y * self.editor_preview_scale)
@@ -2002,14 +2920,21 @@ class App(tk.Tk):
         y2 = y_offset + int(
             (self.editor_crop_y + self.editor_crop_h) * self.editor_preview_scale
         )
+        corners = [(x1, y1), (x2, y1), (x1, y2), (x2, y2)]
+
+        if self.editor_crop_rect is not None:
+            self.editor_canvas.coords(self.editor_crop_rect, x1, y1, x2, y2)
+            for handle, (cx, cy) in zip(self.editor_crop_handles, corners):
+                self.editor_canvas.coords(handle, cx - 5, cy - 5, cx + 5, cy + 5)
+            return
 
         # 繪製裁切框（霓虹藍色邊框）
-        self.editor_canvas.create_rectangle(
+        self.editor_crop_rect = self.editor_canvas.create_rectangle(
             x1, y1, x2, y2, outline=self.colors["accent3"], width=2, tags="crop_rect"
         )
 
         # 繪製角落控制點
-        for cx, cy in [(x1, y1), (x2, y1), (x1, y2), (x2, y2)]:
+        self.editor_crop_handles = [
             self.editor_canvas.create_oval(
                 cx - 5,
                 cy - 5,
@@ -2019,6 +2944,8 @@ class App(tk.Tk):
                 outline=self.colors["accent3"],
                 tags="crop_rect",
             )
+            for cx, cy in corners
+        ]
 
     def editor_on_timeline_change(self, value):
         """時間軸變更事件"""
@@ -2058,8 +2985,15 @@ class App(tk.Tk):
         self.editor_crop_y = new_y
         self.editor_drag_start = (event.x, event.y)
 
-        # 重繪預覽
-        self.editor_update_preview()
+        # 只移動裁切框，不重新取幀；多個滑鼠事件合併為一次重繪
+        if not self.editor_drag_redraw_pending:
+            self.editor_drag_redraw_pending = True
+            self.after(DRAG_REDRAW_INTERVAL_MS, self.editor_flush_drag_redraw)
+
+    def editor_flush_drag_redraw(self):
+        """套用拖動期間累積的裁切框位置"""
+        self.editor_drag_redraw_pending = False
+        self.editor_draw_crop_rect(*self.editor_frame_offset)
 
     def editor_on_canvas_release(self, event):
         """Canvas 釋放事件"""
@@ -2183,6 +3117,13 @@ class App(tk.Tk):
                 keyframe_manager=self.editor_keyframe_manager,
                 output_width=output_width,
                 output_height=output_height,
+                progress_callback=lambda p: self.post_progress(
+                    "editor_export",
+                    lambda: self.editor_status_label.config(
+                        text=f"狀態：匯出中... {p}%"
+                    ),
+                ),
+                fps=self.editor_video_reader.fps,
             )
             self.after(0, self.editor_on_export_finish, success, message)
 
@@ -2190,6 +3131,7 @@ class App(tk.Tk):
 
     def editor_on_export_finish(self, success, message):
         """匯出完成回調"""
+        self.flush_progress()
         if success:
             self.editor_status_label.config(text="狀態：匯出完成！")
             messagebox.showinfo("成功", message)
@@ -0,0 +1,112 @@
+"""
+Cache of yt-dlp extractor results, keyed by source URL.
+
+Cutting many clips from one long VOD would otherwise repeat the page fetch and
+signature deciphering for every clip. The raw (unprocessed) extractor result is
+kept in memory and on disk until the earliest signed media URL in it expires
+(or INFO_CACHE_TTL passes), and callers run yt-dlp's cheap format selection /
+download step on a copy of it.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse, parse_qs
+
+import yt_dlp
+
+from media_cache import get_cache
+
+# Lifetime of results whose media URLs carry no expiry
+INFO_CACHE_TTL = 30 * 60
+# Treat URLs as expired this many seconds early so a job never starts on a dying URL
+EXPIRY_MARGIN = 60
+# Results kept in memory (each can be several hundred KB)
+INFO_CACHE_MAX_ENTRIES = 32
+
+_memory_cache: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+_memory_lock = threading.Lock()
+
+
+def url_expiry(url: str) -> float | None:
+    """Reads the expiry timestamp signed into a media URL (e.g. googlevideo's expire=)."""
+    try:
+        parsed = urlparse(url)
+        values = parse_qs(parsed.query).get("expire")
+        if values:
+            return float(values[0])
+        # Some CDNs put it in the path: .../expire/1700000000/...
+        parts = parsed.path.split("/")
+        if "expire" in parts:
+            return float(parts[parts.index("expire") + 1])
+    except (ValueError, IndexError):
+        pass
+    return None
+
+
+def _info_expiry(info: dict, now: float) -> float:
+    """Earliest expiry among the result's media URLs, or now + INFO_CACHE_TTL."""
+    urls = [info.get("url")]
+    for key in ("formats", "requested_formats"):
+        urls.extend(f.get("url") for f in info.get(key) or [] if isinstance(f, dict))
+    expiries = [e for e in (url_expiry(u) for u in urls if u) if e]
+    return min(expiries) if expiries else now + INFO_CACHE_TTL
+
+
+def _is_cacheable(info) -> bool:
+    # Playlists and url references need further extraction; only cache plain videos
+    return isinstance(info, dict) and info.get("_type", "video") == "video"
+
+
+def _remember(url: str, info: dict, expires_at: float):
+    with _memory_lock:
+        _memory_cache[url] = (expires_at, info)
+        _memory_cache.move_to_end(url)
+        while len(_memory_cache) > INFO_CACHE_MAX_ENTRIES:
+            _memory_cache.popitem(last=False)
+
+
+def get_cached_info(url: str) -> dict | None:
+    """Returns a copy of the cached extractor result for url, if still valid."""
+    now = time.time()
+    with _memory_lock:
+        entry = _memory_cache.get(url)
+        if entry:
+            if entry[0] - EXPIRY_MARGIN > now:
+                _memory_cache.move_to_end(url)
+                return copy.deepcopy(entry[1])
+            del _memory_cache[url]
+
+    info = get_cache().get_keyed("ydl_info", url)
+    if isinstance(info, dict):
+        expires_at = _info_expiry(info, now)
+        if expires_at - EXPIRY_MARGIN > now:
+            _remember(url, info, expires_at)
+            return copy.deepcopy(info)
+    return None
+
+
+def get_extractor_info(url: str, ydl: yt_dlp.YoutubeDL) -> dict | None:
+    """
+    Returns the raw extractor result for url, from cache or by running the
+    extractor with ydl. Pass the result (it is a private copy) to
+    ydl.process_ie_result() to select formats and/or download.
+    Extraction errors propagate; None means the extractor returned nothing usable.
+    """
+    info = get_cached_info(url)
+    if info is not None:
+        return info
+
+    info = ydl.extract_info(url, download=False, process=False)
+    if not isinstance(info, dict):
+        return None
+
+    if _is_cacheable(info):
+        now = time.time()
+        expires_at = _info_expiry(info, now)
+        if expires_at - EXPIRY_MARGIN > now:
+            clean = ydl.sanitize_info(info)
+            _remember(url, clean, expires_at)
+            get_cache().put_keyed("ydl_info", url, clean, expires_at)
+    return info
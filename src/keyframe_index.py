@@ -0,0 +1,233 @@
+"""
+Keyframe index for local media files.
+
+A stream-copy cut can only start on a keyframe: ffmpeg's input seek backs up
+to the keyframe at or before the requested time. The clipper looks requested
+times up here to snap them, report how far a copy-mode cut will drift, and
+skip re-encoding when a cut already lands on a keyframe.
+
+Indexes come from a packet-level ffprobe scan (nothing is decoded) and are
+kept in the media cache, which ties them to the file's path, size and mtime,
+so each file is scanned once. KeyframeIndexer builds them on a background
+thread so the scan usually finishes while the user is still typing times.
+Clip workers never wait for that scan: scan_keyframes_near() falls back to
+short scans around the cut points. Times are seconds from the file's
+format.start_time, like the times users type and -ss.
+"""
+
+import bisect
+import os
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Callable
+
+from media_cache import get_cache
+from utils import (
+    estimate_frame_duration,
+    get_video_packets,
+    media_start_time,
+    probe_media,
+)
+
+# Seconds scanned on each side of a cut point by scan_keyframes_near()
+NEARBY_SCAN_MARGIN = 1.0
+
+
+@dataclass
+class KeyframeIndex:
+    times: list  # keyframe presentation times (seconds), ascending
+    frame_duration: float
+    # How far decode timestamps run behind presentation (B-frame reordering);
+    # stream copies compare a keyframe's dts, not its pts, against -ss
+    decode_delay: float = 0.0
+
+    @property
+    def tolerance(self) -> float:
+        # Anything within half a frame of a keyframe selects that keyframe
+        return self.frame_duration / 2
+
+    def at_or_before(self, t: float) -> float | None:
+        i = bisect.bisect_right(self.times, t + self.tolerance)
+        return self.times[i - 1] if i else None
+
+    def at_or_after(self, t: float) -> float | None:
+        i = bisect.bisect_left(self.times, t - self.tolerance)
+        return self.times[i] if i < len(self.times) else None
+
+    def snap(self, t: float) -> float:
+        """Where a copy-mode cut requested at t actually starts."""
+        keyframe = self.at_or_before(t)
+        return t if keyframe is None else keyframe
+
+    def drift(self, t: float) -> float:
+        """Seconds a copy-mode cut at t starts early (0 when t is on a keyframe)."""
+        return max(0.0, t - self.snap(t))
+
+    def is_keyframe(self, t: float) -> bool:
+        keyframe = self.at_or_before(t)
+        return keyframe is not None and abs(t - keyframe) <= self.tolerance
+
+    def to_dict(self) -> dict:
+        return {
+            "times": self.times,
+            "frame_duration": self.frame_duration,
+            "decode_delay": self.decode_delay,
+        }
+
+    @classmethod
+    def from_dict(cls, data) -> "KeyframeIndex | None":
+        try:
+            return cls(
+                [float(t) for t in data["times"]],
+                float(data["frame_duration"]),
+                float(data.get("decode_delay", 0.0)),
+            )
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return None
+
+
+def get_cached_keyframe_index(file_path: str) -> KeyframeIndex | None:
+    """Returns the cached index for file_path without scanning."""
+    data = get_cache().get("keyframe_index", file_path)
+    return KeyframeIndex.from_dict(data) if data is not None else None
+
+
+def build_keyframe_index(file_path: str) -> KeyframeIndex | None:
+    """
+    Returns the keyframe index for file_path, scanning (and caching) it on a miss.
+    Returns None if the file has no video stream or can't be probed.
+    """
+    index = get_cached_keyframe_index(file_path)
+    if index is not None:
+        return index
+
+    # Packet timestamps are absolute; user times count from start_time
+    offset = media_start_time(probe_media(file_path))
+    packets = [(t - offset, is_key) for t, is_key in get_video_packets(file_path)]
+    times = sorted(t for t, is_key in packets if is_key)
+    if not times:
+        return None
+    pts_times = sorted(t for t, _ in packets)
+    index = KeyframeIndex(
+        times, estimate_frame_duration(pts_times), _decode_delay(packets)
+    )
+    get_cache().put("keyframe_index", file_path, index.to_dict())
+    return index
+
+
+def _decode_delay(packets) -> float:
+    """
+    Decode timestamps are the sorted presentation times shifted back by a
+    constant; the smallest shift keeping every dts <= its pts is the delay.
+    packets must be contiguous and in decode order.
+    """
+    pts_times = sorted(t for t, _ in packets)
+    return max([0.0] + [a - b for a, (b, _) in zip(pts_times, packets)])
+
+
+def scan_keyframes_near(file_path: str, times) -> KeyframeIndex | None:
+    """
+    Returns the cached index for file_path, or else a partial, uncached one
+    that only knows the keyframes within NEARBY_SCAN_MARGIN of each time.
+    That is enough to snap, and check, those times. The scans are short and
+    run on the calling thread, so workers never wait on KeyframeIndexer.
+    """
+    index = get_cached_keyframe_index(file_path)
+    if index is not None:
+        return index
+
+    windows = []
+    for t in sorted(times):
+        start, end = max(0.0, t - NEARBY_SCAN_MARGIN), t + NEARBY_SCAN_MARGIN
+        if windows and start <= windows[-1][1]:
+            windows[-1][1] = max(windows[-1][1], end)
+        else:
+            windows.append([start, end])
+
+    offset = media_start_time(probe_media(file_path))
+    keyframes = set()
+    pts_times = set()
+    decode_delay = 0.0
+    for start, end in windows:
+        # ffprobe starts reading at the keyframe at or before start
+        packets = [
+            (t - offset, is_key)
+            for t, is_key in get_video_packets(file_path, start + offset, end + offset)
+        ]
+        keyframes.update(t for t, is_key in packets if is_key)
+        pts_times.update(t for t, _ in packets)
+        gops = []
+        for packet in packets:
+            if packet[1] or not gops:
+                gops.append([])
+            gops[-1].append(packet)
+        # The scan stops partway through the last GOP, whose reordering is incomplete
+        for gop in gops[:-1] or gops:
+            decode_delay = max(decode_delay, _decode_delay(gop))
+
+    if not keyframes:
+        return None
+    return KeyframeIndex(
+        sorted(keyframes), estimate_frame_duration(sorted(pts_times)), decode_delay
+    )
+
+
+class KeyframeIndexer:
+    """
+    Builds keyframe indexes on one background thread, one file at a time.
+    Requests for a file that is already queued share its single scan.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._pending = {}  # abs path -> callbacks waiting for it
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def request(self, file_path: str, callback: Callable = None):
+        """
+        Queues file_path for indexing. callback(index_or_None) runs on the
+        worker thread once the index is ready (immediately if it is cached).
+        """
+        if not file_path or not os.path.isfile(file_path):
+            if callback:
+                callback(None)
+            return
+        index = get_cached_keyframe_index(file_path)
+        if index is not None:
+            if callback:
+                callback(index)
+            return
+
+        key = os.path.abspath(file_path)
+        with self._lock:
+            waiting = self._pending.get(key)
+            if waiting is not None:
+                if callback:
+                    waiting.append(callback)
+                return
+            self._pending[key] = [callback] if callback else []
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._queue.put(key)
+
+    def _run(self):
+        while True:
+            key = self._queue.get()
+            try:
+                index = build_keyframe_index(key)
+            except Exception:
+                index = None
+            with self._lock:
+                callbacks = self._pending.pop(key, [])
+            for callback in callbacks:
+                try:
+                    callback(index)
+                except Exception:
+                    pass
+
+
+# Shared by the GUI so each file is scanned once
+keyframe_indexer = KeyframeIndexer()
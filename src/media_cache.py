@@ -0,0 +1,276 @@
+"""
+Persistent per-file metadata cache.
+
+Entries are keyed on (kind, absolute path) and are only valid while the file's
+size and mtime_ns are unchanged, so edited or replaced files are re-probed
+automatically. The store is a small SQLite database with LRU eviction once the
+total payload exceeds a byte cap.
+
+An entry may own an attachment file (e.g. a rendered image) stored next to
+the cache: its size counts towards the cap and it is deleted with the entry.
+
+A second table holds entries keyed by an arbitrary string (e.g. a URL) that
+expire at a given time instead of being tied to a file.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from constants import CACHE_DIR
+
+CACHE_DB_PATH = os.path.join(CACHE_DIR, "media_cache.sqlite3")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def _file_signature(file_path):
+    """Returns (absolute path, size, mtime_ns) or None if the file can't be stat'ed."""
+    try:
+        abs_path = os.path.abspath(file_path)
+        st = os.stat(abs_path)
+    except (OSError, ValueError):
+        return None
+    return abs_path, st.st_size, st.st_mtime_ns
+
+
+def _remove_attachments(paths):
+    for path in paths:
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class MediaCache:
+    def __init__(self, db_path: str = CACHE_DB_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = None
+        self._disabled = False
+
+    def _connect(self):
+        """Opens the database lazily. Caching is silently disabled if that fails."""
+        if self._conn is not None or self._disabled:
+            return self._conn
+        try:
+            db_dir = os.path.dirname(self.db_path)
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " kind TEXT NOT NULL,"
+                " path TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " mtime_ns INTEGER NOT NULL,"
+                " data TEXT NOT NULL,"
+                " nbytes INTEGER NOT NULL,"
+                " last_access REAL NOT NULL,"
+                " attachment TEXT,"
+                " PRIMARY KEY (kind, path))"
+            )
+            try:
+                # Databases created before attachments existed
+                conn.execute("ALTER TABLE entries ADD COLUMN attachment TEXT")
+            except sqlite3.OperationalError:
+                pass
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_entries_access ON entries(last_access)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS keyed_entries ("
+                " kind TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " data TEXT NOT NULL,"
+                " nbytes INTEGER NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " last_access REAL NOT NULL,"
+                " PRIMARY KEY (kind, key))"
+            )
+            conn.commit()
+            self._conn = conn
+        except (sqlite3.Error, OSError):
+            self._disabled = True
+        return self._conn
+
+    def get(self, kind: str, file_path: str):
+        """Returns the cached value for file_path, or None on a miss or stale entry."""
+        sig = _file_signature(file_path)
+        if sig is None:
+            return None
+        abs_path, size, mtime_ns = sig
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return None
+            try:
+                row = conn.execute(
+                    "SELECT size, mtime_ns, data, attachment FROM entries"
+                    " WHERE kind = ? AND path = ?",
+                    (kind, abs_path),
+                ).fetchone()
+                if row is None:
+                    return None
+                if row[0] != size or row[1] != mtime_ns:
+                    conn.execute(
+                        "DELETE FROM entries WHERE kind = ? AND path = ?",
+                        (kind, abs_path),
+                    )
+                    conn.commit()
+                    _remove_attachments([row[3]])
+                    return None
+                conn.execute(
+                    "UPDATE entries SET last_access = ? WHERE kind = ? AND path = ?",
+                    (time.time(), kind, abs_path),
+                )
+                conn.commit()
+                return json.loads(row[2])
+            except (sqlite3.Error, ValueError):
+                return None
+
+    def put(self, kind: str, file_path: str, value, attachment: str = None):
+        """
+        Stores a JSON-serialisable value for file_path's current size/mtime.
+        attachment is a file owned by the entry; it is deleted along with it.
+        """
+        sig = _file_signature(file_path)
+        if sig is None:
+            return
+        abs_path, size, mtime_ns = sig
+        try:
+            data = json.dumps(value, ensure_ascii=False)
+        except (TypeError, ValueError):
+            return
+        nbytes = len(data)
+        if attachment:
+            attachment = os.path.abspath(attachment)
+            try:
+                nbytes += os.path.getsize(attachment)
+            except OSError:
+                pass
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            try:
+                old = conn.execute(
+                    "SELECT attachment FROM entries WHERE kind = ? AND path = ?",
+                    (kind, abs_path),
+                ).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries"
+                    " (kind, path, size, mtime_ns, data, nbytes, last_access, attachment)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (kind, abs_path, size, mtime_ns, data, nbytes, time.time(), attachment),
+                )
+                evicted = self._evict(conn)
+                conn.commit()
+            except sqlite3.Error:
+                return
+            if old and old[0] != attachment:
+                evicted.append(old[0])
+            _remove_attachments(evicted)
+
+    def get_keyed(self, kind: str, key: str):
+        """Returns the value stored under key, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return None
+            try:
+                row = conn.execute(
+                    "SELECT data, expires_at FROM keyed_entries WHERE kind = ? AND key = ?",
+                    (kind, key),
+                ).fetchone()
+                if row is None:
+                    return None
+                if row[1] <= now:
+                    conn.execute(
+                        "DELETE FROM keyed_entries WHERE kind = ? AND key = ?",
+                        (kind, key),
+                    )
+                    conn.commit()
+                    return None
+                conn.execute(
+                    "UPDATE keyed_entries SET last_access = ? WHERE kind = ? AND key = ?",
+                    (now, kind, key),
+                )
+                conn.commit()
+                return json.loads(row[0])
+            except (sqlite3.Error, ValueError):
+                return None
+
+    def put_keyed(self, kind: str, key: str, value, expires_at: float):
+        """Stores a JSON-serialisable value under key until expires_at (epoch seconds)."""
+        try:
+            data = json.dumps(value, ensure_ascii=False)
+        except (TypeError, ValueError):
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            try:
+                conn.execute(
+                    "DELETE FROM keyed_entries WHERE expires_at <= ?", (now,)
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO keyed_entries"
+                    " (kind, key, data, nbytes, expires_at, last_access)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (kind, key, data, len(data), expires_at, now),
+                )
+                self._evict(conn, "keyed_entries", "key")
+                conn.commit()
+            except sqlite3.Error:
+                pass
+
+    def _evict(self, conn, table: str = "entries", key_column: str = "path") -> list:
+        """
+        Drops least-recently-used rows of table until its payload fits in max_bytes.
+        Returns the attachments of the dropped rows, to delete once committed.
+        """
+        total = conn.execute(f"SELECT COALESCE(SUM(nbytes), 0) FROM {table}").fetchone()[0]
+        if total <= self.max_bytes:
+            return []
+        attachment_column = "attachment" if table == "entries" else "NULL"
+        victims = []
+        attachments = []
+        for kind, key, nbytes, attachment in conn.execute(
+            f"SELECT kind, {key_column}, nbytes, {attachment_column} FROM {table}"
+            " ORDER BY last_access ASC"
+        ):
+            if total <= self.max_bytes:
+                break
+            victims.append((kind, key))
+            attachments.append(attachment)
+            total -= nbytes
+        conn.executemany(
+            f"DELETE FROM {table} WHERE kind = ? AND {key_column} = ?", victims
+        )
+        return attachments
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_cache() -> MediaCache:
+    """Returns the process-wide cache instance."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = MediaCache()
+        return _shared_cache
@@ -1,27 +1,82 @@
-import subprocess
 import os
-import re
 import tempfile
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
 from send2trash import send2trash
-from utils import parse_time_str, recycle_file, get_low_vram_args
+from utils import recycle_file, get_low_vram_args, probe_media
 from constants import BEST_CODEC_LABEL
+from task_utils import TaskController
+from ffmpeg_progress import FfmpegProgress, run_ffmpeg
+
+# Concurrent ffprobe processes used to pre-compute the merge duration
+PROBE_WORKERS = 8
 
 def _get_video_duration(file_path):
-    """Gets the duration of a single video file using ffprobe."""
-    command = [
-        "ffprobe", 
-        "-v", "error", 
-        "-show_entries", "format=duration", 
-        "-of", "default=noprint_wrappers=1:nokey=1", 
-        file_path
-    ]
+    """Gets the duration of a single video file from its (cached) ffprobe metadata."""
     try:
-        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, check=True)
-        return float(result.stdout.strip())
-    except (subprocess.CalledProcessError, ValueError):
+        data = probe_media(file_path)
+        if not data:
+            return 0.0
+        return float(data.get("format", {}).get("duration", 0.0))
+    except (OSError, ValueError, TypeError):
         return 0.0
 
-from task_utils import TaskController
+def _get_durations(input_files, task_controller: TaskController = None):
+    """
+    Durations of input_files in input order (0.0 for files that can't be probed),
+    probed concurrently on a bounded pool.
+    Returns None if the task was stopped before all probes finished.
+    """
+    durations = [0.0] * len(input_files)
+    workers = max(1, min(PROBE_WORKERS, len(input_files)))
+    executor = ThreadPoolExecutor(max_workers=workers)
+    # Completed by stop() so a probe stuck on a slow share can't block it
+    stopped = Future()
+
+    def on_stop():
+        stopped.set_result(None)
+
+    if task_controller:
+        task_controller.add_stop_callback(on_stop)
+    try:
+        pending = {
+            executor.submit(_get_video_duration, f): i for i, f in enumerate(input_files)
+        }
+        while pending:
+            done, _ = wait(set(pending) | {stopped}, return_when=FIRST_COMPLETED)
+            if stopped in done:
+                return None
+            for future in done:
+                durations[pending.pop(future)] = future.result()
+    finally:
+        if task_controller:
+            task_controller.remove_stop_callback(on_stop)
+        # Don't wait for (or start) the remaining probes once stopped
+        executor.shutdown(wait=False, cancel_futures=True)
+    return durations
+
+def _get_total_duration(input_files, task_controller: TaskController = None):
+    """Sums the durations of input_files; None if the task was stopped meanwhile."""
+    durations = _get_durations(input_files, task_controller)
+    return None if durations is None else sum(durations)
+
+def write_concat_list(input_files, durations=None) -> str:
+    """
+    Writes an ffmpeg concat demuxer list for input_files and returns its path.
+    durations (seconds, one per file) override the lengths the demuxer would
+    otherwise estimate from each file.
+    """
+    with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.txt', encoding='utf-8') as tmp_file:
+        for index, file_path in enumerate(input_files):
+            # Ensure absolute path
+            abs_path = os.path.abspath(file_path)
+            # Escape single quotes for the concat file format
+            safe_path = abs_path.replace("'", "'\\''")
+            # Ensure forward slashes
+            safe_path = safe_path.replace("\\", "/")
+            tmp_file.write(f"file '{safe_path}'\n")
+            if durations:
+                tmp_file.write(f"duration {durations[index]:.6f}\n")
+        return tmp_file.name
 
 def merge_videos(
     input_files: list,
@@ -38,24 +93,13 @@ def merge_videos(
         return False, "No input files provided."
 
     # 1. Calculate total duration for progress estimation
-    total_duration = 0.0
-    for f in input_files:
-        if task_controller and task_controller.is_stopped():
-             return False, "Merge stopped by user."
-        total_duration += _get_video_duration(f)
+    total_duration = _get_total_duration(input_files, task_controller)
+    if total_duration is None:
+        return False, "Merge stopped by user."
 
     # 2. Create the concat list file
     try:
-        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.txt', encoding='utf-8') as tmp_file:
-            concat_list_path = tmp_file.name
-            for file_path in input_files:
-                # Ensure absolute path
-                abs_path = os.path.abspath(file_path)
-                # Escape single quotes for the concat file format
-                safe_path = abs_path.replace("'", "'\\''")
-                # Ensure forward slashes
-                safe_path = safe_path.replace("\\", "/")
-                tmp_file.write(f"file '{safe_path}'\n")
+        concat_list_path = write_concat_list(input_files)
     except Exception as e:
         return False, f"Failed to create temporary concat list: {e}"
 
@@ -89,55 +133,21 @@ def merge_videos(
         output_file
     ])
 
-    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True, encoding='utf-8', errors='ignore')
-
-    if task_controller:
-        task_controller.set_process(process)
+    def on_progress(progress: FfmpegProgress):
+        if progress_callback:
+            progress_callback(progress.percent, f"Merging... {progress.summary()}")
 
-    duration_pattern = re.compile(r"Duration:\s(\d{2}:\d{2}:\d{2}\.\d{2})")
-    
-    # If total_duration calc failed (e.g. ffprobe missing), try to get it from the first few lines of ffmpeg output (it might estimate it)
-    
-    full_log = []
     try:
-        for line in process.stdout:
-            if task_controller and task_controller.is_stopped():
-                break
-
-            line = line.strip()
-            full_log.append(line)
-            if not line:
-                continue
-
-            if total_duration == 0.0:
-                 match = duration_pattern.search(line)
-                 if match:
-                     total_duration = parse_time_str(match.group(1))
-
-            if line.startswith("out_time="):
-                time_str = line.split("=")[1]
-                current_time = parse_time_str(time_str)
-                
-                if total_duration > 0:
-                    percentage = min(100.0, (current_time / total_duration) * 100)
-                    if progress_callback:
-                        progress_callback(percentage, f"Merging... {percentage:.1f}%")
-                else:
-                    if progress_callback:
-                        progress_callback(None, f"Merging... {time_str}")
-    except Exception as e:
-        pass
-    
-    process.wait() 
-    
-    # Clean up temp file
-    if os.path.exists(concat_list_path):
-        try:
-            os.remove(concat_list_path)
-        except:
-            pass
-    
-    if task_controller and task_controller.is_stopped():
+        result = run_ffmpeg(command, task_controller, on_progress, total_duration)
+    finally:
+        # Clean up temp file
+        if os.path.exists(concat_list_path):
+            try:
+                os.remove(concat_list_path)
+            except:
+                pass
+
+    if result.stopped:
         # Cleanup partial output file if stopped
         if os.path.exists(output_file):
             try:
@@ -146,7 +156,7 @@ def merge_videos(
                 pass
         return False, "Merge stopped by user."
 
-    if process.returncode == 0:
+    if result.returncode == 0:
         msg = "Merge completed successfully."
         if recycle_original:
             recycled_count = 0
@@ -156,5 +166,5 @@ def merge_videos(
             msg += f" {recycled_count} original files moved to Recycle Bin."
         return True, msg
     else:
-        error_details = "\n".join(full_log[-10:]) # Last 10 lines
-        return False, f"Merge failed with error code: {process.returncode}.\nOutput:\n{error_details}"
+        error_details = "\n".join(result.stderr_tail[-10:]) # Last 10 lines
+        return False, f"Merge failed with error code: {result.returncode}.\nOutput:\n{error_details}"
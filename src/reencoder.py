@@ -1,44 +1,82 @@
-import subprocess
 import os
 import threading
-import re
+import bisect
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from send2trash import send2trash
 
 from constants import BEST_CODEC_LABEL, COPY_CODEC_LABEL, STREAMING_CODEC_LABEL
 from task_utils import TaskController
+from ffmpeg_progress import FfmpegProgress, run_ffmpeg
 from utils import (
     get_low_vram_args,
-    parse_time_str,
     recycle_file,
     get_media_info,
     format_size,
+    probe_media,
+    get_keyframe_times,
+    media_start_time,
 )
-
-
-def _run_ffmpeg_command(
-    input_file: str,
-    output_file: str,
-    video_codec: str,
-    audio_codec: str,
-    progress_callback=None,
-    task_controller: TaskController = None,
-    low_vram: bool = False,
-    quality: int = 26,
-):
-    command = ["ffmpeg", "-i", input_file]
-
+from merger import write_concat_list
+
+# Concurrent encode sessions a single consumer GPU accepts per vendor
+HW_ENCODER_SESSION_LIMITS = {"nvenc": 3, "amf": 2, "qsv": 2}
+# Threads given to each software encoder when several run side by side
+CPU_ENCODER_THREADS = 4
+# Chunked mode never splits a file into pieces shorter than this (seconds)
+MIN_CHUNK_SECONDS = 60
+
+
+def _resolve_encoder(video_codec: str) -> str:
+    """Maps a GUI codec label to the ffmpeg encoder it runs."""
+    if video_codec in (BEST_CODEC_LABEL, STREAMING_CODEC_LABEL):
+        return "hevc_nvenc"
+    if video_codec == COPY_CODEC_LABEL or not video_codec:
+        return "copy"
+    return video_codec
+
+
+def _is_cpu_encoder(video_codec: str) -> bool:
+    encoder = _resolve_encoder(video_codec)
+    if encoder == "copy":
+        return False
+    return not any(hw in encoder for hw in HW_ENCODER_SESSION_LIMITS)
+
+
+def default_batch_workers(video_codec: str) -> int:
+    """
+    Default number of files encoded concurrently in batch mode.
+    CPU codecs: cores divided by the threads each ffmpeg gets.
+    Hardware codecs: the vendor's per-GPU session limit.
+    """
+    cores = os.cpu_count() or 1
+    encoder = _resolve_encoder(video_codec)
+    for hw, limit in HW_ENCODER_SESSION_LIMITS.items():
+        if hw in encoder:
+            return limit
+    if encoder == "copy":
+        # Stream copy is disk bound; a few parallel jobs are enough to hide latency
+        return min(4, cores)
+    return max(1, cores // CPU_ENCODER_THREADS)
+
+
+def _build_codec_args(video_codec: str, audio_codec: str, quality: int = 26):
+    """Returns (video_args, audio_args, muxer_args) for the selected codec preset."""
     if video_codec == BEST_CODEC_LABEL:
         # Best settings: HEVC NVENC, Preset P7 (Best Quality), CQ {quality}, Audio Copy
         # Adjusted CQ based on user input or default 30
         cq_value = str(quality) if quality is not None else "26"
-        command.extend(
-            ["-c:v", "hevc_nvenc", "-preset", "p7", "-cq", cq_value, "-c:a", "copy"]
+        return (
+            ["-c:v", "hevc_nvenc", "-preset", "p7", "-cq", cq_value],
+            ["-c:a", "copy"],
+            [],
         )
     elif video_codec == STREAMING_CODEC_LABEL:
         # 串流優化設定: HEVC NVENC, Preset P5, Constant QP 模式
         # 啟用 B-frame + Lookahead + AQ 以達到最佳壓縮效率與速度平衡
         qp_value = str(quality) if quality is not None else "30"
-        command.extend(
+        return (
             [
                 "-c:v",
                 "hevc_nvenc",
@@ -62,28 +100,17 @@ def _run_ffmpeg_command(
                 "1",  # 時間自適應量化（改善動態場景）
                 "-rc-lookahead",
                 "32",  # 前瞻分析 32 幀（更好的碼率分配）
-                "-c:a",
-                "aac",
-                "-b:a",
-                "128k",
-                "-movflags",
-                "+faststart",
-            ]
+            ],
+            ["-c:a", "aac", "-b:a", "128k"],
+            ["-movflags", "+faststart"],
         )
     elif video_codec == COPY_CODEC_LABEL:
-        command.extend(["-c:v", "copy", "-c:a", "copy"])
+        return ["-c:v", "copy"], ["-c:a", "copy"], []
     else:
-        command.extend(["-c:v", video_codec, "-c:a", audio_codec])
+        return ["-c:v", video_codec], ["-c:a", audio_codec], []
 
-    command.extend(
-        [
-            "-y",  # Overwrite output files without asking
-            "-progress",
-            "pipe:1",  # Output progress information to stdout
-            "-nostats",  # Suppress standard progress bar to avoid parsing issues
-        ]
-    )
 
+def _low_vram_args(video_codec: str, low_vram: bool):
     if (
         low_vram and video_codec != BEST_CODEC_LABEL
     ):  # logic handles specific codecs, skip for custom preset if not needed or integrated
@@ -93,81 +120,28 @@ def _run_ffmpeg_command(
         # If low_vram is true, we might want to avoid P7 or add the delay args.
         # get_low_vram_args(codec) usually returns ['-delay', '20'] etc.
         # If video_codec is BEST, we are using hevc_nvenc.
-        command.extend(get_low_vram_args("hevc_nvenc"))
+        return get_low_vram_args("hevc_nvenc")
     elif low_vram:
-        command.extend(get_low_vram_args(video_codec))
-
-    command.append(output_file)
-
-    process = subprocess.Popen(
-        command,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        universal_newlines=True,
-        encoding="utf-8",
-        errors="ignore",
-    )
+        return get_low_vram_args(video_codec)
+    return []
 
-    if task_controller:
-        task_controller.set_process(process)
 
-    total_duration = 0.0
-    duration_pattern = re.compile(r"Duration:\s(\d{2}:\d{2}:\d{2}\.\d{2})")
+def _execute_ffmpeg(
+    command: list,
+    output_file: str,
+    progress_callback=None,
+    task_controller: TaskController = None,
+    total_duration: float = 0.0,
+):
+    """Runs a prepared ffmpeg command and reports progress as (percentage, message)."""
 
-    try:
-        for line in process.stdout:
-            if task_controller and task_controller.is_stopped():
-                break
-
-            line = line.strip()
-            if not line:
-                continue
-
-            # Try to extract duration from stderr (which is merged into stdout)
-            if total_duration == 0.0:
-                match = duration_pattern.search(line)
-                if match:
-                    total_duration = parse_time_str(match.group(1))
-
-            # Extract current time from -progress output
-            if line.startswith("out_time="):
-                time_str = line.split("=")[1]
-                current_time = parse_time_str(time_str)
-
-                if total_duration > 0:
-                    percentage = min(100.0, (current_time / total_duration) * 100)
-                    if progress_callback:
-                        progress_callback(
-                            percentage, f"Re-encoding... {percentage:.1f}%"
-                        )
-                else:
-                    # If duration couldn't be parsed, just show the raw time
-                    if progress_callback:
-                        progress_callback(None, f"Re-encoding... {time_str}")
-            elif progress_callback and not line.startswith(
-                (
-                    "frame=",
-                    "fps=",
-                    "stream_",
-                    "bitrate=",
-                    "total_size=",
-                    "out_time_us=",
-                    "out_time_ms=",
-                    "dup_frames=",
-                    "drop_frames=",
-                    "speed=",
-                    "progress=",
-                )
-            ):
-                # Forward other interesting lines (errors, metadata info) but filter out raw progress keys to reduce noise if needed
-                # For now, we'll be selective to avoid flooding the GUI status
-                pass
-    except Exception:
-        pass
+    def on_progress(progress: FfmpegProgress):
+        if progress_callback:
+            progress_callback(progress.percent, f"Re-encoding... {progress.summary()}")
 
-    process.wait()
+    result = run_ffmpeg(command, task_controller, on_progress, total_duration)
 
-    if task_controller and task_controller.is_stopped():
+    if result.stopped:
         # Cleanup partial output file if stopped
         if os.path.exists(output_file):
             try:
@@ -176,12 +150,242 @@ def _run_ffmpeg_command(
                 pass
         return False, "Re-encoding stopped by user."
 
-    if process.returncode == 0:
+    if result.returncode == 0:
         return True, ""
     else:
-        # Since we consumed stdout, we don't have the error message easily available unless we captured it.
-        # But 'line' variable might hold the last line which could be an error.
-        return False, f"FFmpeg failed with error code: {process.returncode}."
+        return (
+            False,
+            f"FFmpeg failed with error code: {result.returncode}.\nOutput:\n{result.log}",
+        )
+
+
+def _run_ffmpeg_command(
+    input_file: str,
+    output_file: str,
+    video_codec: str,
+    audio_codec: str,
+    progress_callback=None,
+    task_controller: TaskController = None,
+    low_vram: bool = False,
+    quality: int = 26,
+    threads: int | None = None,
+):
+    command = ["ffmpeg", "-i", input_file]
+
+    video_args, audio_args, muxer_args = _build_codec_args(
+        video_codec, audio_codec, quality
+    )
+    command.extend(video_args + audio_args + muxer_args)
+
+    command.extend(
+        [
+            "-y",  # Overwrite output files without asking
+            "-progress",
+            "pipe:1",  # Output progress information to stdout
+            "-nostats",  # Suppress standard progress bar to avoid parsing issues
+        ]
+    )
+
+    command.extend(_low_vram_args(video_codec, low_vram))
+
+    if threads:
+        command.extend(["-threads", str(threads)])
+
+    command.append(output_file)
+
+    return _execute_ffmpeg(command, output_file, progress_callback, task_controller)
+
+
+def _plan_chunks(keyframes: list, duration: float, chunk_count: int):
+    """
+    Splits [0, duration) into at most chunk_count (start, end) ranges whose
+    inner boundaries sit on keyframes, so each chunk starts with a clean GOP.
+    """
+    boundaries = [0.0]
+    for i in range(1, chunk_count):
+        target = duration * i / chunk_count
+        idx = bisect.bisect_left(keyframes, target)
+        candidates = keyframes[max(0, idx - 1) : idx + 1]
+        if not candidates:
+            continue
+        nearest = min(candidates, key=lambda t: abs(t - target))
+        if boundaries[-1] < nearest < duration:
+            boundaries.append(nearest)
+    boundaries.append(duration)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def _run_chunked_ffmpeg_command(
+    input_file: str,
+    output_file: str,
+    video_codec: str,
+    audio_codec: str,
+    progress_callback=None,
+    task_controller: TaskController = None,
+    low_vram: bool = False,
+    quality: int = 26,
+    max_workers: int | None = None,
+):
+    """
+    Encodes one long file as keyframe-aligned chunks in parallel ffmpeg processes,
+    then joins the video chunks losslessly with the concat demuxer and muxes the
+    original audio back in. Falls back to a single encode for short inputs.
+    """
+    if max_workers is None:
+        max_workers = default_batch_workers(video_codec)
+
+    data = probe_media(input_file) or {}
+    try:
+        duration = float(data.get("format", {}).get("duration", 0.0))
+    except (TypeError, ValueError):
+        duration = 0.0
+
+    chunk_count = min(max_workers, int(duration // MIN_CHUNK_SECONDS))
+    keyframes = get_keyframe_times(input_file) if chunk_count > 1 else []
+    # Keyframe pts are absolute; chunk -ss/-t count from the file's start_time
+    start_time = media_start_time(data)
+    keyframes = [t - start_time for t in keyframes]
+    chunks = _plan_chunks(keyframes, duration, chunk_count) if keyframes else []
+
+    if video_codec == COPY_CODEC_LABEL or len(chunks) < 2:
+        return _run_ffmpeg_command(
+            input_file,
+            output_file,
+            video_codec,
+            audio_codec,
+            progress_callback,
+            task_controller,
+            low_vram,
+            quality,
+        )
+
+    threads = None
+    if _is_cpu_encoder(video_codec):
+        threads = max(1, (os.cpu_count() or 1) // len(chunks))
+
+    video_args, audio_args, muxer_args = _build_codec_args(
+        video_codec, audio_codec, quality
+    )
+    work_dir = tempfile.mkdtemp(
+        prefix=".chunks_", dir=os.path.dirname(os.path.abspath(output_file))
+    )
+    chunk_files = [
+        os.path.join(work_dir, f"chunk_{i:04d}.mkv") for i in range(len(chunks))
+    ]
+
+    progress_lock = threading.Lock()
+    chunk_progress = [0.0] * len(chunks)
+    errors = []
+    # Pauses and stops with the task; stopped on its own when a chunk fails so
+    # the others don't keep encoding for nothing
+    chunk_controller = task_controller.child() if task_controller else TaskController()
+
+    def report():
+        if not progress_callback:
+            return
+        with progress_lock:
+            # Weight each chunk by its share of the total duration
+            overall = sum(
+                pct * (end - start) / duration
+                for pct, (start, end) in zip(chunk_progress, chunks)
+            )
+        progress_callback(
+            overall, f"Re-encoding {len(chunks)} chunks... {overall:.1f}%"
+        )
+
+    def encode_chunk(index):
+        if not chunk_controller.wait_while_paused():
+            return
+        start, end = chunks[index]
+        command = [
+            "ffmpeg",
+            "-ss",
+            f"{start:.6f}",
+            "-i",
+            input_file,
+            "-t",
+            f"{end - start:.6f}",
+            "-map",
+            "0:v:0",
+            *video_args,
+            "-an",
+            "-y",
+            "-progress",
+            "pipe:1",
+            "-nostats",
+            *_low_vram_args(video_codec, low_vram),
+        ]
+        if threads:
+            command.extend(["-threads", str(threads)])
+        command.append(chunk_files[index])
+
+        def chunk_callback(percentage, message):
+            if percentage is not None:
+                with progress_lock:
+                    chunk_progress[index] = percentage
+                report()
+
+        success, error_msg = _execute_ffmpeg(
+            command, chunk_files[index], chunk_callback, chunk_controller, end - start
+        )
+        if success:
+            with progress_lock:
+                chunk_progress[index] = 100.0
+            report()
+        elif not chunk_controller.is_stopped():
+            with progress_lock:
+                errors.append(f"chunk {index + 1}: {error_msg}")
+            chunk_controller.stop()
+
+    concat_list_path = None
+    try:
+        with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+            list(executor.map(encode_chunk, range(len(chunks))))
+
+        if task_controller and task_controller.is_stopped():
+            return False, "Re-encoding stopped by user."
+        if errors:
+            return False, "; ".join(errors)
+
+        if progress_callback:
+            progress_callback(100.0, "Joining chunks...")
+
+        # Stitch the video chunks and bring the untouched audio back from the source
+        concat_list_path = write_concat_list(chunk_files)
+        command = [
+            "ffmpeg",
+            "-f",
+            "concat",
+            "-safe",
+            "0",
+            "-i",
+            concat_list_path,
+            "-i",
+            input_file,
+            "-map",
+            "0:v:0",
+            "-map",
+            "1:a?",
+            "-c:v",
+            "copy",
+            *audio_args,
+            *muxer_args,
+            "-y",
+            "-progress",
+            "pipe:1",
+            "-nostats",
+            output_file,
+        ]
+        return _execute_ffmpeg(command, output_file, None, task_controller, duration)
+    finally:
+        if task_controller:
+            task_controller.release_child(chunk_controller)
+        if concat_list_path and os.path.exists(concat_list_path):
+            try:
+                os.remove(concat_list_path)
+            except OSError:
+                pass
+        shutil.rmtree(work_dir, ignore_errors=True)
 
 
 def reencode_video(
@@ -198,8 +402,9 @@ def reencode_video(
     low_vram: bool = False,
     recycle_original: bool = False,
     quality: int = 26,
+    max_workers: int | None = None,
 ):
-    if mode == "single":
+    if mode in ("single", "chunked"):
         if not output_filename:
             return False, "Output filename is required for single file re-encoding."
 
@@ -210,16 +415,29 @@ def reencode_video(
         # Capture Info Before (Pre-flight)
         orig_info, _ = get_media_info(input_path)
 
-        success, error_msg = _run_ffmpeg_command(
-            input_path,
-            full_output_file,
-            video_codec,
-            audio_codec,
-            progress_callback,
-            task_controller,
-            low_vram,
-            quality,
-        )
+        if mode == "chunked":
+            success, error_msg = _run_chunked_ffmpeg_command(
+                input_path,
+                full_output_file,
+                video_codec,
+                audio_codec,
+                progress_callback,
+                task_controller,
+                low_vram,
+                quality,
+                max_workers,
+            )
+        else:
+            success, error_msg = _run_ffmpeg_command(
+                input_path,
+                full_output_file,
+                video_codec,
+                audio_codec,
+                progress_callback,
+                task_controller,
+                low_vram,
+                quality,
+            )
         if success:
             # Capture Info After (Post-flight)
             new_info, _ = get_media_info(full_output_file)
@@ -312,68 +530,114 @@ def reencode_video(
             # Default to common video formats if none specified
             allowed_extensions = [".mp4", ".mkv", ".avi", ".mov", ".flv", ".webm"]
 
-        reencoded_count = 0
-        failed_files = []
-        recycled_count = 0
-
-        total_orig_bytes = 0
-        total_new_bytes = 0
-
+        # Collect the work list up front so the pool knows the total for aggregate progress
+        batch_items = []
         for root, _, files in os.walk(input_path):
-            if task_controller and task_controller.is_stopped():
-                break
-
             for file in files:
-                if task_controller and task_controller.is_stopped():
-                    break
-
                 file_extension = os.path.splitext(file)[1].lower()
                 if file_extension in allowed_extensions:
                     input_file = os.path.join(root, file)
                     relative_path = os.path.relpath(input_file, input_path)
-
-                    # Create corresponding output directory structure
                     output_subdir = os.path.join(
                         output_path, os.path.dirname(relative_path)
                     )
-                    os.makedirs(output_subdir, exist_ok=True)
-
                     base_filename = os.path.splitext(file)[0]
                     full_output_file = os.path.join(
                         output_subdir, f"{base_filename}.{container_format}"
                     )
+                    batch_items.append((input_file, relative_path, full_output_file))
 
-                    if progress_callback:
-                        progress_callback(0, f"Processing file: {relative_path}")
-
-                    # Capture size before processing
-                    current_orig_size = 0
-                    if os.path.exists(input_file):
-                        current_orig_size = os.path.getsize(input_file)
-
-                    success, error_msg = _run_ffmpeg_command(
-                        input_file,
-                        full_output_file,
-                        video_codec,
-                        audio_codec,
-                        progress_callback,
-                        task_controller,
-                        low_vram,
-                        quality,
-                    )
-                    if success:
-                        reencoded_count += 1
+        if max_workers is None:
+            max_workers = default_batch_workers(video_codec)
+        max_workers = max(1, min(max_workers, len(batch_items) or 1))
 
-                        # Accumulate stats
-                        total_orig_bytes += current_orig_size
-                        if os.path.exists(full_output_file):
-                            total_new_bytes += os.path.getsize(full_output_file)
+        # Split the CPU between concurrent software encoders instead of letting each
+        # ffmpeg spawn a thread per core.
+        threads = None
+        if max_workers > 1 and _is_cpu_encoder(video_codec):
+            threads = max(1, (os.cpu_count() or 1) // max_workers)
 
-                        if recycle_original:
-                            if recycle_file(input_file):
-                                recycled_count += 1
-                    else:
-                        failed_files.append(f"{relative_path} ({error_msg})")
+        reencoded_count = 0
+        failed_files = []
+        recycled_count = 0
+
+        total_orig_bytes = 0
+        total_new_bytes = 0
+
+        stats_lock = threading.Lock()
+        file_progress = {}  # relative_path -> percentage of that file
+
+        def report(message):
+            if not progress_callback:
+                return
+            with stats_lock:
+                done = sum(file_progress.values())
+            overall = done / len(batch_items) if batch_items else 0.0
+            progress_callback(overall, message)
+
+        def encode_one(item):
+            nonlocal reencoded_count, recycled_count, total_orig_bytes, total_new_bytes
+            input_file, relative_path, full_output_file = item
+
+            # Don't start new encodes while the shared controller is paused or stopped
+            if task_controller and not task_controller.wait_while_paused():
+                return
+
+            # Create corresponding output directory structure
+            os.makedirs(os.path.dirname(full_output_file), exist_ok=True)
+
+            with stats_lock:
+                file_progress[relative_path] = 0.0
+            report(f"Processing file: {relative_path}")
+
+            # Capture size before processing
+            current_orig_size = 0
+            if os.path.exists(input_file):
+                current_orig_size = os.path.getsize(input_file)
+
+            def file_progress_callback(percentage, message):
+                if percentage is not None:
+                    with stats_lock:
+                        file_progress[relative_path] = percentage
+                report(f"[{relative_path}] {message}")
+
+            success, error_msg = _run_ffmpeg_command(
+                input_file,
+                full_output_file,
+                video_codec,
+                audio_codec,
+                file_progress_callback,
+                task_controller,
+                low_vram,
+                quality,
+                threads,
+            )
+
+            with stats_lock:
+                file_progress[relative_path] = 100.0
+                if success:
+                    reencoded_count += 1
+
+                    # Accumulate stats
+                    total_orig_bytes += current_orig_size
+                    if os.path.exists(full_output_file):
+                        total_new_bytes += os.path.getsize(full_output_file)
+                elif not (task_controller and task_controller.is_stopped()):
+                    failed_files.append(f"{relative_path} ({error_msg})")
+
+            if success and recycle_original:
+                if recycle_file(input_file):
+                    with stats_lock:
+                        recycled_count += 1
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(encode_one, item) for item in batch_items]
+            for future in as_completed(futures):
+                if task_controller and task_controller.is_stopped():
+                    for pending in futures:
+                        pending.cancel()
+                if not future.cancelled():
+                    future.result()
 
         if task_controller and task_controller.is_stopped():
             return False, "Batch re-encoding stopped by user."
@@ -0,0 +1,129 @@
+"""
+Resolves page URLs (e.g. YouTube watch pages) to direct media URLs with yt-dlp.
+
+ffmpeg can't read most page URLs, but it can seek into the underlying media
+URLs with HTTP range requests, so a clip only transfers the bytes it needs.
+Resolved URLs are cached in-process until they are about to expire; the
+extractor results behind them are cached by info_cache.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+
+import yt_dlp
+
+from info_cache import get_extractor_info, url_expiry, EXPIRY_MARGIN
+
+# Used when the media URLs don't advertise their own expiry
+DEFAULT_RESOLVE_TTL = 30 * 60
+
+
+@dataclass
+class ResolvedStreams:
+    """Direct media URLs for one page URL."""
+
+    video_url: str | None  # first input; the audio URL when there is no video
+    audio_url: str | None = None
+    http_headers: dict = field(default_factory=dict)
+    expires_at: float = 0.0
+    has_video: bool = True  # False when only an audio stream resolved
+
+    @property
+    def urls(self) -> list[str]:
+        return [u for u in (self.video_url, self.audio_url) if u]
+
+
+_resolved_cache: dict[tuple[str, str], ResolvedStreams] = {}
+_cache_lock = threading.Lock()
+
+
+def _format_selector(container_format: str | None) -> str:
+    """Prefers streams that can be stream-copied into the requested container."""
+    if container_format in ("mp4", "mov"):
+        return "bv*[ext=mp4]+ba[ext=m4a]/b[ext=mp4]/bv*+ba/b"
+    return "bv*+ba/b"
+
+
+def streams_from_info(info: dict, now: float | None = None) -> ResolvedStreams | None:
+    """Builds ResolvedStreams from a yt-dlp info dict (None if it has no direct URL)."""
+    if not isinstance(info, dict):
+        return None
+    now = time.time() if now is None else now
+
+    requested = info.get("requested_formats")
+    if requested:
+        video = next((f for f in requested if f.get("vcodec") not in (None, "none")), None)
+        audio = next((f for f in requested if f.get("acodec") not in (None, "none") and f is not video), None)
+        video_url = video.get("url") if video else None
+        audio_url = audio.get("url") if audio else None
+        headers = (video or audio or {}).get("http_headers") or info.get("http_headers") or {}
+        has_video = video is not None
+    else:
+        video_url = info.get("url")
+        audio_url = None
+        headers = info.get("http_headers") or {}
+        has_video = info.get("vcodec") != "none"
+
+    if not video_url and not audio_url:
+        return None
+
+    streams = ResolvedStreams(
+        video_url=video_url or audio_url,
+        audio_url=audio_url if video_url else None,
+        http_headers=dict(headers),
+        has_video=has_video and bool(video_url),
+    )
+    expiries = [e for e in (url_expiry(u) for u in streams.urls) if e]
+    streams.expires_at = min(expiries) if expiries else now + DEFAULT_RESOLVE_TTL
+    return streams
+
+
+def resolve_streams(url: str, container_format: str | None = None) -> ResolvedStreams | None:
+    """
+    Returns direct media URLs for url, reusing a cached resolution while it is valid.
+    Returns None if yt-dlp can't extract the page.
+    """
+    key = (url, _format_selector(container_format))
+    now = time.time()
+    with _cache_lock:
+        cached = _resolved_cache.get(key)
+        if cached and cached.expires_at - EXPIRY_MARGIN > now:
+            return cached
+
+    ydl_opts = {
+        "quiet": True,
+        "no_warnings": True,
+        "noplaylist": True,
+        "format": key[1],
+    }
+    try:
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            # Page extraction is cached per URL; format selection on it is cheap
+            raw_info = get_extractor_info(url, ydl)
+            if raw_info is None:
+                return None
+            info = ydl.process_ie_result(raw_info, download=False)
+    except Exception:
+        return None
+
+    streams = streams_from_info(info, now)
+    if streams is None:
+        return None
+    with _cache_lock:
+        # Drop whatever has expired while we are here
+        for stale in [k for k, v in _resolved_cache.items() if v.expires_at <= now]:
+            del _resolved_cache[stale]
+        _resolved_cache[key] = streams
+    return streams
+
+
+def build_ffmpeg_inputs(streams: ResolvedStreams, start_time: str) -> list[str]:
+    """ffmpeg input arguments that seek every resolved stream to start_time."""
+    args = []
+    header_blob = "".join(f"{k}: {v}\r\n" for k, v in streams.http_headers.items())
+    for stream_url in streams.urls:
+        if header_blob:
+            args.extend(["-headers", header_blob])
+        args.extend(["-ss", start_time, "-i", stream_url])
+    return args
@@ -1,64 +1,434 @@
+import io
+import os
+import signal
 import threading
 import psutil
 import subprocess
 import time
+from contextlib import contextmanager
+
+from constants import DEFAULT_ENCODER_SLOTS, DEFAULT_PROCESS_LIMIT, STOP_GRACE_SECONDS
+
+
+def process_group_kwargs() -> dict:
+    """
+    Popen kwargs that start the child as the leader of its own process group
+    (its own session on POSIX), so TaskController can pause and stop the whole
+    tree, including anything the child spawns.
+    """
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def _leads_own_group(pid) -> bool:
+    if os.name == "nt":
+        return False
+    try:
+        return os.getpgid(pid) == pid
+    except (OSError, TypeError):
+        return False
+
+
+def _signal_group(pid, name: str) -> bool:
+    """Sends the named signal to the process group led by pid. False where unsupported."""
+    sig = getattr(signal, name, None)
+    if sig is None or os.name == "nt":
+        return False
+    try:
+        os.killpg(pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+    return True
+
+
+def _process_tree(ps_proc: psutil.Process) -> list:
+    """ps_proc followed by all of its descendants (children first, like a kill order)."""
+    try:
+        children = ps_proc.children(recursive=True)
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        children = []
+    return [*reversed(children), ps_proc]
+
 
 class TaskController:
+    """
+    Stop / pause state for one task and the external processes it drives.
+
+    pause_event is set while paused; run_event is its complement (also set once
+    stopped), so workers block on run_event.wait() instead of polling. Every
+    state change notifies _state, which the per-process watchdogs wait on.
+
+    Pause and stop act on each process's whole tree: the process group for
+    children started with process_group_kwargs(), otherwise the psutil
+    descendants. Stopping asks ffmpeg to quit ("q" on stdin, when it is a
+    pipe), then the watchdog escalates to SIGTERM and SIGKILL, waiting
+    STOP_GRACE_SECONDS between steps. Per-process timeouts go the same way.
+    """
+
     def __init__(self):
         self.stop_event = threading.Event()
         self.pause_event = threading.Event()
+        self.run_event = threading.Event()
+        self.run_event.set()
         self.process = None  # subprocess.Popen object
         self.psutil_process = None
+        # All live processes driven by this controller (a batch pool may run several at once)
+        self._processes = {}  # pid -> (Popen, psutil.Process | None)
+        self._groups = set()  # pids that lead their own process group
+        self._lock = threading.Lock()
+        self._state = threading.Condition(self._lock)
+        self._stop_callbacks = []
+        self._timed_out = set()  # pids killed by their watchdog deadline
+        self._children = []  # controllers from child(), paused/resumed with this one
 
     def set_process(self, process: subprocess.Popen):
         self.process = process
+        self.psutil_process = None
         if process:
+            self.add_process(process)
+            with self._lock:
+                entry = self._processes.get(process.pid)
+            if entry:
+                self.psutil_process = entry[1]
+
+    def add_process(self, process: subprocess.Popen, timeout: float = None):
+        """
+        Registers an additional process so stop/pause apply to it (and its
+        children) as well, and starts its watchdog. timeout (seconds, paused
+        time excluded) stops the process if it runs longer; see timed_out().
+        """
+        try:
+            ps_proc = psutil.Process(process.pid)
+        except psutil.NoSuchProcess:
+            ps_proc = None
+        group = _leads_own_group(process.pid)
+        with self._lock:
+            # Forget processes that have already exited
+            for pid, (proc, _) in list(self._processes.items()):
+                if proc.poll() is not None:
+                    del self._processes[pid]
+                    self._groups.discard(pid)
+            self._processes[process.pid] = (process, ps_proc)
+            if group:
+                self._groups.add(process.pid)
+            self._timed_out.discard(process.pid)
+            self._state.notify_all()
+        # A process started while the task is paused must not run ahead of the others
+        if self.pause_event.is_set():
+            self._suspend_tree(process.pid, ps_proc)
+        threading.Thread(
+            target=self._watch, args=(process, ps_proc, timeout), daemon=True
+        ).start()
+
+    def remove_process(self, process: subprocess.Popen):
+        """Unregisters a process once it has finished."""
+        with self._state:
+            self._processes.pop(process.pid, None)
+            self._groups.discard(process.pid)
+            self._state.notify_all()
+        if self.process is process:
+            self.process = None
+            self.psutil_process = None
+
+    def timed_out(self, process: subprocess.Popen) -> bool:
+        """True if the watchdog stopped process because its timeout expired."""
+        with self._lock:
+            return process.pid in self._timed_out
+
+    def _live_processes(self):
+        """(pid, (Popen, psutil.Process | None)) pairs for the registered processes."""
+        with self._lock:
+            return list(self._processes.items())
+
+    def _is_group(self, pid) -> bool:
+        with self._lock:
+            return pid in self._groups
+
+    def _suspend_tree(self, pid, ps_proc):
+        if self._is_group(pid) and _signal_group(pid, "SIGSTOP"):
+            return
+        if ps_proc:
+            for proc in _process_tree(ps_proc):
+                try:
+                    proc.suspend()
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    pass
+
+    def _resume_tree(self, pid, ps_proc):
+        if self._is_group(pid) and _signal_group(pid, "SIGCONT"):
+            return
+        if ps_proc:
+            # Parent first, so it is running again when its children wake up
+            for proc in reversed(_process_tree(ps_proc)):
+                try:
+                    proc.resume()
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    pass
+
+    @staticmethod
+    def _signal_tree(process: subprocess.Popen, ps_proc, group: bool, kill: bool):
+        """Sends SIGTERM (or SIGKILL) to the process and everything below it."""
+        if group and _signal_group(process.pid, "SIGKILL" if kill else "SIGTERM"):
+            return
+        tree = _process_tree(ps_proc) if ps_proc else []
+        for proc in tree[:-1]:
+            try:
+                proc.kill() if kill else proc.terminate()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+        try:
+            process.kill() if kill else process.terminate()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _wait_exit(process: subprocess.Popen, timeout: float) -> bool:
+        try:
+            process.wait(timeout)
+            return True
+        except subprocess.TimeoutExpired:
+            return False
+
+    @staticmethod
+    def _request_quit(process: subprocess.Popen) -> bool:
+        """Asks ffmpeg to finish cleanly by typing "q". False if stdin isn't ours."""
+        stdin = process.stdin
+        if stdin is None:
+            return False
+        try:
+            stdin.write("q" if isinstance(stdin, io.TextIOBase) else b"q")
+            stdin.flush()
+            return True
+        except (OSError, ValueError):
+            return False
+
+    def _shut_down(self, process: subprocess.Popen, ps_proc, group: bool):
+        """q on stdin, then SIGTERM, then SIGKILL, each after STOP_GRACE_SECONDS."""
+        if process.poll() is None:
+            if not (self._request_quit(process) and self._wait_exit(process, STOP_GRACE_SECONDS)):
+                self._signal_tree(process, ps_proc, group, kill=False)
+                if not self._wait_exit(process, STOP_GRACE_SECONDS):
+                    self._signal_tree(process, ps_proc, group, kill=True)
+        if group:
+            # A wrapper that exited may have left children behind in its group
+            _signal_group(process.pid, "SIGKILL")
+
+    def _watch(self, process: subprocess.Popen, ps_proc, timeout: float = None):
+        """
+        Watchdog for one process. Sleeps on the state condition (no polling)
+        until the process is unregistered, the task is stopped or the deadline
+        passes; time spent paused does not count towards the deadline.
+        """
+        remaining = timeout
+        with self._state:
+            group = process.pid in self._groups
+            while process.pid in self._processes and not self.stop_event.is_set():
+                if self.pause_event.is_set() or remaining is None:
+                    self._state.wait()
+                    continue
+                if remaining <= 0:
+                    self._timed_out.add(process.pid)
+                    break
+                started = time.monotonic()
+                self._state.wait(remaining)
+                remaining -= time.monotonic() - started
+            else:
+                if process.pid not in self._processes:
+                    return
+        self._shut_down(process, ps_proc, group)
+
+    def _notify(self):
+        with self._state:
+            self._state.notify_all()
+
+    def add_stop_callback(self, callback):
+        """Calls callback() once when the task is stopped (immediately if it already is)."""
+        with self._lock:
+            if not self.stop_event.is_set():
+                self._stop_callbacks.append(callback)
+                return
+        callback()
+
+    def remove_stop_callback(self, callback):
+        with self._lock:
             try:
-                self.psutil_process = psutil.Process(process.pid)
-            except psutil.NoSuchProcess:
-                self.psutil_process = None
+                self._stop_callbacks.remove(callback)
+            except ValueError:
+                pass
 
     def stop(self):
-        """Signals the task to stop and terminates the underlying process."""
-        self.stop_event.set()
-        if self.process:
+        """Signals the task to stop; the watchdogs shut the processes down."""
+        with self._lock:
+            self.stop_event.set()
+            callbacks, self._stop_callbacks = self._stop_callbacks, []
+        # Wake everything blocked in wait_while_paused(); they see the stop flag
+        self.run_event.set()
+        # Suspended processes can neither read "q" nor handle SIGTERM
+        if self.pause_event.is_set():
+            self.pause_event.clear()
+            for pid, (_, ps_proc) in self._live_processes():
+                self._resume_tree(pid, ps_proc)
+        self._notify()
+        for callback in callbacks:
             try:
-                # Terminate the process. 
-                # On Windows, terminate() sends SIGTERM.
-                self.process.terminate()
+                callback()
             except Exception:
                 pass
-            
-            # If we were paused, we need to resume first to allow termination to handle gracefully if needed,
-            # though terminate() is usually abrupt. 
-            # However, if the process is suspended, it might not receive the terminate signal immediately/properly on some OSs.
-            # Best practice: resume then kill.
-            if self.pause_event.is_set():
-                self.resume()
-                try:
-                    self.process.kill() # Force kill if it was suspended
-                except Exception:
-                    pass
+
+    def child(self) -> "TaskController":
+        """
+        Returns a controller that is paused, resumed and stopped along with this
+        one, but can also be stopped on its own, e.g. to abort sibling work after
+        one part failed without marking the whole task as stopped.
+        Call release_child() once it is done.
+        """
+        child = TaskController()
+        with self._lock:
+            self._children.append(child)
+            paused = self.pause_event.is_set()
+        if paused:
+            child.pause()
+        self.add_stop_callback(child.stop)
+        return child
+
+    def release_child(self, child: "TaskController"):
+        with self._lock:
+            try:
+                self._children.remove(child)
+            except ValueError:
+                pass
+        self.remove_stop_callback(child.stop)
+
+    def _child_controllers(self):
+        with self._lock:
+            return list(self._children)
 
     def pause(self):
-        """Pauses the underlying process."""
+        """Suspends the underlying process trees."""
         if not self.pause_event.is_set() and not self.stop_event.is_set():
             self.pause_event.set()
-            if self.psutil_process:
-                try:
-                    self.psutil_process.suspend()
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    pass
+            self.run_event.clear()
+            for pid, (_, ps_proc) in self._live_processes():
+                self._suspend_tree(pid, ps_proc)
+            for child in self._child_controllers():
+                child.pause()
+            self._notify()
 
     def resume(self):
-        """Resumes the underlying process."""
+        """Resumes the underlying process trees."""
         if self.pause_event.is_set():
             self.pause_event.clear()
-            if self.psutil_process:
-                try:
-                    self.psutil_process.resume()
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    pass
+            self.run_event.set()
+            for pid, (_, ps_proc) in self._live_processes():
+                self._resume_tree(pid, ps_proc)
+            for child in self._child_controllers():
+                child.resume()
+            self._notify()
+
+    def wait_while_paused(self, timeout: float = None) -> bool:
+        """
+        Blocks while the task is paused, without waking up until it is resumed
+        or stopped. Returns False if the task was stopped (or still paused when
+        timeout expired).
+        """
+        if not self.run_event.wait(timeout):
+            return False
+        return not self.stop_event.is_set()
 
     def is_stopped(self):
         return self.stop_event.is_set()
+
+
+class ProcessBudget:
+    """Caps how many external processes (ffmpeg / yt-dlp) the app runs at once."""
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self._active = 0
+        self._cond = threading.Condition()
+
+    def set_limit(self, limit: int):
+        with self._cond:
+            self.limit = max(1, limit)
+            self._cond.notify_all()
+
+    def _wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def acquire(self, task_controller: TaskController = None, count: int = 1) -> bool:
+        """
+        Waits until count slots are free and takes them all at once, so callers
+        needing several can't deadlock holding part of them. A request larger
+        than the limit proceeds once nothing else is running.
+        Returns False if the task was stopped while waiting.
+        """
+        if task_controller:
+            # Stopping the task wakes us instead of a periodic re-check
+            task_controller.add_stop_callback(self._wake)
+        try:
+            with self._cond:
+                while self._active and self._active + count > self.limit:
+                    if task_controller and task_controller.is_stopped():
+                        return False
+                    self._cond.wait()
+                if task_controller and task_controller.is_stopped():
+                    return False
+                self._active += count
+                return True
+        finally:
+            if task_controller:
+                task_controller.remove_stop_callback(self._wake)
+
+    def release(self, count: int = 1):
+        with self._cond:
+            self._active = max(0, self._active - count)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, task_controller: TaskController = None, count: int = 1):
+        """Context manager yielding True once count slots are held (False if stopped first)."""
+        acquired = self.acquire(task_controller, count)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self.release(count)
+
+
+# Shared by every tab so concurrent downloads/clips can't oversubscribe the machine
+process_budget = ProcessBudget(DEFAULT_PROCESS_LIMIT)
+# Re-encoding jobs also hold one of these, so they can't exhaust encoder sessions
+# (or CPU) while stream copies keep running
+encoder_budget = ProcessBudget(DEFAULT_ENCODER_SLOTS)
+
+
+class ProgressBus:
+    """
+    Latest-value mailbox for progress updates, one slot per task key.
+
+    Worker threads post() as often as they like; only the newest value per key
+    is kept. The GUI thread drains the bus on a timer, so many busy jobs cost a
+    bounded number of redraws. post() and drain() rely on dict item assignment
+    and popitem() being atomic, so neither side takes a lock.
+    """
+
+    def __init__(self):
+        self._slots = {}
+
+    def post(self, key, value):
+        self._slots[key] = value
+
+    def take(self, key):
+        """Removes and returns the pending value for key (None if there is none)."""
+        return self._slots.pop(key, None)
+
+    def drain(self) -> list:
+        """Removes and returns all pending (key, value) pairs."""
+        items = []
+        while True:
+            try:
+                items.append(self._slots.popitem())
+            except KeyError:
+                return items
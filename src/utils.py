@@ -3,6 +3,7 @@ import subprocess
 import json
 import math
 from send2trash import send2trash
+from media_cache import get_cache
 
 def format_size(size_bytes):
     if size_bytes == 0:
@@ -13,6 +14,92 @@ def format_size(size_bytes):
     s = round(size_bytes / p, 2)
     return "%s %s" % (s, size_name[i])
 
+def probe_media(file_path):
+    """
+    Returns ffprobe's format/streams/chapters JSON for file_path.
+    Results are served from the shared metadata cache while the file is unchanged.
+    Returns None if the file can't be probed.
+    """
+    cache = get_cache()
+    data = cache.get("probe", file_path)
+    if data is not None:
+        return data
+
+    if not os.path.exists(file_path):
+        return None
+
+    cmd = [
+        "ffprobe",
+        "-v", "quiet",
+        "-print_format", "json",
+        "-show_format",
+        "-show_streams",
+        "-show_chapters",
+        file_path
+    ]
+
+    # Use subprocess to call ffprobe
+    # Creationflags for Windows to avoid popping up a window if not strictly necessary,
+    # though standard run usually doesn't if captured.
+    result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8')
+    if result.returncode != 0:
+        return None
+
+    data = json.loads(result.stdout)
+    cache.put("probe", file_path, data)
+    return data
+
+def get_video_packets(file_path, start=None, end=None):
+    """
+    Returns (pts_time, is_keyframe) for the first video stream's packets, in
+    decode order. Uses a packet-level scan, so nothing is decoded. start/end
+    (seconds) limit the scan to that interval; ffprobe begins reading at the
+    keyframe before start.
+    """
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags",
+        "-of", "compact=p=0",
+    ]
+    if start is not None or end is not None:
+        interval = f"{start:.6f}" if start is not None else ""
+        interval += f"%{end:.6f}" if end is not None else ""
+        cmd.extend(["-read_intervals", interval])
+    cmd.append(file_path)
+    result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8')
+    if result.returncode != 0:
+        return []
+
+    packets = []
+    for line in result.stdout.splitlines():
+        fields = dict(
+            part.split("=", 1) for part in line.strip().split("|") if "=" in part
+        )
+        try:
+            packets.append((float(fields.get("pts_time", "")), "K" in fields.get("flags", "")))
+        except ValueError:
+            pass
+    return packets
+
+def media_start_time(data):
+    """
+    format.start_time (seconds) from probe_media() data, 0.0 when unknown.
+    Packet timestamps are absolute, while -ss and user times count from here.
+    """
+    try:
+        return float((data or {})["format"]["start_time"])
+    except (KeyError, TypeError, ValueError):
+        return 0.0
+
+def get_keyframe_times(file_path):
+    """
+    Returns the presentation times (seconds) of the first video stream's keyframes.
+    Uses a packet-level scan, so nothing is decoded.
+    """
+    return sorted(t for t, is_key in get_video_packets(file_path) if is_key)
+
 def get_media_info(file_path):
     if not os.path.exists(file_path):
         return None, "File not found."
@@ -22,24 +109,10 @@ def get_media_info(file_path):
         file_size = os.path.getsize(file_path)
         formatted_size = format_size(file_size)
 
-        cmd = [
-            "ffprobe",
-            "-v", "quiet",
-            "-print_format", "json",
-            "-show_format",
-            "-show_streams",
-            file_path
-        ]
-        
-        # Use subprocess to call ffprobe
-        # Creationflags for Windows to avoid popping up a window if not strictly necessary, 
-        # though standard run usually doesn't if captured.
-        result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8')
-        if result.returncode != 0:
+        data = probe_media(file_path)
+        if data is None:
             return None, "Failed to probe file. Ensure ffprobe is installed."
 
-        data = json.loads(result.stdout)
-        
         info = {
             "filename": os.path.basename(file_path),
             "size": formatted_size,
@@ -115,13 +188,30 @@ def recycle_file(file_path: str) -> bool:
     return False
 
 def parse_time_str(time_str):
-    """Parses HH:MM:SS.ms string to seconds."""
+    """Parses HH:MM:SS.ms (also MM:SS.ms or SS.ms) string to seconds."""
     if not time_str:
         return 0.0
     try:
-        parts = time_str.split(':')
+        parts = time_str.strip().split(':')
         if len(parts) == 3:
             return int(parts[0]) * 3600 + int(parts[1]) * 60 + float(parts[2])
+        if len(parts) == 2:
+            return int(parts[0]) * 60 + float(parts[1])
+        if len(parts) == 1:
+            return float(parts[0])
     except ValueError:
         pass
     return 0.0
+
+def format_time_str(seconds):
+    """Formats seconds as HH:MM:SS.mmm (the inverse of parse_time_str)."""
+    millis = int(round(max(0.0, seconds) * 1000))
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}.{millis:03d}"
+
+def estimate_frame_duration(pts_times):
+    """Typical frame length (seconds): the median gap between sorted presentation times."""
+    diffs = sorted(b - a for a, b in zip(pts_times, pts_times[1:]) if b > a)
+    return diffs[len(diffs) // 2] if diffs else 1 / 30
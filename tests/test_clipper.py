@@ -0,0 +1,268 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import threading
+
+import pytest
+from clipper import (
+    ClipJob,
+    MultiClipJob,
+    SplitJob,
+    _plan_split,
+    _run_smart_cut,
+    plan_smart_cut,
+    start_clip,
+    start_multi_clip,
+)
+from keyframe_index import KeyframeIndex
+from constants import (
+    COPY_CODEC_LABEL,
+    PRECISE_CUT_LABEL,
+    SPLIT_BY_CHAPTERS,
+    SPLIT_BY_INTERVAL,
+    SPLIT_BY_TIMES,
+)
+from task_utils import ProcessBudget, TaskController
+
+FPS = 25
+
+def gop_packets(seconds=20, gop=50, open_gop_at=()):
+    """
+    (pts, is_keyframe) in decode order for a 25 fps stream with one B-frame
+    between references. GOPs starting at frames in open_gop_at are open: their
+    first two frames are decoded after the keyframe (leading pictures).
+    """
+    packets = []
+    total = seconds * FPS
+    for start in range(0, total, gop):
+        frames = list(range(start, min(start + gop, total)))
+        leading = []
+        if start in open_gop_at:
+            # Take the last two frames of the previous GOP as leading pictures
+            leading = [start - 2, start - 1]
+            packets[:] = [p for p in packets if round(p[0] * FPS) not in leading]
+        packets.append((frames[0] / FPS, True))
+        packets.extend((f / FPS, False) for f in leading)
+        rest = frames[1:]
+        for i in range(0, len(rest), 2):
+            pair = rest[i:i + 2]
+            # Reference first, then the B-frame shown before it
+            for f in reversed(pair):
+                packets.append((f / FPS, False))
+    return packets
+
+def summary(pieces):
+    return [(p.copy, round(p.start * FPS), p.frames) for p in pieces]
+
+def test_smart_cut_copies_whole_gops_between_reencoded_ends():
+    pieces = plan_smart_cut(gop_packets(), 3.24, 11.52)
+
+    assert summary(pieces) == [(False, 81, 19), (True, 100, 150), (False, 250, 38)]
+    assert sum(p.duration for p in pieces) == pytest.approx(207 / FPS)
+    # Encodes seek half a frame early, copies half a frame late (onto the keyframe)
+    assert pieces[0].seek == pytest.approx(3.24 - 0.02)
+    assert pieces[1].seek == pytest.approx(4.0 + 0.02)
+
+def test_smart_cut_copies_last_gop_when_end_is_a_keyframe():
+    pieces = plan_smart_cut(gop_packets(), 3.24, 12.0)
+
+    assert summary(pieces) == [(False, 81, 19), (True, 100, 200)]
+
+def test_smart_cut_reencodes_clip_inside_one_gop():
+    pieces = plan_smart_cut(gop_packets(), 4.5, 5.5)
+
+    assert summary(pieces) == [(False, 113, 25)]
+    assert plan_smart_cut(gop_packets(), 30.0, 31.0) == []
+
+def test_smart_cut_never_starts_a_copy_on_an_open_gop_keyframe():
+    packets = gop_packets(open_gop_at=(100, 200))
+    pieces = plan_smart_cut(packets, 3.24, 11.52)
+
+    # 4 s and 8 s have leading pictures, so the copy runs 6 s .. 10 s only
+    assert summary(pieces) == [(False, 81, 69), (True, 150, 100), (False, 250, 38)]
+
+def test_smart_cut_plans_on_the_start_time_timeline(mocker, tmp_path):
+    # MPEG-TS style file whose first packet is at 1.4 s
+    mocker.patch("clipper.probe_media", return_value={
+        "format": {"start_time": "1.400000"},
+        "streams": [{"codec_type": "video", "codec_name": "h264"}],
+    })
+    scan = mocker.patch(
+        "clipper.get_video_packets",
+        return_value=[(pts + 1.4, key) for pts, key in gop_packets()],
+    )
+    run = mocker.patch("clipper._run_stoppable_ffmpeg", return_value=(False, "stop"))
+    job = ClipJob("in.ts", "3.24", "11.52", str(tmp_path), "out")
+
+    _run_smart_cut(job, str(tmp_path / "out.mp4"))
+
+    assert scan.call_args[0][1:] == pytest.approx((3.24 + 1.4, 11.52 + 1.4 + 2.0))
+    # -ss counts from start_time, so the first piece seeks as if it were 0
+    command = run.call_args[0][0]
+    assert float(command[command.index("-ss") + 1]) == pytest.approx(3.24 - 0.02)
+    assert command[command.index("-frames:v") + 1] == "19"
+
+def test_concurrent_clips_get_distinct_output_names(mocker, tmp_path):
+    """Jobs running at once must not both pick the same not-yet-written output name."""
+    source = tmp_path / "in.mp4"
+    source.write_bytes(b"\0")
+    mocker.patch("clipper.scan_keyframes_near", return_value=None)
+    both_running = threading.Barrier(2, timeout=5)
+    outputs = []
+
+    def fake_ffmpeg(command, *args):
+        outputs.append(command[-1])
+        both_running.wait()
+        return True, "成功"
+
+    mocker.patch("clipper._run_stoppable_ffmpeg", side_effect=fake_ffmpeg)
+    jobs = [
+        ClipJob(str(source), "0", "5", str(tmp_path), "out", task_controller=TaskController())
+        for _ in range(2)
+    ]
+    threads = [threading.Thread(target=start_clip, args=(job,)) for job in jobs]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+
+    assert sorted(os.path.basename(o) for o in outputs) == ["out(1).mp4", "out.mp4"]
+
+
+def test_reencoding_clip_waits_for_encoder_slot(mocker, tmp_path):
+    source = tmp_path / "in.mp4"
+    source.write_bytes(b"\0")
+    mocker.patch("clipper.scan_keyframes_near", return_value=None)
+    budget = mocker.patch("clipper.encoder_budget", ProcessBudget(1))
+    # Another clip holds the only encoder slot
+    assert budget.acquire()
+    run = mocker.patch("clipper._run_stoppable_ffmpeg", return_value=(True, "成功"))
+    controller = TaskController()
+    job = ClipJob(
+        str(source), "0", "5", str(tmp_path), "out",
+        clip_mode=PRECISE_CUT_LABEL, task_controller=controller,
+    )
+    result = []
+    worker = threading.Thread(target=lambda: result.append(start_clip(job)))
+    worker.start()
+    worker.join(0.2)
+    # No encoder slot is free, so the clip is still waiting
+    assert worker.is_alive()
+
+    controller.stop()
+    worker.join(5)
+
+    success, message = result[0]
+    assert not success and "停止" in message
+    run.assert_not_called()
+
+
+def test_multi_clip_cuts_every_range_in_one_ffmpeg_run(mocker, tmp_path):
+    source = tmp_path / "in.mp4"
+    source.write_bytes(b"\0")
+    index = KeyframeIndex([0.0, 2.0, 4.0, 6.0], 0.04, decode_delay=0.08)
+    mocker.patch("clipper.scan_keyframes_near", return_value=index)
+    run = mocker.patch("clipper._run_stoppable_ffmpeg", return_value=(True, "成功"))
+    job = MultiClipJob(
+        str(source),
+        [("5", "7", "second"), ("2.5", "3", "first")],
+        str(tmp_path),
+        clip_mode=COPY_CODEC_LABEL,
+    )
+
+    success, _ = start_multi_clip(job)
+
+    assert success
+    run.assert_called_once()
+    command = run.call_args[0][0]
+    assert command.count("-i") == 1
+    # Input seek to just before the earliest keyframe's dts (2.0 - 0.08 - 0.02)
+    assert command[command.index("-i") - 1] == "1.900000"
+    outputs = [(command[i + 1], command[i + 3]) for i, a in enumerate(command) if a == "-ss"][1:]
+    # Sorted by start; each output seeks relative to the input seek point
+    assert outputs == [("0.000000", "1.100000"), ("2.000000", "5.100000")]
+    assert command[-1].endswith("second.mp4")
+
+
+def test_multi_clip_seeks_again_across_long_gaps(mocker, tmp_path):
+    source = tmp_path / "in.mp4"
+    source.write_bytes(b"\0")
+    mocker.patch("clipper.scan_keyframes_near", return_value=None)
+    run = mocker.patch("clipper._run_stoppable_ffmpeg", return_value=(True, "成功"))
+    job = MultiClipJob(
+        str(source),
+        [("5", "10", "a"), ("12", "15", "b"), ("40:00", "40:05", "c")],
+        str(tmp_path),
+        clip_mode=COPY_CODEC_LABEL,
+    )
+
+    assert start_multi_clip(job)[0]
+
+    # The nearby ranges share a run; the far one gets its own input seek
+    seeks = [call[0][0][call[0][0].index("-i") - 1] for call in run.call_args_list]
+    assert seeks == ["5.000000", "2400.000000"]
+
+
+def test_precise_multi_clip_takes_one_encoder_slot_per_output(mocker, tmp_path):
+    source = tmp_path / "in.mp4"
+    source.write_bytes(b"\0")
+    mocker.patch("clipper.scan_keyframes_near", return_value=None)
+    budget = mocker.patch("clipper.encoder_budget", ProcessBudget(2))
+    held = []
+
+    def fake_ffmpeg(command, *args):
+        held.append((command.count("-i"), len([a for a in command if a == "-to"]), budget._active))
+        return True, "成功"
+
+    mocker.patch("clipper._run_stoppable_ffmpeg", side_effect=fake_ffmpeg)
+    job = MultiClipJob(
+        str(source),
+        [(str(t), str(t + 1), f"c{t}") for t in range(0, 5)],
+        str(tmp_path),
+        clip_mode=PRECISE_CUT_LABEL,
+    )
+
+    assert start_multi_clip(job)[0]
+
+    # Batches are sized to the two slots available, and hold one per output
+    assert held == [(1, 2, 2), (1, 2, 2), (1, 1, 1)]
+    assert budget._active == 0
+
+
+def test_split_plan_uses_chapter_starts_after_the_first():
+    data = {"chapters": [
+        {"start_time": "600.000000", "tags": {"title": "Two"}},
+        {"start_time": "0.000000", "tags": {"title": "One"}},
+        {"start_time": "1500.500000", "tags": {}},
+    ]}
+    job = SplitJob("in.mp4", "out", "ep", split_by=SPLIT_BY_CHAPTERS)
+
+    args, chapters = _plan_split(job, data)
+
+    assert args == ["-segment_times", "600.000000,1500.500000"]
+    assert chapters == [(0.0, "One"), (600.0, "Two"), (1500.5, "")]
+
+
+def test_split_plan_chapters_count_from_start_time():
+    data = {"format": {"start_time": "1.400000"}, "chapters": [
+        {"start_time": "11.400000", "tags": {"title": "One"}},
+        {"start_time": "601.400000", "tags": {"title": "Two"}},
+    ]}
+    job = SplitJob("in.ts", "out", "ep", split_by=SPLIT_BY_CHAPTERS)
+
+    args, chapters = _plan_split(job, data)
+
+    # The 10 s before the first chapter becomes its own (untitled) part
+    assert args == ["-segment_times", "10.000000,600.000000"]
+    assert chapters == [(pytest.approx(10.0), "One"), (pytest.approx(600.0), "Two")]
+
+
+def test_split_plan_times_and_interval():
+    times = SplitJob("in.mp4", "out", "ep", split_by=SPLIT_BY_TIMES, split_times=["25:30", "10:00", "0"])
+    interval = SplitJob("in.mp4", "out", "ep", split_by=SPLIT_BY_INTERVAL, interval=600)
+
+    assert _plan_split(times, {}) == (["-segment_times", "600.000000,1530.000000"], [])
+    assert _plan_split(interval, {}) == (["-segment_time", "600.000000"], [])
+    with pytest.raises(Exception, match="章節"):
+        _plan_split(SplitJob("in.mp4", "out", "ep"), {"chapters": []})
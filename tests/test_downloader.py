@@ -6,7 +6,14 @@ import subprocess
 from unittest.mock import MagicMock, patch
 import pytest
 import yt_dlp
-from downloader import DownloadJob, DownloadStatus, start_download
+from downloader import (
+    DownloadJob,
+    DownloadStatus,
+    ThroughputProfile,
+    _terminate_spawned_processes,
+    start_download,
+)
+from stream_resolver import ResolvedStreams
 
 @pytest.fixture
 def job():
@@ -21,9 +28,15 @@ def job():
 
 def test_start_download_with_ffmpeg(mocker, job):
     """
-    Test that start_download calls _run_stoppable_ffmpeg with the correct arguments
-    when start and end times are provided.
+    Test that start_download resolves the page URL and clips the direct streams
+    with _run_stoppable_ffmpeg when start and end times are provided.
     """
+    mocker.patch(
+        "downloader.resolve_streams",
+        return_value=ResolvedStreams(
+            video_url="https://cdn.example/video", audio_url="https://cdn.example/audio"
+        ),
+    )
     mock_run = mocker.patch("downloader._run_stoppable_ffmpeg", return_value=(True, "Success"))
     start_download(job)
     
@@ -32,14 +45,20 @@ def test_start_download_with_ffmpeg(mocker, job):
     command = args[0]
     
     assert "ffmpeg" in command
-    assert job.url in command
+    assert "https://cdn.example/video" in command
+    assert "https://cdn.example/audio" in command
     assert job.start_time in command
-    assert job.end_time in command
+    # Input seeking resets timestamps, so the end time becomes a duration
+    assert command[command.index("-t") + 1] == "60.000"
 
 def test_start_download_with_yt_dlp(mocker, job):
     """
     Test that start_download calls yt-dlp when ffmpeg fails.
     """
+    mocker.patch(
+        "downloader.resolve_streams",
+        return_value=ResolvedStreams(video_url="https://cdn.example/video"),
+    )
     # First call to ffmpeg fails
     mocker.patch("downloader._run_stoppable_ffmpeg", return_value=(False, "ffmpeg failed"))
     mock_ydl = mocker.patch("yt_dlp.YoutubeDL")
@@ -49,3 +68,112 @@ def test_start_download_with_yt_dlp(mocker, job):
     start_download(job)
     
     yt_dlp.YoutubeDL.assert_called_once()
+
+def test_failed_direct_clip_removes_partial_file_and_reports(mocker, job, tmp_path):
+    """
+    Test that a partial ffmpeg output is removed before yt-dlp reuses the path.
+    """
+    job.output_path = str(tmp_path)
+    partial = tmp_path / "test.mp4"
+    mocker.patch(
+        "downloader.resolve_streams",
+        return_value=ResolvedStreams(video_url="https://cdn.example/video"),
+    )
+
+    def failing_ffmpeg(command, *args):
+        partial.write_bytes(b"truncated")
+        return False, "Server returned 403"
+
+    mocker.patch("downloader._run_stoppable_ffmpeg", side_effect=failing_ffmpeg)
+    mock_ydl = mocker.patch("yt_dlp.YoutubeDL")
+    seen = []
+    mock_ydl.return_value.__enter__.return_value.download.side_effect = (
+        lambda urls: seen.append(partial.exists())
+    )
+    job.progress_hook = MagicMock()
+
+    start_download(job)
+
+    assert seen == [False]
+    infos = [c[0][0].get("info", "") for c in job.progress_hook.call_args_list]
+    assert any("403" in info for info in infos)
+
+def test_audio_only_streams_do_not_map_video(mocker, job):
+    """
+    Test that an audio-only resolution doesn't ask ffmpeg for a video stream.
+    """
+    mocker.patch(
+        "downloader.resolve_streams",
+        return_value=ResolvedStreams(video_url="https://cdn.example/audio", has_video=False),
+    )
+    mock_run = mocker.patch("downloader._run_stoppable_ffmpeg", return_value=(True, "Success"))
+
+    start_download(job)
+
+    command = mock_run.call_args[0][0]
+    maps = [command[i + 1] for i, a in enumerate(command) if a == "-map"]
+    assert maps == ["0:a?"]
+
+def test_unresolvable_url_skips_direct_ffmpeg(mocker, job):
+    """
+    Test that a page URL yt-dlp can't resolve goes straight to the yt-dlp download.
+    """
+    mocker.patch("downloader.resolve_streams", return_value=None)
+    mock_run = mocker.patch("downloader._run_stoppable_ffmpeg")
+    mocker.patch("yt_dlp.YoutubeDL")
+
+    start_download(job)
+
+    mock_run.assert_not_called()
+    yt_dlp.YoutubeDL.assert_called_once()
+
+def test_throughput_profile_reaches_yt_dlp(mocker, job):
+    """
+    Test that the job's throughput profile is translated into yt-dlp options.
+    """
+    mocker.patch("downloader.resolve_streams", return_value=None)
+    mock_ydl = mocker.patch("yt_dlp.YoutubeDL")
+    job.throughput = ThroughputProfile(concurrent_fragments=8, external_downloader="aria2c")
+
+    start_download(job)
+
+    ydl_opts = mock_ydl.call_args[0][0]
+    assert ydl_opts["concurrent_fragment_downloads"] == 8
+    assert ydl_opts["external_downloader"] == {"default": "aria2c"}
+    assert "aria2c" in ydl_opts["external_downloader_args"]
+    # Stop/pause handling must stay attached
+    assert len(ydl_opts["progress_hooks"]) == 1
+
+def test_yt_dlp_fallback_downloads_only_the_section(mocker, job):
+    """
+    Test that the yt-dlp fallback requests the clip range instead of trimming afterwards.
+    """
+    mocker.patch("downloader.resolve_streams", return_value=None)
+    mock_ydl = mocker.patch("yt_dlp.YoutubeDL")
+
+    start_download(job)
+
+    ydl_opts = mock_ydl.call_args[0][0]
+    ranges = list(ydl_opts["download_ranges"]({}, None))
+    assert ranges[0]["start_time"] == 60.0
+    assert ranges[0]["end_time"] == 120.0
+    assert "-ss" not in ydl_opts.get("postprocessor_args", [])
+
+
+def test_stop_terminates_this_jobs_external_downloader(tmp_path):
+    """aria2c runs outside the TaskController, so stopping has to find it by its output name."""
+    def spawn(out_name):
+        return subprocess.Popen(
+            [sys.executable, "-c", "import time; time.sleep(30)", f"--out={out_name}"]
+        )
+
+    ours = spawn("clip.f137.mp4.part")
+    other = spawn("clip(1).f137.mp4.part")
+    try:
+        _terminate_spawned_processes(str(tmp_path / "clip.mp4"))
+        assert ours.wait(5) is not None
+        assert other.poll() is None
+    finally:
+        for proc in (ours, other):
+            proc.kill()
+            proc.wait()
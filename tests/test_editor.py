@@ -0,0 +1,202 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import io
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+from editor import (
+    CropRegion,
+    FramePrefetcher,
+    KeyframeManager,
+    VideoFrameReader,
+    _escape_filter_path,
+    build_crop_filter,
+    get_filmstrip,
+)
+from media_cache import MediaCache
+
+FPS = 10
+
+@pytest.fixture
+def video_path(tmp_path):
+    path = str(tmp_path / "frames.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), FPS, (64, 48))
+    for i in range(30):
+        # Each frame has a distinct brightness so we can tell them apart
+        writer.write(np.full((48, 64, 3), i * 8, dtype=np.uint8))
+    writer.release()
+    return path
+
+def brightness(image):
+    return int(np.asarray(image).mean())
+
+def test_forward_reads_match_seeks(video_path):
+    reader = VideoFrameReader(video_path)
+    sequential = [brightness(reader.get_frame_at_ms(i * 100)) for i in range(0, 30, 3)]
+    seeked = []
+    for i in reversed(range(0, 30, 3)):
+        seeked.append(brightness(reader.get_frame_at_ms(i * 100)))
+    reader.close()
+    assert sequential == list(reversed(seeked))
+    assert sequential == sorted(sequential)
+
+def test_preview_frames_are_cached(video_path, mocker):
+    reader = VideoFrameReader(video_path)
+    first = reader.get_frame_for_preview(1000, (32, 24))
+    spy = mocker.spy(reader, "_read_frame")
+    # Same frame index (10 fps), so no decode
+    assert reader.get_frame_for_preview(1040, (32, 24)) is first
+    spy.assert_not_called()
+    reader.close()
+
+def test_frame_cache_respects_byte_budget(video_path):
+    frame_bytes = 32 * 24 * 3
+    reader = VideoFrameReader(video_path, cache_bytes=frame_bytes * 2)
+    for ms in (0, 100, 200):
+        reader.get_frame_for_preview(ms, (32, 24))
+    assert len(reader._frame_cache) == 2
+    assert reader._cached_bytes <= frame_bytes * 2
+    reader.close()
+
+def test_prefetcher_delivers_latest_request_and_warms_neighbours(video_path):
+    reader = VideoFrameReader(video_path)
+    delivered = []
+    done = threading.Event()
+
+    def on_frame(time_ms, frame):
+        delivered.append(time_ms)
+        done.set()
+
+    prefetcher = FramePrefetcher(reader, on_frame, (32, 24))
+    prefetcher.request(500)
+    assert done.wait(5)
+    # Give the idle prefetch a moment to decode the following frames
+    deadline = time.time() + 5
+    while reader.get_cached_preview(800, (32, 24)) is None and time.time() < deadline:
+        time.sleep(0.01)
+    warmed = reader.get_cached_preview(800, (32, 24))
+    prefetcher.stop()
+    reader.close()
+
+    assert delivered == [500]
+    assert warmed is not None
+
+def test_filmstrip_is_built_once_and_reused(video_path, tmp_path, mocker):
+    mocker.patch("editor.get_cache", return_value=MediaCache(db_path=str(tmp_path / "cache.sqlite3")))
+    mocker.patch("editor.FILMSTRIP_DIR", str(tmp_path / "filmstrips"))
+    # 16:9 source at 18 px high -> 32x18 thumbnails; three of them
+    thumb_bytes = 32 * 18 * 3
+    raw = b"".join(bytes([i * 40]) * thumb_bytes for i in range(3))
+    mock_popen = mocker.patch("editor.subprocess.Popen")
+    mock_popen.return_value.stdout = io.BytesIO(raw)
+
+    strip = get_filmstrip(video_path, 1920, 1080, interval_s=5, thumb_height=18)
+    again = get_filmstrip(video_path, 1920, 1080, interval_s=5, thumb_height=18)
+
+    mock_popen.assert_called_once()
+    assert "-skip_frame" in mock_popen.call_args[0][0]
+    assert (strip.count, strip.thumb_width) == (3, 32)
+    assert again.count == 3
+    # Nearest thumbnail to 9.9 s with a 5 s interval is the third one
+    assert strip.index_at(9900) == 2
+    assert brightness(again.thumbnail(2)) == 80
+
+def test_filmstrip_cache_follows_the_filmstrip_dir(video_path, tmp_path, mocker):
+    mocker.patch("editor.get_cache", return_value=MediaCache(db_path=str(tmp_path / "cache.sqlite3")))
+    mocker.patch("editor.FILMSTRIP_DIR", str(tmp_path / "old"))
+    raw = bytes(32 * 18 * 3)
+    mock_popen = mocker.patch("editor.subprocess.Popen")
+    mock_popen.return_value.stdout = io.BytesIO(raw)
+    get_filmstrip(video_path, 1920, 1080, interval_s=5, thumb_height=18)
+
+    # 快取目錄搬家後仍找得到圖檔
+    os.rename(tmp_path / "old", tmp_path / "new")
+    mocker.patch("editor.FILMSTRIP_DIR", str(tmp_path / "new"))
+    budget = mocker.Mock()
+    strip = get_filmstrip(video_path, 1920, 1080, interval_s=5, thumb_height=18, budget=budget)
+
+    assert strip.count == 1
+    mock_popen.assert_called_once()
+    budget.slot.assert_not_called()
+
+def test_preview_is_downscaled_keeping_aspect(video_path):
+    reader = VideoFrameReader(video_path)
+    small = reader.get_frame_for_preview(0, (32, 32))
+    other = reader.get_frame_for_preview(100, (32, 32))
+    unscaled = reader.get_frame_for_preview(0, (640, 480))
+    reader.close()
+
+    assert small.size == (32, 24)
+    assert unscaled.size == (64, 48)  # never upscaled
+    # Frames come from a shared resize buffer but must not share pixels
+    assert brightness(small) != brightness(other)
+
+def make_keyframes(*crops):
+    manager = KeyframeManager()
+    for time_ms, crop in crops:
+        manager.add_keyframe(time_ms, crop)
+    return manager
+
+def test_single_keyframe_is_a_static_crop():
+    manager = make_keyframes((0, CropRegion(10, 20, 320, 180)))
+    crop_filter, commands = build_crop_filter(manager, 640, 360)
+    assert crop_filter == "crop@pan=w=320:h=180:x=10:y=20,scale=640:360"
+    assert commands == ""
+
+def test_pan_only_moves_the_crop_window():
+    manager = make_keyframes(
+        (0, CropRegion(0, 0, 320, 180)),
+        (1000, CropRegion(100, 50, 320, 180)),
+    )
+    crop_filter, commands = build_crop_filter(manager, 320, 180, fps=10)
+    lines = commands.splitlines()
+    assert crop_filter.startswith("crop@pan=w=320:h=180:x=0:y=0")
+    assert len(lines) == 10
+    assert lines[-1] == "1.0000 crop@pan x 100, crop@pan y 50;"
+
+def test_zoom_rescales_instead_of_resizing_the_crop():
+    manager = make_keyframes(
+        (0, CropRegion(0, 0, 320, 180)),
+        (1000, CropRegion(0, 0, 160, 90)),
+    )
+    crop_filter, commands = build_crop_filter(manager, 320, 180, fps=10)
+    # Output size stays fixed; the source is scaled up so the crop fills it
+    assert crop_filter.endswith("crop@pan=w=320:h=180:x=0:y=0")
+    assert commands.splitlines()[-1] == (
+        "1.0000 scale@zoom w 640, scale@zoom h 360, crop@pan x 0, crop@pan y 0;"
+    )
+    assert " w " not in commands.replace("scale@zoom w", "")
+
+def test_filter_path_is_escaped_for_the_filtergraph():
+    assert _escape_filter_path("C:\\tmp\\a,b.cmd") == "C\\\\:/tmp/a\\,b.cmd"
+
+def test_batch_interpolation_matches_single_lookups():
+    manager = make_keyframes(
+        (2000, CropRegion(300, 10, 640, 360)),
+        (0, CropRegion(0, 0, 320, 180)),
+        (5000, CropRegion(7, 333, 101, 99)),
+    )
+    times = np.linspace(-500, 6000, 997)
+    xs, ys, ws, hs = manager.interpolate_crops(times)
+    for i, t in enumerate(times):
+        crop = manager.interpolate_crop(t)
+        assert (xs[i], ys[i], ws[i], hs[i]) == (crop.x, crop.y, crop.width, crop.height)
+
+def test_keyframes_stay_sorted_and_replace_same_time():
+    manager = make_keyframes(
+        (3000, CropRegion(3, 3, 3, 3)),
+        (1000, CropRegion(1, 1, 1, 1)),
+        (2000, CropRegion(2, 2, 2, 2)),
+    )
+    manager.add_keyframe(2000, CropRegion(9, 9, 9, 9))
+    manager.remove_keyframe(3000)
+    manager.remove_keyframe(1234)  # no keyframe there
+
+    assert [kf.time_ms for kf in manager.keyframes] == [1000, 2000]
+    assert manager.get_keyframe_at(2000).crop.x == 9
+    assert manager.get_keyframe_at(1500) is None
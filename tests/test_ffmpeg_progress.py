@@ -0,0 +1,63 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from unittest.mock import MagicMock
+from ffmpeg_progress import run_ffmpeg, with_progress_args
+
+def block(out_time_us, speed, progress="continue"):
+    return [
+        "frame=10\n",
+        "fps=25.00\n",
+        "total_size=2048\n",
+        f"out_time_us={out_time_us}\n",
+        f"speed={speed}\n",
+        f"progress={progress}\n",
+    ]
+
+def fake_process(mocker, stdout, stderr=()):
+    process = MagicMock()
+    process.stdout = stdout
+    process.stderr = list(stderr)
+    process.returncode = 0
+    return mocker.patch("ffmpeg_progress.subprocess.Popen", return_value=process)
+
+def test_progress_blocks_become_events(mocker):
+    stdout = block(5_000_000, "2.5x") + block(10_000_000, "N/A", progress="end")
+    stderr = ["  Duration: 00:00:20.00, start: 0.000000, bitrate: 100 kb/s\n"]
+    mock_popen = fake_process(mocker, stdout, stderr)
+    events = []
+
+    result = run_ffmpeg(["ffmpeg", "-i", "in.mp4", "out.mp4"], on_progress=events.append, min_interval=0)
+
+    command = mock_popen.call_args[0][0]
+    assert command[:4] == ["ffmpeg", "-progress", "pipe:1", "-nostats"]
+    assert result.ok
+    assert len(events) == 2
+    # stderr is read on another thread, so the Duration may not be known yet here
+    assert events[0].out_time == 5.0 and events[0].speed == 2.5
+    assert events[0].total_size == 2048 and events[0].fps == 25.0
+    assert events[1].finished and events[1].percent == 100.0
+
+def test_known_duration_gives_percent_and_eta(mocker):
+    fake_process(mocker, block(5_000_000, "2.5x"))
+    events = []
+    run_ffmpeg(["ffmpeg", "-i", "in.mp4", "out.mp4"], None, events.append, total_duration=20.0, min_interval=0)
+    assert events[0].percent == 25.0
+    assert events[0].eta == 6.0
+    assert events[0].summary() == "25.0% | 2.50x | ETA 00:06"
+
+def test_callbacks_are_throttled_but_final_block_is_kept(mocker):
+    stdout = []
+    for i in range(50):
+        stdout += block(i * 100_000, "1x")
+    stdout += block(5_000_000, "1x", progress="end")
+    fake_process(mocker, stdout)
+    events = []
+    run_ffmpeg(["ffmpeg", "-i", "in.mp4", "out.mp4"], None, events.append, total_duration=5.0, min_interval=60)
+    assert len(events) == 2
+    assert events[-1].finished
+
+def test_existing_progress_args_are_not_duplicated():
+    command = ["ffmpeg", "-i", "in.mp4", "-progress", "pipe:1", "out.mp4"]
+    assert with_progress_args(command) == command
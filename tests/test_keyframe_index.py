@@ -0,0 +1,161 @@
+import os
+import sys
+import threading
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import pytest
+
+from keyframe_index import (
+    KeyframeIndex,
+    KeyframeIndexer,
+    build_keyframe_index,
+    get_cached_keyframe_index,
+    scan_keyframes_near,
+)
+from media_cache import MediaCache
+
+
+@pytest.fixture
+def cache(mocker, tmp_path):
+    cache = MediaCache(db_path=str(tmp_path / "cache.sqlite3"))
+    mocker.patch("keyframe_index.get_cache", return_value=cache)
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def probe(mocker):
+    return mocker.patch("keyframe_index.probe_media", return_value={"format": {}})
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(b"\0" * 16)
+    return str(path)
+
+
+def packets(keyframes, count=100, fps=25):
+    return [(i / fps, i in keyframes) for i in range(count)]
+
+
+def test_snap_and_drift():
+    index = KeyframeIndex([0.0, 2.0, 4.0], 0.04)
+
+    assert index.snap(3.0) == 2.0
+    assert index.drift(3.0) == pytest.approx(1.0)
+    assert index.at_or_after(3.0) == 4.0
+    # Within half a frame of a keyframe counts as on it
+    assert index.is_keyframe(2.01)
+    assert index.snap(1.99) == 2.0
+    assert index.drift(1.99) == 0.0
+    assert not index.is_keyframe(2.1)
+
+
+def test_build_keyframe_index_scans_once(mocker, cache, video):
+    scan = mocker.patch("keyframe_index.get_video_packets", return_value=packets({0, 50}))
+
+    index = build_keyframe_index(video)
+    again = build_keyframe_index(video)
+
+    assert index.times == [0.0, 2.0]
+    assert index.frame_duration == pytest.approx(0.04)
+    assert index.decode_delay == 0.0
+    assert again == index
+    scan.assert_called_once_with(video)
+
+
+def test_indexer_shares_one_scan_between_requests(mocker, cache, video):
+    release = threading.Event()
+
+    def slow_scan(path):
+        release.wait(5)
+        return packets({0, 25})
+
+    scan = mocker.patch("keyframe_index.get_video_packets", side_effect=slow_scan)
+    indexer = KeyframeIndexer()
+    results = []
+    both_done = threading.Event()
+
+    def on_ready(index):
+        results.append(index)
+        if len(results) == 2:
+            both_done.set()
+
+    indexer.request(video, on_ready)
+    indexer.request(video, on_ready)
+    release.set()
+
+    assert both_done.wait(5)
+    assert results[0].times == [0.0, 1.0]
+    assert results[1] is results[0]
+    # Later requests are answered from the cache
+    assert get_cached_keyframe_index(video) == results[0]
+    scan.assert_called_once()
+
+
+def test_decode_delay_from_reordered_packets(mocker, cache, video):
+    # Decode order I0 P2 B1 P4 B3: each P is decoded one frame before it is shown
+    order = [0, 2, 1, 4, 3]
+    mocker.patch(
+        "keyframe_index.get_video_packets",
+        return_value=[(i / 25, i == 0) for i in order],
+    )
+
+    index = build_keyframe_index(video)
+
+    assert index.decode_delay == pytest.approx(0.04)
+    assert KeyframeIndex.from_dict(index.to_dict()) == index
+
+
+def test_times_count_from_start_time(mocker, probe, cache, video):
+    probe.return_value = {"format": {"start_time": "1.400000"}}
+    mocker.patch(
+        "keyframe_index.get_video_packets",
+        return_value=[(t + 1.4, key) for t, key in packets({0, 50})],
+    )
+
+    assert build_keyframe_index(video).times == pytest.approx([0.0, 2.0])
+
+
+def test_scan_near_reads_only_around_the_cut_points(mocker, probe, cache, video):
+    probe.return_value = {"format": {"start_time": "1.0"}}
+    # 25 fps, keyframes every 2 s, decode order I0 P2 B1 P4 B3 ...
+    stream = []
+    for gop in range(0, 1000, 50):
+        stream.append((gop, True))
+        for i in range(gop + 1, gop + 49, 2):
+            stream.extend([(i + 1, False), (i, False)])
+        stream.append((gop + 49, False))
+
+    def scan(path, start, end):
+        # Starts at the keyframe at or before start, like ffprobe
+        first = next(i for i in range(len(stream) - 1, -1, -1)
+                     if stream[i][1] and stream[i][0] / 25 + 1.0 <= start)
+        return [(f / 25 + 1.0, key) for f, key in stream[first:]
+                if f / 25 + 1.0 <= end]
+
+    get_video_packets = mocker.patch("keyframe_index.get_video_packets", side_effect=scan)
+
+    index = scan_keyframes_near(video, [33.0, 3.0, 3.5])
+
+    # 3.0 and 3.5 share one scan; nothing between the windows is read
+    assert [call[0][1:] for call in get_video_packets.call_args_list] == [
+        pytest.approx((3.0, 5.5)),
+        pytest.approx((33.0, 35.0)),
+    ]
+    assert index.times == pytest.approx([2.0, 4.0, 32.0, 34.0])
+    assert index.snap(3.0) == pytest.approx(2.0)
+    assert index.is_keyframe(34.0)
+    assert index.decode_delay == pytest.approx(0.04)
+    # Partial indexes are not cached
+    assert get_cached_keyframe_index(video) is None
+
+
+def test_scan_near_uses_the_cached_index(mocker, cache, video):
+    cached = KeyframeIndex([0.0, 2.0], 0.04)
+    cache.put("keyframe_index", video, cached.to_dict())
+    scan = mocker.patch("keyframe_index.get_video_packets")
+
+    assert scan_keyframes_near(video, [1.0]) == cached
+    scan.assert_not_called()
@@ -0,0 +1,92 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import sqlite3
+
+import pytest
+from media_cache import MediaCache
+
+@pytest.fixture
+def cache(tmp_path):
+    c = MediaCache(db_path=str(tmp_path / "cache.sqlite3"))
+    yield c
+    c.close()
+
+@pytest.fixture
+def media_file(tmp_path):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(b"x" * 100)
+    return str(path)
+
+def test_put_then_get_returns_value(cache, media_file):
+    cache.put("probe", media_file, {"format": {"duration": "12.5"}})
+    assert cache.get("probe", media_file) == {"format": {"duration": "12.5"}}
+    assert cache.get("other", media_file) is None
+
+def test_modified_file_invalidates_entry(cache, media_file):
+    cache.put("probe", media_file, {"format": {"duration": "12.5"}})
+    with open(media_file, "ab") as f:
+        f.write(b"more")
+    assert cache.get("probe", media_file) is None
+
+def test_missing_file_is_a_miss(cache, tmp_path):
+    assert cache.get("probe", str(tmp_path / "missing.mp4")) is None
+
+def test_lru_eviction_respects_byte_cap(tmp_path):
+    cache = MediaCache(db_path=str(tmp_path / "cache.sqlite3"), max_bytes=250)
+    files = []
+    for i in range(3):
+        path = tmp_path / f"f{i}.mp4"
+        path.write_bytes(b"x")
+        files.append(str(path))
+
+    cache.put("probe", files[0], {"pad": "a" * 100})
+    cache.put("probe", files[1], {"pad": "b" * 100})
+    # Touch the first entry so the second becomes least recently used
+    assert cache.get("probe", files[0]) is not None
+    cache.put("probe", files[2], {"pad": "c" * 100})
+
+    assert cache.get("probe", files[0]) is not None
+    assert cache.get("probe", files[1]) is None
+    assert cache.get("probe", files[2]) is not None
+    cache.close()
+
+def test_attachments_count_towards_cap_and_go_with_their_entry(tmp_path):
+    cache = MediaCache(db_path=str(tmp_path / "cache.sqlite3"), max_bytes=1500)
+    images = []
+    for i in range(2):
+        video = tmp_path / f"f{i}.mp4"
+        video.write_bytes(b"x")
+        image = tmp_path / f"f{i}.png"
+        image.write_bytes(b"\0" * 1000)
+        images.append(image)
+        cache.put("filmstrip", str(video), {"image": image.name}, attachment=str(image))
+
+    # Two 1000-byte images don't fit in 1500 bytes: the older entry and its file go
+    assert cache.get("filmstrip", str(tmp_path / "f0.mp4")) is None
+    assert not images[0].exists()
+    assert images[1].exists()
+
+    # A changed source file drops the stale entry's attachment too
+    with open(tmp_path / "f1.mp4", "ab") as f:
+        f.write(b"more")
+    assert cache.get("filmstrip", str(tmp_path / "f1.mp4")) is None
+    assert not images[1].exists()
+    cache.close()
+
+def test_databases_without_attachment_column_are_upgraded(tmp_path, media_file):
+    db_path = str(tmp_path / "cache.sqlite3")
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE entries (kind TEXT NOT NULL, path TEXT NOT NULL,"
+        " size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, data TEXT NOT NULL,"
+        " nbytes INTEGER NOT NULL, last_access REAL NOT NULL, PRIMARY KEY (kind, path))"
+    )
+    conn.commit()
+    conn.close()
+
+    cache = MediaCache(db_path=db_path)
+    cache.put("probe", media_file, {"ok": True})
+    assert cache.get("probe", media_file) == {"ok": True}
+    cache.close()
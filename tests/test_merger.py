@@ -0,0 +1,57 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import threading
+import time
+
+from merger import _get_durations, _get_total_duration
+from task_utils import TaskController
+
+def probe_result(duration):
+    return {"format": {"duration": str(duration)}}
+
+def test_durations_keep_input_order(mocker):
+    def slow_probe(path):
+        # Later files finish first
+        time.sleep(0.05 * (3 - int(path[1])))
+        return probe_result(int(path[1]) * 10)
+
+    mocker.patch("merger.probe_media", side_effect=slow_probe)
+
+    assert _get_durations(["f1", "f2", "f3"]) == [10.0, 20.0, 30.0]
+
+def test_failed_probe_counts_as_zero(mocker):
+    results = {"ok": probe_result(12.5), "none": None, "bad": {"format": {"duration": "N/A"}}}
+
+    def probe(path):
+        if path == "gone":
+            raise OSError("unreachable share")
+        return results[path]
+
+    mocker.patch("merger.probe_media", side_effect=probe)
+
+    assert _get_durations(["ok", "none", "bad", "gone"]) == [12.5, 0.0, 0.0, 0.0]
+    assert _get_total_duration(["ok", "ok"]) == 25.0
+
+def test_stop_cancels_pending_probes(mocker):
+    mocker.patch("merger.PROBE_WORKERS", 1)
+    release = threading.Event()
+    probed = []
+
+    def stuck_probe(path):
+        probed.append(path)
+        release.wait(5)
+        return probe_result(1)
+
+    mocker.patch("merger.probe_media", side_effect=stuck_probe)
+    controller = TaskController()
+    threading.Timer(0.05, controller.stop).start()
+
+    started = time.monotonic()
+    assert _get_durations(["a", "b", "c"], controller) is None
+    # Returned on stop without waiting for the stuck probe
+    assert time.monotonic() - started < 2
+    release.set()
+    time.sleep(0.05)
+    assert probed == ["a"]
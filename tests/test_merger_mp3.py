@@ -11,8 +11,8 @@ from constants import BEST_CODEC_LABEL
 
 class TestMergerMp3(unittest.TestCase):
 
-    @patch('merger.subprocess.run')
-    @patch('merger.subprocess.Popen')
+    @patch('utils.subprocess.run')
+    @patch('ffmpeg_progress.subprocess.Popen')
     @patch('merger.os.remove') # Mock remove to avoid errors
     @patch('merger.os.path.exists', return_value=False) # Mock exists
     def test_merge_mp3_forces_copy(self, mock_exists, mock_remove, mock_popen, mock_run):
@@ -48,8 +48,8 @@ class TestMergerMp3(unittest.TestCase):
         self.assertNotIn("-c:v", command)
         self.assertNotIn("hevc_nvenc", command)
 
-    @patch('merger.subprocess.run')
-    @patch('merger.subprocess.Popen')
+    @patch('utils.subprocess.run')
+    @patch('ffmpeg_progress.subprocess.Popen')
     @patch('merger.os.remove')
     @patch('merger.os.path.exists', return_value=False)
     def test_merge_mp4_uses_video_codec(self, mock_exists, mock_remove, mock_popen, mock_run):
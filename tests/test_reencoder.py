@@ -0,0 +1,154 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import threading
+
+import pytest
+from reencoder import (
+    _plan_chunks,
+    _run_chunked_ffmpeg_command,
+    default_batch_workers,
+    reencode_video,
+)
+from constants import BEST_CODEC_LABEL, COPY_CODEC_LABEL
+from task_utils import TaskController
+
+@pytest.fixture
+def batch_dir(tmp_path):
+    source = tmp_path / "in"
+    source.mkdir()
+    for name in ("a.mp4", "b.mp4", "c.mp4"):
+        (source / name).write_bytes(b"\0")
+    return source
+
+def run_batch(batch_dir, tmp_path, **kwargs):
+    return reencode_video(
+        str(batch_dir), str(tmp_path / "out"), "", "libx264", "aac", "mp4",
+        "batch", "mp4", **kwargs
+    )
+
+def test_default_batch_workers_per_codec(mocker):
+    mocker.patch("reencoder.os.cpu_count", return_value=16)
+
+    # Hardware encoders are capped by the GPU's session limit
+    assert default_batch_workers(BEST_CODEC_LABEL) == 3
+    assert default_batch_workers("h264_qsv") == 2
+    # Software encoders share the cores, CPU_ENCODER_THREADS each
+    assert default_batch_workers("libx264") == 4
+    assert default_batch_workers(COPY_CODEC_LABEL) == 4
+    mocker.patch("reencoder.os.cpu_count", return_value=2)
+    assert default_batch_workers("libx264") == 1
+    assert default_batch_workers(COPY_CODEC_LABEL) == 2
+
+def test_batch_reports_aggregate_progress(mocker, batch_dir, tmp_path):
+    def fake_encode(input_file, output_file, *args):
+        args[2](50.0, "half")
+        return True, ""
+
+    encode = mocker.patch("reencoder._run_ffmpeg_command", side_effect=fake_encode)
+    progress = []
+
+    success, _ = run_batch(
+        batch_dir, tmp_path, max_workers=1,
+        progress_callback=lambda overall, message: progress.append(overall),
+    )
+
+    assert success
+    assert encode.call_count == 3
+    # Each file is a third of the batch: half of the first file is 1/6 overall
+    assert progress[1] == pytest.approx(50 / 3)
+    assert progress[-1] == pytest.approx(250 / 3)
+    # CPU encoders running alone keep their default thread count
+    assert encode.call_args[0][-1] is None
+
+def test_batch_splits_threads_between_workers(mocker, batch_dir, tmp_path):
+    mocker.patch("reencoder.os.cpu_count", return_value=12)
+    encode = mocker.patch("reencoder._run_ffmpeg_command", return_value=(True, ""))
+
+    run_batch(batch_dir, tmp_path, max_workers=3)
+
+    assert [call[0][-1] for call in encode.call_args_list] == [4, 4, 4]
+
+def test_batch_stop_skips_remaining_files(mocker, batch_dir, tmp_path):
+    controller = TaskController()
+
+    def stopping_encode(*args):
+        controller.stop()
+        return False, "Stopped"
+
+    encode = mocker.patch("reencoder._run_ffmpeg_command", side_effect=stopping_encode)
+
+    success, message = run_batch(
+        batch_dir, tmp_path, max_workers=1, task_controller=controller
+    )
+
+    assert not success and "stopped" in message
+    encode.assert_called_once()
+
+def test_plan_chunks_without_keyframes_is_one_chunk():
+    assert _plan_chunks([], 120.0, 4) == [(0.0, 120.0)]
+
+def test_plan_chunks_snaps_to_nearest_keyframe_once():
+    # Targets 30, 60 and 90 s: 30 and 60 both pick 55, which is used once
+    assert _plan_chunks([0.0, 55.0, 110.0], 120.0, 4) == [
+        (0.0, 55.0), (55.0, 110.0), (110.0, 120.0)
+    ]
+
+def test_plan_chunks_never_cuts_at_either_end():
+    # The only keyframes near the targets are at 0 and at the very end
+    assert _plan_chunks([0.0, 100.0], 100.0, 2) == [(0.0, 100.0)]
+    assert _plan_chunks([0.0, 100.0], 100.0, 3) == [(0.0, 100.0)]
+
+@pytest.fixture
+def chunked(mocker):
+    mocker.patch("reencoder.probe_media", return_value={
+        "format": {"duration": "180.0", "start_time": "1.400000"}
+    })
+    # Absolute keyframe pts; the file starts at 1.4 s
+    mocker.patch("reencoder.get_keyframe_times", return_value=[1.4, 61.4, 121.4])
+    mocker.patch("reencoder.write_concat_list", return_value="list.txt")
+
+def test_chunks_seek_on_the_start_time_timeline(mocker, chunked, tmp_path):
+    execute = mocker.patch("reencoder._execute_ffmpeg", return_value=(True, ""))
+
+    success, _ = _run_chunked_ffmpeg_command(
+        "in.ts", str(tmp_path / "out.mp4"), "libx264", "aac", max_workers=3
+    )
+
+    assert success
+    seeks = sorted(
+        float(call[0][0][call[0][0].index("-ss") + 1])
+        for call in execute.call_args_list if "-ss" in call[0][0]
+    )
+    assert seeks == pytest.approx([0.0, 60.0, 120.0])
+
+def test_failed_chunk_stops_the_others(mocker, chunked, tmp_path):
+    controller = TaskController()
+    started = threading.Barrier(3, timeout=5)
+    sibling_stopped = []
+
+    def fake_execute(command, output_file, callback, chunk_controller, duration):
+        if "concat" in command:
+            return True, ""
+        started.wait()
+        if command[command.index("-ss") + 1] == "60.000000":
+            return False, "encoder error"
+        # Other chunks run until they are stopped
+        sibling_stopped.append(chunk_controller.stop_event.wait(5))
+        return False, "Re-encoding stopped by user."
+
+    execute = mocker.patch("reencoder._execute_ffmpeg", side_effect=fake_execute)
+
+    success, message = _run_chunked_ffmpeg_command(
+        "in.ts", str(tmp_path / "out.mp4"), "libx264", "aac",
+        task_controller=controller, max_workers=3,
+    )
+
+    assert not success
+    assert message == "chunk 2: encoder error"
+    assert sibling_stopped == [True, True]
+    # The task itself wasn't stopped, and nothing was joined
+    assert not controller.is_stopped()
+    assert execute.call_count == 3
+    assert not any(name.startswith(".chunks_") for name in os.listdir(tmp_path))
@@ -0,0 +1,69 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import pytest
+import info_cache
+import stream_resolver
+from media_cache import MediaCache
+from stream_resolver import resolve_streams, streams_from_info
+
+INFO = {
+    "requested_formats": [
+        {"url": "https://cdn.example/v?expire=2000000000", "vcodec": "avc1", "acodec": "none",
+         "http_headers": {"User-Agent": "UA"}},
+        {"url": "https://cdn.example/a?expire=1900000000", "vcodec": "none", "acodec": "mp4a"},
+    ]
+}
+
+@pytest.fixture
+def mock_ydl(mocker, tmp_path):
+    stream_resolver._resolved_cache.clear()
+    info_cache._memory_cache.clear()
+    mocker.patch("info_cache.get_cache", return_value=MediaCache(db_path=str(tmp_path / "cache.sqlite3")))
+    mocker.patch("time.time", return_value=1800000000)
+    mock_ydl = mocker.patch("yt_dlp.YoutubeDL")
+    ydl = mock_ydl.return_value.__enter__.return_value
+    ydl.extract_info.return_value = INFO
+    ydl.sanitize_info.side_effect = lambda info: info
+    ydl.process_ie_result.side_effect = lambda info, download: info
+    return mock_ydl
+
+def test_streams_from_info_splits_video_and_audio():
+    streams = streams_from_info(INFO, now=0)
+    assert streams.video_url.startswith("https://cdn.example/v")
+    assert streams.audio_url.startswith("https://cdn.example/a")
+    assert streams.http_headers == {"User-Agent": "UA"}
+    # The earliest expiry of the two URLs wins
+    assert streams.expires_at == 1900000000
+
+def test_streams_from_info_marks_audio_only():
+    audio_only = {"url": "https://cdn.example/a", "vcodec": "none", "acodec": "opus"}
+    assert not streams_from_info(audio_only, now=0).has_video
+    assert not streams_from_info({"requested_formats": INFO["requested_formats"][1:]}, now=0).has_video
+    assert streams_from_info(INFO, now=0).has_video
+
+def test_resolution_is_cached_until_expiry(mock_ydl):
+    first = resolve_streams("https://www.youtube.com/watch?v=x", "mp4")
+    second = resolve_streams("https://www.youtube.com/watch?v=x", "mp4")
+
+    assert first is second
+    assert mock_ydl.call_count == 1
+
+def test_extractor_result_is_shared_across_format_selections(mock_ydl):
+    ydl = mock_ydl.return_value.__enter__.return_value
+    resolve_streams("https://www.youtube.com/watch?v=x", "mp4")
+    resolve_streams("https://www.youtube.com/watch?v=x", "mkv")
+
+    # Each container needs its own format selection, but the page is only extracted once
+    assert ydl.process_ie_result.call_count == 2
+    ydl.extract_info.assert_called_once()
+
+def test_extractor_result_survives_restart(mock_ydl):
+    ydl = mock_ydl.return_value.__enter__.return_value
+    resolve_streams("https://www.youtube.com/watch?v=x", "mp4")
+    stream_resolver._resolved_cache.clear()
+    info_cache._memory_cache.clear()
+
+    assert info_cache.get_cached_info("https://www.youtube.com/watch?v=x") == INFO
+    ydl.extract_info.assert_called_once()
@@ -0,0 +1,170 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import subprocess
+import threading
+import time
+import psutil
+import pytest
+from task_utils import ProcessBudget, ProgressBus, TaskController, process_group_kwargs
+
+def test_progress_bus_keeps_only_latest_value_per_key():
+    bus = ProgressBus()
+    for i in range(100):
+        bus.post("merge", i)
+    bus.post(("download", 1), "a")
+    bus.post(("download", 2), "b")
+
+    assert sorted(bus.drain(), key=str) == sorted(
+        [("merge", 99), (("download", 1), "a"), (("download", 2), "b")], key=str
+    )
+    assert bus.drain() == []
+
+def test_progress_bus_take_removes_one_key():
+    bus = ProgressBus()
+    bus.post("a", 1)
+    bus.post("b", 2)
+
+    assert bus.take("a") == 1
+    assert bus.take("a") is None
+    assert bus.drain() == [("b", 2)]
+
+def test_progress_bus_survives_concurrent_posts():
+    bus = ProgressBus()
+    seen = {}
+
+    def worker(key):
+        for i in range(2000):
+            bus.post(key, i)
+
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(4)]
+    for t in threads:
+        t.start()
+    while any(t.is_alive() for t in threads):
+        seen.update(bus.drain())
+    for t in threads:
+        t.join()
+    seen.update(bus.drain())
+
+    assert seen == {k: 1999 for k in range(4)}
+
+def test_wait_while_paused_wakes_on_resume_and_stop():
+    controller = TaskController()
+    assert controller.wait_while_paused()
+
+    controller.pause()
+    assert not controller.wait_while_paused(timeout=0.05)
+
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(controller.wait_while_paused()))
+    waiter.start()
+    controller.resume()
+    waiter.join(timeout=1)
+    assert results == [True]
+
+    controller.pause()
+    waiter = threading.Thread(target=lambda: results.append(controller.wait_while_paused()))
+    waiter.start()
+    controller.stop()
+    waiter.join(timeout=1)
+    assert results == [True, False]
+
+def test_process_budget_acquire_returns_when_stopped():
+    budget = ProcessBudget(1)
+    assert budget.acquire()
+    controller = TaskController()
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(budget.acquire(controller)))
+    waiter.start()
+    time.sleep(0.05)
+    controller.stop()
+    waiter.join(timeout=1)
+    assert results == [False]
+
+def test_process_budget_takes_several_slots_at_once():
+    budget = ProcessBudget(2)
+    assert budget.acquire()
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(budget.acquire(count=2)))
+    waiter.start()
+    time.sleep(0.05)
+    # Only one slot is free, so the request for two waits without taking it
+    assert results == [] and budget._active == 1
+    budget.release()
+    waiter.join(timeout=1)
+    assert results == [True] and budget._active == 2
+    budget.release(2)
+
+def test_child_controller_follows_parent_but_stops_alone():
+    parent = TaskController()
+    child = parent.child()
+    parent.pause()
+    assert child.pause_event.is_set()
+    parent.resume()
+    assert not child.pause_event.is_set()
+
+    child.stop()
+    assert not parent.is_stopped()
+
+    other = parent.child()
+    parent.stop()
+    assert other.is_stopped()
+
+def test_watchdog_terminates_silent_process_on_timeout():
+    controller = TaskController()
+    process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    started = time.monotonic()
+    controller.add_process(process, timeout=0.2)
+    process.wait(timeout=5)
+    assert time.monotonic() - started < 5
+    assert controller.timed_out(process)
+    assert not controller.is_stopped()
+    controller.remove_process(process)
+
+@pytest.mark.skipif(sys.platform == "win32", reason="SIGTERM can't be ignored on Windows")
+def test_watchdog_kills_process_that_ignores_terminate(mocker):
+    mocker.patch("task_utils.STOP_GRACE_SECONDS", 0.2)
+    controller = TaskController()
+    process = subprocess.Popen([
+        sys.executable, "-c",
+        "import signal, sys, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); "
+        "print('ready', flush=True); time.sleep(30)",
+    ], stdout=subprocess.PIPE)
+    process.stdout.readline()
+    controller.add_process(process)
+    controller.stop()
+    assert process.wait(timeout=5) != 0
+    controller.remove_process(process)
+
+def wait_for_status(proc, stopped, timeout=2.0):
+    # Signals are delivered asynchronously
+    deadline = time.monotonic() + timeout
+    while (proc.status() == psutil.STATUS_STOPPED) != stopped and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return (proc.status() == psutil.STATUS_STOPPED) == stopped
+
+@pytest.mark.skipif(sys.platform == "win32", reason="uses POSIX process groups")
+def test_pause_and_stop_apply_to_grandchildren():
+    controller = TaskController()
+    # A wrapper whose child keeps running on its own: the shape of yt-dlp -> ffmpeg
+    wrapper = subprocess.Popen(
+        [sys.executable, "-c",
+         "import subprocess, sys, time; "
+         "c = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)']); "
+         "print(c.pid, flush=True); time.sleep(30)"],
+        stdout=subprocess.PIPE,
+        **process_group_kwargs(),
+    )
+    child = psutil.Process(int(wrapper.stdout.readline()))
+    controller.add_process(wrapper)
+
+    controller.pause()
+    assert wait_for_status(child, stopped=True)
+    controller.resume()
+    assert wait_for_status(child, stopped=False)
+
+    controller.stop()
+    wrapper.wait(timeout=10)
+    child.wait(timeout=10)
+    controller.remove_process(wrapper)